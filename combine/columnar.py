@@ -0,0 +1,286 @@
+"""Compact columnar encoding of the combined podcast dataset.
+
+Logic to store the combined dataset's episodes as columns rather than as a list
+of dictionaries. Show names and tags are dictionary-encoded: each distinct
+string is stored once in a table and episodes refer to it by index. Each
+episode's tags are stored as a slice of a single flat list of tag indices with
+tag_offsets[i] to tag_offsets[i + 1] holding the tags of episode i. This avoids
+repeating keys and strings for every episode and lets totals be computed by
+scanning arrays instead of walking dictionaries. This can be run from the
+command line to convert an existing combined file with:
+
+    python columnar.py [COMBINED JSON] [OUT JSON]
+
+The reader (load_columnar) offers the same view of the data as loading the
+combined JSON file with episodes reconstructed as dictionaries only when they
+are accessed.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import sys
+
+import json_stream
+
+FORMAT_NAME = 'columnar'
+FORMAT_VERSION = 1
+
+USAGE_STR = 'python columnar.py [combined json] [out json]'
+
+
+class StringTable(object):
+    """Table assigning each distinct string a stable integer index."""
+
+    def __init__(self, values=None):
+        """Create a new string table.
+
+        @keyword values: The strings already in the table in index order.
+            Defaults to None (empty table).
+        @type values: list of str
+        """
+        self.values = list(values or [])
+        self._indices = dict(map(
+            lambda (i, value): (value, i),
+            enumerate(self.values)
+        ))
+
+    def get_index(self, value):
+        """Get the index of a string, adding it to the table if needed.
+
+        @param value: The string to look up.
+        @type value: basestring
+        @return: Index of the string within the table.
+        @rtype: int
+        """
+        index = self._indices.get(value)
+        if index == None:
+            index = len(self.values)
+            self.values.append(value)
+            self._indices[value] = index
+        return index
+
+
+class ColumnarBuilder(object):
+    """Accumulator converting episode dictionaries into columns."""
+
+    def __init__(self):
+        """Create a new builder with no episodes."""
+        self._show_table = StringTable()
+        self._tag_table = StringTable()
+        self._columns = {
+            'show': [],
+            'name': [],
+            'date': [],
+            'loc': [],
+            'duration': [],
+            'tag_offsets': [0],
+            'tag_indices': []
+        }
+
+    def add_episode(self, episode):
+        """Add an episode as it appears in the combined dataset.
+
+        @param episode: Dictionary with show, name, date, loc, duration, and
+            tags keys.
+        @type episode: dict
+        """
+        columns = self._columns
+        columns['show'].append(self._show_table.get_index(episode['show']))
+        columns['name'].append(episode['name'])
+        columns['date'].append(episode['date'])
+        columns['loc'].append(episode['loc'])
+        columns['duration'].append(episode['duration'])
+
+        tag_indices = columns['tag_indices']
+        tag_indices.extend(map(self._tag_table.get_index, episode['tags']))
+        columns['tag_offsets'].append(len(tag_indices))
+
+    def build(self, other_values=None):
+        """Get the columnar document for the episodes added so far.
+
+        @keyword other_values: Additional keys and values (like the shows and
+            tags totals of the combined dataset) to include unchanged.
+            Defaults to None.
+        @type other_values: dict
+        @return: JSON-serializable columnar document.
+        @rtype: dict
+        """
+        document = dict(other_values or {})
+        document.update({
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'num_episodes': len(self._columns['show']),
+            'show_names': self._show_table.values,
+            'tag_names': self._tag_table.values,
+            'columns': self._columns
+        })
+        return document
+
+
+class ColumnarEpisodes(object):
+    """Read-only list-like view of columnar episodes as dictionaries."""
+
+    def __init__(self, document):
+        """Create a view over a loaded columnar document.
+
+        @param document: The columnar document as produced by
+            ColumnarBuilder.build.
+        @type document: dict
+        """
+        self.show_names = document['show_names']
+        self.tag_names = document['tag_names']
+        self.columns = document['columns']
+        self._num_episodes = document['num_episodes']
+
+    def __len__(self):
+        """Get the number of episodes.
+
+        @return: The number of episodes in the dataset.
+        @rtype: int
+        """
+        return self._num_episodes
+
+    def get_tag_indices(self, index):
+        """Get the indices into tag_names of an episode's tags.
+
+        @param index: The index of the episode.
+        @type index: int
+        @return: Indices of the episode's tags.
+        @rtype: list of int
+        """
+        offsets = self.columns['tag_offsets']
+        return self.columns['tag_indices'][offsets[index]:offsets[index + 1]]
+
+    def __getitem__(self, index):
+        """Reconstruct a single episode in the combined dataset's format.
+
+        @param index: The index of the episode. Negative indices count from
+            the end.
+        @type index: int
+        @return: Dictionary with show, name, date, loc, duration, and tags
+            keys.
+        @rtype: dict
+        @raise IndexError: Raised if there is no episode at index.
+        """
+        if index < 0:
+            index += self._num_episodes
+        if index < 0 or index >= self._num_episodes:
+            raise IndexError('Episode index out of range')
+
+        columns = self.columns
+        return {
+            'show': self.show_names[columns['show'][index]],
+            'name': columns['name'][index],
+            'date': columns['date'][index],
+            'loc': columns['loc'][index],
+            'duration': columns['duration'][index],
+            'tags': map(
+                lambda x: self.tag_names[x],
+                self.get_tag_indices(index)
+            )
+        }
+
+    def __iter__(self):
+        """Iterate over the episodes, reconstructing each as it is reached.
+
+        @return: Generator over episode dictionaries in order.
+        @rtype: generator over dict
+        """
+        for index in xrange(self._num_episodes):
+            yield self[index]
+
+
+def build_columnar(episodes, other_values=None):
+    """Convert episodes into a columnar document.
+
+    @param episodes: The episodes of the combined dataset.
+    @type episodes: iterable over dict
+    @keyword other_values: Additional keys and values (like the shows and
+        tags totals of the combined dataset) to include unchanged. Defaults to
+        None.
+    @type other_values: dict
+    @return: JSON-serializable columnar document.
+    @rtype: dict
+    """
+    builder = ColumnarBuilder()
+    for episode in episodes:
+        builder.add_episode(episode)
+    return builder.build(other_values)
+
+
+def write_columnar(episodes, out_loc, other_values=None):
+    """Write episodes to a columnar JSON file.
+
+    The columnar file only replaces any prior file at out_loc once it is
+    complete.
+
+    @param episodes: The episodes of the combined dataset.
+    @type episodes: iterable over dict
+    @param out_loc: The location to which the columnar file should be written.
+    @type out_loc: basestring
+    @keyword other_values: Additional keys and values (like the shows and
+        tags totals of the combined dataset) to include unchanged. Defaults to
+        None.
+    @type other_values: dict
+    """
+    document = build_columnar(episodes, other_values)
+    json_stream.write_compact(out_loc, document)
+
+
+def convert_combined(combined_loc, out_loc):
+    """Convert an existing combined JSON file into a columnar JSON file.
+
+    @param combined_loc: The location of the combined JSON file.
+    @type combined_loc: basestring
+    @param out_loc: The location to which the columnar file should be written.
+    @type out_loc: basestring
+    """
+    with open(combined_loc) as f:
+        combined = json.load(f)
+
+    write_columnar(
+        combined['episodes'],
+        out_loc,
+        {'shows': combined['shows'], 'tags': combined['tags']}
+    )
+
+
+def load_columnar(loc):
+    """Load a columnar file in the same form as the combined JSON file.
+
+    @param loc: The location of the columnar JSON file.
+    @type loc: basestring
+    @return: Dictionary with episodes (a ColumnarEpisodes view), shows, and
+        tags keys.
+    @rtype: dict
+    @raise ValueError: Raised if the file is not in a supported columnar
+        format.
+    """
+    with open(loc) as f:
+        document = json.load(f)
+
+    if document.get('format') != FORMAT_NAME:
+        raise ValueError('%s is not a columnar episode file' % loc)
+    if document.get('version') != FORMAT_VERSION:
+        raise ValueError('Unsupported columnar version in %s' % loc)
+
+    return {
+        'episodes': ColumnarEpisodes(document),
+        'shows': document['shows'],
+        'tags': document['tags']
+    }
+
+
+def main():
+    """Driver converting a combined JSON file to the columnar format."""
+    if len(sys.argv) != 3:
+        print USAGE_STR
+        sys.exit(1)
+
+    convert_combined(sys.argv[1], sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()
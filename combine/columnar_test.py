@@ -0,0 +1,115 @@
+"""Unit tests for the columnar encoding of the combined dataset.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import columnar
+
+TEST_EPISODES = [
+    {
+        'show': 'A',
+        'name': 'a1',
+        'date': '2014-01-05',
+        'loc': 'http://a/1',
+        'duration': 60,
+        'tags': ['x', 'y', 'x']
+    },
+    {
+        'show': 'B',
+        'name': 'b1',
+        'date': None,
+        'loc': '',
+        'duration': 12.5,
+        'tags': []
+    },
+    {
+        'show': 'A',
+        'name': 'a2',
+        'date': '2014-02-01',
+        'loc': 'http://a/2',
+        'duration': 30,
+        'tags': ['y']
+    }
+]
+
+TEST_TOTALS = {
+    'shows': [{'name': 'A'}, {'name': 'B'}],
+    'tags': [{'name': 'x'}, {'name': 'y'}]
+}
+
+
+class ColumnarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loc = os.path.join(self.directory, 'columnar.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_string_table(self):
+        table = columnar.StringTable(['a'])
+        self.assertEqual(table.get_index('b'), 1)
+        self.assertEqual(table.get_index('a'), 0)
+        self.assertEqual(table.get_index('b'), 1)
+        self.assertEqual(table.values, ['a', 'b'])
+
+    def test_build_columnar(self):
+        document = columnar.build_columnar(TEST_EPISODES)
+        self.assertEqual(document['num_episodes'], 3)
+        self.assertEqual(document['show_names'], ['A', 'B'])
+        self.assertEqual(document['tag_names'], ['x', 'y'])
+        self.assertEqual(document['columns']['show'], [0, 1, 0])
+        self.assertEqual(document['columns']['tag_offsets'], [0, 3, 3, 4])
+        self.assertEqual(document['columns']['tag_indices'], [0, 1, 0, 1])
+
+    def test_round_trip(self):
+        columnar.write_columnar(TEST_EPISODES, self.loc, TEST_TOTALS)
+        loaded = columnar.load_columnar(self.loc)
+
+        episodes = loaded['episodes']
+        self.assertEqual(len(episodes), 3)
+        self.assertEqual(list(episodes), TEST_EPISODES)
+        self.assertEqual(episodes[-1], TEST_EPISODES[-1])
+        self.assertEqual(episodes.get_tag_indices(0), [0, 1, 0])
+        self.assertEqual(loaded['shows'], TEST_TOTALS['shows'])
+        self.assertEqual(loaded['tags'], TEST_TOTALS['tags'])
+
+        with self.assertRaises(IndexError):
+            episodes[3]
+        with self.assertRaises(IndexError):
+            episodes[-4]
+
+    def test_convert_combined(self):
+        combined_loc = os.path.join(self.directory, 'combined.json')
+        with open(combined_loc, 'w') as f:
+            json.dump(dict(TEST_TOTALS, episodes=TEST_EPISODES), f)
+
+        columnar.convert_combined(combined_loc, self.loc)
+        loaded = columnar.load_columnar(self.loc)
+        self.assertEqual(list(loaded['episodes']), TEST_EPISODES)
+        self.assertEqual(loaded['tags'], TEST_TOTALS['tags'])
+
+    def test_load_columnar_invalid(self):
+        with open(self.loc, 'w') as f:
+            json.dump({'episodes': []}, f)
+        with self.assertRaises(ValueError):
+            columnar.load_columnar(self.loc)
+
+        document = columnar.build_columnar([], TEST_TOTALS)
+        document['version'] = columnar.FORMAT_VERSION + 1
+        with open(self.loc, 'w') as f:
+            json.dump(document, f)
+        with self.assertRaises(ValueError):
+            columnar.load_columnar(self.loc)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,6 +10,7 @@ JSON file where each podcast's shows are still separated but in the same
 This program can be run stand-alone with the following usage:
     
     python combine.py [SOURCE FILES LISTING] [TAG MAPPING] [OUT JSON]
+        [WORKERS (optional)] [COLUMNAR JSON (optional)]
 
 Parameters include:
     - Location of a JSON file containing a single object whose keys are the
@@ -18,15 +19,41 @@ Parameters include:
     - Location of a JSON file continaing a single object whose keys are tags
       (strings) and whose values are to what those tags should be renamed.
     - Location to where the combined JSON file should be written.
+    - The number of processes across which shows are combined. Defaults to the
+      number of cores on this machine. Pass 1 to combine shows serially.
+    - Location to where a compact columnar copy of the combined JSON file
+      (see columnar.py) should also be written. Optional.
+
+Episodes are read from each source file and written to the combined file one
+at a time (with per-show and per-tag totals kept as they stream by) so that the
+combined corpus never needs to be held in memory all at once. Each show's
+results are cached next to the combined file (with a manifest of the show
+files and tag mapping entries used) so that later runs only reprocess shows
+whose JSON file or relevant tag mapping entries changed. A tag co-occurrence
+matrix (see cooccurrence.py) and per month and per year episode totals (see
+rollups.py) are also written next to the combined file (like
+combined_cooccurrence.json and combined_rollups.json).
 
 @author: Sam Pottinger
 @license: MIT License
 """
 
 import collections
+import hashlib
 import json
+import multiprocessing
+import os
+import sys
 
-USAGE_STR = 'python combine.py [source files listing] [tag mapping] [out json]'
+import columnar
+import cooccurrence
+import json_stream
+import manifest
+import rollups
+import tag_mapper
+
+USAGE_STR = ('python combine.py [source files listing] [tag mapping] '
+    '[out json] [workers (optional)] [columnar json (optional)]')
 
 
 def clean_episode(episode):
@@ -34,7 +61,9 @@ def clean_episode(episode):
 
     Different podcasts and podcast parsing logic can result in minor differences
     in the description of epsiodes. This tries to standardize reporting of the
-    podcast attributes.
+    podcast attributes. Episodes saved by older parsers with a title key
+    instead of a name key are accepted. Tags are standardized (including case
+    folding) later by the tag mapper.
 
     @param episode: Dictionary describing a single episode that should be
         standardized.
@@ -44,134 +73,416 @@ def clean_episode(episode):
     @rtype: dict
     """
     return {
-        'name': episode['name'],
+        'name': episode['name'] if 'name' in episode else episode['title'],
         'date': episode['date'],
         'loc': episode['loc'],
         'duration': episode['duration'],
-        'tags': map(lambda x: x.lower(), episode['tags'])
+        'tags': episode['tags']
     }
 
 
-def read_show_episodes(loc):
-    """Read all of the episodes contained within a source JSON file.
+def iterate_show_episodes(loc):
+    """Read the episodes within a source JSON file one at a time.
 
     @param loc: The location of the JSON file describing episodes from a
         podcast.
     @type loc: basestring
-    @return: List of episodes read from the source JSON file after being
+    @return: Generator over episodes read from the source JSON file after being
         "standardized" to have episode properties reported in a consistent way.
-    @rtype: list of dict
+    @rtype: generator over dict
     """
     with open(loc) as f:
-        contents = json.load(f)
+        for episode in json_stream.iterate_array(f, 'episodes'):
+            yield clean_episode(episode)
+
+
+def create_tag_entry():
+    """Create the totals kept for a single tag.
+
+    @return: Dictionary with num_episodes and duration keys set to zero.
+    @rtype: dict
+    """
+    return {'num_episodes': 0, 'duration': 0}
+
+
+def create_show_aggregate(name):
+    """Create the totals kept while reading a single show's episodes.
+
+    Show aggregates only hold plain dictionaries so that they can be built in
+    worker processes and merged afterwards.
 
-    return map(clean_episode, contents['episodes'])
+    @param name: The name of the podcast (like This American Life).
+    @type name: basestring
+    @return: Dictionary with a show key whose value has name, episodes, and
+        duration keys and a tags key whose value maps tag name to totals
+        (dictionary with num_episodes and duration keys).
+    @rtype: dict
+    """
+    return {
+        'show': {'episodes': 0, 'duration': 0, 'name': name},
+        'tags': {}
+    }
+
+
+def add_episode(aggregate, episode):
+    """Add an episode to a show's totals.
+
+    @param aggregate: The show's totals in the format of create_show_aggregate.
+    @type aggregate: dict
+    @param episode: Dictionary describing the episode after tag mapping.
+    @type episode: dict
+    """
+    show_entry = aggregate['show']
+    show_entry['episodes'] += 1
+    show_entry['duration'] += episode['duration']
+
+    tags = aggregate['tags']
+    for tag in episode['tags']:
+        if not tag in tags:
+            tags[tag] = create_tag_entry()
+        tags[tag]['num_episodes'] += 1
+        tags[tag]['duration'] += episode['duration']
+
+
+def merge_tag_totals(global_tags, partial_tags):
+    """Add the tag totals from one show to the totals across all shows.
+
+    @param global_tags: Totals (dictionary with num_episodes and duration keys)
+        by tag name across shows to be updated.
+    @type global_tags: collections.defaultdict
+    @param partial_tags: Totals by tag name for a single show.
+    @type partial_tags: dict
+    """
+    for (tag, partial_entry) in sorted(partial_tags.items()):
+        global_tag_entry = global_tags[tag]
+        global_tag_entry['num_episodes'] += partial_entry['num_episodes']
+        global_tag_entry['duration'] += partial_entry['duration']
 
 
-def parse_show(name, loc, tag_mapping, global_tags):
-    """Organize information about a podcast's episodes, mapping tags as needed.
+def iterate_show(name, loc, mapper, aggregate, source_tags=None):
+    """Read a podcast's episodes one at a time, mapping tags as needed.
 
-    Combine information about all episodes from a podcast, mapping show tags
-    as needed for standardization.
+    Totals for the show and its tags are updated as each episode is read.
 
     @param name: The name of the podcast (like This American Life).
     @type name: basestring
     @param loc: The JSON file where thie podcast's epsiodes are saved.
     @type loc: basestring
-    @return: Dictionary describing a single show with a show key indicating the
-        name of the podcast (like This American Life) and an episodes key whose
-        value is a list of dictionaries where each dictionary describes a single
-        podcast episode.
+    @param mapper: The compiled tag mapping to apply to episode tags.
+    @type mapper: tag_mapper.TagMapper
+    @param aggregate: The show's totals in the format of create_show_aggregate.
+    @type aggregate: dict
+    @keyword source_tags: If provided, set to update with each episode's tags
+        before mapping. Defaults to None.
+    @type source_tags: set
+    @return: Generator over dictionaries describing the show's episodes.
+    @rtype: generator over dict
     """
-    episodes = read_show_episodes(loc)
-
-    total_duration = 0
+    for episode in iterate_show_episodes(loc):
+        if source_tags != None:
+            source_tags.update(episode['tags'])
 
-    for episode in episodes:
         episode['show'] = name
-        episode['tags'] = map(
-            lambda x: tag_mapping[x] if x in tag_mapping else x
-            episode['tags']
-        )
+        episode['tags'] = mapper.map_tags(episode['tags'])
 
-        total_duration += episode['duration']
-        
-        for tag in episode['tags']:
-            global_tag_entry = global_tags[tags]
-            global_tag_entry['num_episodes'] += 1
-            global_tag_entry['duration'] += episode['duration']
-
-    show_entry = {
-        'episodes': len(episodes),
-        'duration': total_duration,
-        'name': name
-    }
+        add_episode(aggregate, episode)
 
-    return {
-        'show': show_entry,
-        'episodes': episodes
+        yield episode
+
+
+def combine_show_part(show_args):
+    """Map a single show's episodes, writing them to a partial output file.
+
+    Meant to run in a worker process. Each episode is written to its own line
+    already encoded as it will appear in the combined file. The partial file
+    only appears at part_loc once it is complete and is removed if the show
+    cannot be read.
+
+    @param show_args: Tuple of show name, source file location, tag mapping,
+        and the location to which encoded episodes should be written.
+    @type show_args: tuple
+    @return: Tuple of the show's totals in the format of create_show_aggregate
+        and the show's tags before mapping.
+    @rtype: tuple
+    """
+    (name, loc, mapper, part_loc) = show_args
+    aggregate = create_show_aggregate(name)
+    source_tags = set()
+
+    temp_loc = part_loc + '.tmp'
+    try:
+        with open(temp_loc, 'w') as f:
+            episodes = iterate_show(name, loc, mapper, aggregate, source_tags)
+            for episode in episodes:
+                f.write(json_stream.encode(episode))
+                f.write('\n')
+    except:
+        os.remove(temp_loc)
+        raise
+    os.rename(temp_loc, part_loc)
+
+    return (aggregate, sorted(source_tags))
+
+
+def combine_show_parts(show_args, workers):
+    """Map many shows' episodes to partial output files.
+
+    @param show_args: Arguments for combine_show_part for each show.
+    @type show_args: list of tuple
+    @param workers: The number of worker processes to use. If 1, shows are
+        processed within this process. If None, uses the number of cores on
+        this machine.
+    @type workers: int
+    @return: Return values of combine_show_part in the same order as
+        show_args.
+    @rtype: list of tuple
+    """
+    if workers == 1 or len(show_args) <= 1:
+        return map(combine_show_part, show_args)
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        return pool.map(combine_show_part, show_args)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def copy_show_parts(part_locs, writer):
+    """Copy the episodes in partial output files to the combined file.
+
+    @param part_locs: Locations of the partial files in output order.
+    @type part_locs: list of str
+    @param writer: The writer to which episodes should be streamed.
+    @type writer: json_stream.ArrayWriter
+    """
+    for part_loc in part_locs:
+        with open(part_loc) as f:
+            for line in f:
+                writer.write_encoded(line.rstrip('\n'))
+
+
+def serialize_tags(tags_dict):
+    """Convert the totals for each tag to their output form.
+
+    @param tags_dict: Totals (dictionary with num_episodes and duration keys)
+        by tag name.
+    @type tags_dict: dict
+    @return: List of dictionaries with name, num_episodes, and duration keys
+        sorted by tag name.
+    @rtype: list of dict
+    """
+    return map(
+        lambda (tag_name, tag_info): {
+            'name': tag_name,
+            'num_episodes': tag_info['num_episodes'],
+            'duration': tag_info['duration']
+        },
+        sorted(tags_dict.items())
+    )
+
+
+def close_combined(writer, aggregates):
+    """Finish the combined file with the totals for each show and tag.
+
+    @param writer: The writer to which episodes were streamed.
+    @type writer: json_stream.ArrayWriter
+    @param aggregates: Totals for each show in output order.
+    @type aggregates: list of dict
+    @return: The shows and tags totals written after the episodes.
+    @rtype: dict
+    """
+    tags_dict = collections.defaultdict(create_tag_entry)
+    for aggregate in aggregates:
+        merge_tag_totals(tags_dict, aggregate['tags'])
+
+    totals = {
+        'shows': map(lambda x: x['show'], aggregates),
+        'tags': serialize_tags(tags_dict)
     }
+    writer.close(totals)
+    return totals
+
+
+def write_derived_outputs(combined_loc, totals, columnar_loc=None):
+    """Write the files computed from a combined JSON file.
+
+    Episodes are read from the combined file once and passed to each output's
+    builder. The tag co-occurrence matrix (see cooccurrence.py) and time
+    rollups (see rollups.py) are always written next to the combined file.
+
+    @param combined_loc: The location of the combined JSON file.
+    @type combined_loc: basestring
+    @param totals: The shows and tags totals of the combined file.
+    @type totals: dict
+    @keyword columnar_loc: If provided, the location to which a columnar copy
+        of the combined file (see columnar.py) should be written. Defaults to
+        None.
+    @type columnar_loc: basestring
+    """
+    cooccurrence_builder = cooccurrence.CooccurrenceBuilder()
+    rollup_builder = rollups.RollupBuilder()
+    builders = [cooccurrence_builder, rollup_builder]
+
+    if columnar_loc != None:
+        columnar_builder = columnar.ColumnarBuilder()
+        builders.append(columnar_builder)
+
+    with open(combined_loc) as f:
+        for episode in json_stream.iterate_array(f, 'episodes'):
+            for builder in builders:
+                builder.add_episode(episode)
+
+    json_stream.write_compact(
+        cooccurrence.get_cooccurrence_location(combined_loc),
+        cooccurrence_builder.build()
+    )
+    json_stream.write_compact(
+        rollups.get_rollups_location(combined_loc),
+        rollup_builder.build()
+    )
+
+    if columnar_loc != None:
+        json_stream.write_compact(columnar_loc, columnar_builder.build(totals))
 
 
-def parse_shows(source_files, tag_mapping):
-    """Parse all podcasts' shows and combine them into a single dictionary.
+def get_part_location(parts_dir, name):
+    """Get the location of the cached mapped episodes for a show.
+
+    @param parts_dir: The directory in which per-show results are cached.
+    @type parts_dir: basestring
+    @param name: The name of the podcast (like This American Life).
+    @type name: basestring
+    @return: Location of the show's partial output file.
+    @rtype: str
+    """
+    key = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return os.path.join(parts_dir, key + '.part')
+
+
+def stream_shows_incremental(source_files, mapper, out_loc, workers=None,
+    columnar_loc=None):
+    """Combine all podcasts' shows, reprocessing only shows that changed.
+
+    Each show's mapped episodes and totals are cached next to the output file
+    along with a manifest recording the version of the show's file and of the
+    tag mapping entries for its tags. Shows whose file and relevant mapping
+    entries are unchanged since the last run reuse their cached results. Shows
+    that need to be reprocessed are mapped in a pool of worker processes and
+    the output is byte-for-byte the same regardless of the number of workers.
 
     @param source_files: Dictionary describing the files containing episodes for
         each podcast. This should map the name of the podcast (like This
         American Life) to a file location where the individual episode
         information can be found.
     @type source_files: dict
-    @param tag_mapping: Dictionary mapping the original name of a tag to what
-        that tag should be called in the output file.
-    @type tag_mapping: dict
-    @return: Dictionary with all shows, episodes, and tags from all of the
-        provided souce files after applying the provided tag mapping.
-    @rtype: dict
+    @param mapper: The compiled tag mapping to apply to episode tags.
+    @type mapper: tag_mapper.TagMapper
+    @param out_loc: The location to which the combined JSON file should be
+        written.
+    @type out_loc: basestring
+    @keyword workers: The number of worker processes to use for shows that
+        need to be reprocessed. If 1, shows are processed serially within this
+        process. If None, uses the number of cores on this machine. Defaults to
+        None.
+    @type workers: int
+    @keyword columnar_loc: If provided, the location to which a columnar copy
+        of the combined file (see columnar.py) should also be written.
+        Defaults to None.
+    @type columnar_loc: basestring
+    @return: The names of the shows that were reprocessed.
+    @rtype: list of str
     """
-    episodes = []
-    shows = []
-    tags_dict = collections.defaultdict()
-
-    for (show_name, show_loc) in source_files.entries():
-        parse_results = parse_show(show_name, show_loc, tag_mapping, tags_dict)
-        episodes.entend(parse_results['episodes'])
-        shows.append(parse_results['show'])
-
-    tags = []
-    for (tag_name, tag_info) in tags_dict.entries():
-        tags.append({
-            'name': tag_name,
-            'num_episodes': tag_info['num_episodes'],
-            'duration': tag_info['duration']
-        })
+    combine_manifest = manifest.load_manifest(
+        manifest.get_manifest_location(out_loc)
+    )
+
+    parts_dir = manifest.get_parts_directory(out_loc)
+    if not os.path.isdir(parts_dir):
+        os.makedirs(parts_dir)
+
+    shows = sorted(source_files.items())
+    stale_shows = filter(
+        lambda (name, loc): not combine_manifest.is_current(
+            name,
+            loc,
+            mapper
+        ),
+        shows
+    )
+
+    show_args = map(
+        lambda (name, loc): (
+            name,
+            loc,
+            mapper,
+            get_part_location(parts_dir, name)
+        ),
+        stale_shows
+    )
+    results = combine_show_parts(show_args, workers)
+
+    for (args, (aggregate, source_tags)) in zip(show_args, results):
+        (name, loc, mapper, part_loc) = args
+        combine_manifest.update(
+            name,
+            loc,
+            mapper,
+            aggregate,
+            source_tags,
+            part_loc
+        )
 
-    return {
-        'episodes': episodes,
-        'shows': shows,
-        'tags': tags
-    }
+    combine_manifest.retain(source_files.keys())
+    used_parts = map(lambda (name, loc): combine_manifest.get_part(name), shows)
+
+    writer = json_stream.ArrayWriter(out_loc, 'episodes')
+    try:
+        copy_show_parts(used_parts, writer)
+    except:
+        writer.abort()
+        raise
+
+    totals = close_combined(
+        writer,
+        map(lambda (name, loc): combine_manifest.get_aggregate(name), shows)
+    )
+    combine_manifest.save()
+
+    write_derived_outputs(out_loc, totals, columnar_loc)
+
+    for part_name in os.listdir(parts_dir):
+        part_loc = os.path.join(parts_dir, part_name)
+        if not part_loc in used_parts:
+            os.remove(part_loc)
+
+    return map(lambda (name, loc): name, stale_shows)
 
 
 def main():
     """Driver for the combine program."""
-    if len(sys.argv) != 4:
+    if len(sys.argv) not in [4, 5, 6]:
         print USAGE_STR
-        return
+        sys.exit(1)
 
     source_file_loc = sys.argv[1]
     tag_mapping_loc = sys.argv[2]
     out_json_loc = sys.argv[3]
+    workers = int(sys.argv[4]) if len(sys.argv) >= 5 else None
+    columnar_loc = sys.argv[5] if len(sys.argv) == 6 else None
 
     with open(source_file_loc) as f:
         source_files = json.load(f)
 
-    with open(tag_mapping_loc) as f:
-        tag_mapping = json.load(f)
-
-    combined_info = parse_shows(source_files, tag_mapping)
+    mapper = tag_mapper.load_tag_mapper(tag_mapping_loc, case_fold=True)
 
-    with open(out_json_loc) as f:
-        json.dump(combined_info, f)
+    stream_shows_incremental(
+        source_files,
+        mapper,
+        out_json_loc,
+        workers,
+        columnar_loc
+    )
 
 
 if __name__ == '__main__':
@@ -0,0 +1,236 @@
+"""Unit tests for combining shows into a single dataset.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import columnar
+import combine
+import cooccurrence
+import manifest
+import rollups
+import tag_mapper
+
+TAG_MAPPING = {'nyc': 'new york', 're:(.*)s': '\\1'}
+
+SHOW_EPISODES = {
+    'A': [
+        {
+            'name': 'a1',
+            'date': '2014-01-05',
+            'loc': 'http://a/1',
+            'duration': 60,
+            'tags': ['NYC', 'cats', 'dog']
+        },
+        {
+            'name': 'a2',
+            'date': '2014-03-01',
+            'loc': 'http://a/2',
+            'duration': 30,
+            'tags': ['dog', 'cats']
+        }
+    ],
+    'B': [
+        {
+            'title': 'b1',
+            'date': '2015-12-31',
+            'loc': 'http://b/1',
+            'duration': 45,
+            'tags': ['history']
+        },
+        {
+            'name': 'b2',
+            'date': None,
+            'loc': 'http://b/2',
+            'duration': 20,
+            'tags': ['cat', 'history']
+        }
+    ]
+}
+
+
+class CombineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source_files = {}
+        for (name, episodes) in SHOW_EPISODES.items():
+            self.source_files[name] = os.path.join(
+                self.directory,
+                name.lower() + '.json'
+            )
+            self.write_show(name, episodes)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_show(self, name, episodes):
+        with open(self.source_files[name], 'w') as f:
+            json.dump({'episodes': episodes}, f)
+
+    def run_combine(self, out_name, tag_mapping=TAG_MAPPING, workers=1):
+        out_dir = os.path.join(self.directory, out_name)
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+
+        out_loc = os.path.join(out_dir, 'combined.json')
+        reprocessed = combine.stream_shows_incremental(
+            self.source_files,
+            tag_mapper.TagMapper(tag_mapping, case_fold=True),
+            out_loc,
+            workers,
+            os.path.join(out_dir, 'columnar.json')
+        )
+        return (reprocessed, out_loc)
+
+    def read_outputs(self, out_loc):
+        locs = [
+            out_loc,
+            cooccurrence.get_cooccurrence_location(out_loc),
+            rollups.get_rollups_location(out_loc),
+            os.path.join(os.path.dirname(out_loc), 'columnar.json')
+        ]
+
+        def read_file(loc):
+            with open(loc) as f:
+                return f.read()
+
+        return map(read_file, locs)
+
+    def assert_same_as_full(self, out_loc, tag_mapping=TAG_MAPPING):
+        (reprocessed, full_loc) = self.run_combine('full', tag_mapping)
+        self.assertEqual(reprocessed, ['A', 'B'])
+        self.assertEqual(
+            self.read_outputs(out_loc),
+            self.read_outputs(full_loc)
+        )
+
+    def test_clean_episode_title(self):
+        episode = combine.clean_episode(SHOW_EPISODES['B'][0])
+        self.assertEqual(episode['name'], 'b1')
+        self.assertFalse('title' in episode)
+
+    def test_stream_shows(self):
+        (reprocessed, out_loc) = self.run_combine('out')
+        self.assertEqual(reprocessed, ['A', 'B'])
+
+        with open(out_loc) as f:
+            combined = json.load(f)
+
+        self.assertEqual(
+            map(
+                lambda x: (x['show'], x['name'], x['tags']),
+                combined['episodes']
+            ),
+            [
+                ('A', 'a1', ['new york', 'cat', 'dog']),
+                ('A', 'a2', ['dog', 'cat']),
+                ('B', 'b1', ['history']),
+                ('B', 'b2', ['cat', 'history'])
+            ]
+        )
+        self.assertEqual(combined['tags'], [
+            {'name': 'cat', 'num_episodes': 3, 'duration': 110},
+            {'name': 'dog', 'num_episodes': 2, 'duration': 90},
+            {'name': 'history', 'num_episodes': 2, 'duration': 65},
+            {'name': 'new york', 'num_episodes': 1, 'duration': 60}
+        ])
+
+        loaded = columnar.load_columnar(
+            os.path.join(os.path.dirname(out_loc), 'columnar.json')
+        )
+        self.assertEqual(list(loaded['episodes']), combined['episodes'])
+        self.assertEqual(loaded['tags'], combined['tags'])
+
+    def test_stream_shows_unchanged(self):
+        (reprocessed, out_loc) = self.run_combine('out')
+        before = self.read_outputs(out_loc)
+
+        (reprocessed, out_loc) = self.run_combine('out')
+        self.assertEqual(reprocessed, [])
+        self.assertEqual(self.read_outputs(out_loc), before)
+
+    def test_stream_shows_touched(self):
+        self.run_combine('out')
+        os.utime(self.source_files['A'], (1000000000, 1000000000))
+
+        (reprocessed, out_loc) = self.run_combine('out')
+        self.assertEqual(reprocessed, [])
+
+        combine_manifest = manifest.load_manifest(
+            manifest.get_manifest_location(out_loc)
+        )
+        self.assertEqual(combine_manifest.shows['A']['mtime'], 1000000000)
+
+    def test_stream_shows_workers(self):
+        (reprocessed, out_loc) = self.run_combine('out', workers=2)
+        (reprocessed, serial_loc) = self.run_combine('serial', workers=1)
+        self.assertEqual(
+            self.read_outputs(out_loc),
+            self.read_outputs(serial_loc)
+        )
+
+    def test_stream_shows_show_changed(self):
+        self.run_combine('out')
+
+        episodes = list(SHOW_EPISODES['B'])
+        episodes[1] = dict(episodes[1], date='2016-02-01', tags=['nyc'])
+        self.write_show('B', episodes)
+
+        (reprocessed, out_loc) = self.run_combine('out')
+        self.assertEqual(reprocessed, ['B'])
+        self.assert_same_as_full(out_loc)
+
+    def test_stream_shows_mapping_changed(self):
+        self.run_combine('out')
+
+        tag_mapping = dict(TAG_MAPPING, history='past')
+        (reprocessed, out_loc) = self.run_combine('out', tag_mapping)
+        self.assertEqual(reprocessed, ['B'])
+        self.assert_same_as_full(out_loc, tag_mapping)
+
+    def test_stream_shows_show_removed(self):
+        self.run_combine('out')
+
+        del self.source_files['B']
+        (reprocessed, out_loc) = self.run_combine('out')
+        self.assertEqual(reprocessed, [])
+
+        with open(out_loc) as f:
+            combined = json.load(f)
+        self.assertEqual(
+            set(map(lambda x: x['show'], combined['episodes'])),
+            set(['A'])
+        )
+
+    def test_stream_shows_failed(self):
+        (reprocessed, out_loc) = self.run_combine('out')
+        before = self.read_outputs(out_loc)
+
+        self.write_show('B', [{'name': 'b3'}])
+        with self.assertRaises(KeyError):
+            self.run_combine('out')
+
+        self.assertEqual(self.read_outputs(out_loc), before)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(out_loc))), [
+            'columnar.json',
+            'combined.json',
+            'combined.json.manifest',
+            'combined.json.parts',
+            'combined_cooccurrence.json',
+            'combined_rollups.json'
+        ])
+        self.assertEqual(
+            len(os.listdir(manifest.get_parts_directory(out_loc))),
+            2
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
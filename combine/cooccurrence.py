@@ -0,0 +1,220 @@
+"""Precomputed tag co-occurrence matrix for the combined podcast dataset.
+
+Logic to count, for every pair of tags, how many episodes have both tags along
+with the total duration of those episodes and the overlap score used by the
+visualizations' co-occurrence matrix:
+
+    overlap(a, b) = episodes(a, b) / (episodes(a, a) + episodes(b, b))
+
+where episodes(a, a) is simply the number of episodes with tag a. Computing
+this once when combining means the visualizations do not need to loop over
+every pair of every episode's tags when they load.
+
+The matrix is symmetric so only pairs where the first tag sorts at or before
+the second (including each tag with itself) are stored. It is sparse, saved as
+parallel lists of row index, column index, and values with tags referred to by
+their index in the sorted tag_names list. Sums use NumPy and SciPy when they
+are installed and fall back to plain Python otherwise with the same results.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import array
+import collections
+
+import json_stream
+
+try:
+    import numpy
+    import scipy.sparse
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+COOCCURRENCE_SUFFIX = '_cooccurrence'
+
+
+def get_cooccurrence_location(combined_loc):
+    """Get the location of the co-occurrence matrix for a combined JSON file.
+
+    @param combined_loc: Location of the combined JSON file (like
+        combined.json).
+    @type combined_loc: basestring
+    @return: Location of the matrix file (like combined_cooccurrence.json).
+    @rtype: basestring
+    """
+    return json_stream.get_sibling_location(combined_loc, COOCCURRENCE_SUFFIX)
+
+
+def normalize_number(value):
+    """Convert a total to an int if it has no fractional part.
+
+    Keeps the saved matrix the same regardless of whether sums were computed
+    with NumPy (as floats) or plain Python.
+
+    @param value: The total to normalize.
+    @type value: int or float
+    @return: The total as an int if whole and as a float otherwise.
+    @rtype: int or float
+    """
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def sum_pairs_python(rows, cols, durations):
+    """Sum the count and duration of each tag pair using plain Python.
+
+    @param rows: First tag index of each (episode, tag pair) entry.
+    @type rows: sequence of int
+    @param cols: Second tag index of each entry.
+    @type cols: sequence of int
+    @param durations: Duration of the episode for each entry.
+    @type durations: sequence of float
+    @return: Tuple of rows, cols, counts, and durations with a single entry
+        per distinct tag pair sorted by row and then column.
+    @rtype: tuple of list
+    """
+    totals = collections.defaultdict(lambda: [0, 0])
+    for (row, col, duration) in zip(rows, cols, durations):
+        entry = totals[(row, col)]
+        entry[0] += 1
+        entry[1] += duration
+
+    pairs = sorted(totals.items())
+    return (
+        map(lambda ((row, col), entry): row, pairs),
+        map(lambda ((row, col), entry): col, pairs),
+        map(lambda ((row, col), entry): entry[0], pairs),
+        map(lambda ((row, col), entry): entry[1], pairs)
+    )
+
+
+def sum_pairs_scipy(rows, cols, durations, num_tags):
+    """Sum the count and duration of each tag pair using SciPy sparse matrices.
+
+    @param rows: First tag index of each (episode, tag pair) entry.
+    @type rows: sequence of int
+    @param cols: Second tag index of each entry.
+    @type cols: sequence of int
+    @param durations: Duration of the episode for each entry.
+    @type durations: sequence of float
+    @param num_tags: The number of distinct tags.
+    @type num_tags: int
+    @return: Tuple of rows, cols, counts, and durations with a single entry
+        per distinct tag pair sorted by row and then column.
+    @rtype: tuple of list
+    """
+    rows = numpy.array(rows, dtype=numpy.int64)
+    cols = numpy.array(cols, dtype=numpy.int64)
+    shape = (num_tags, num_tags)
+
+    counts = scipy.sparse.coo_matrix(
+        (numpy.ones(len(rows)), (rows, cols)),
+        shape=shape
+    ).tocsr()
+    totals = scipy.sparse.coo_matrix(
+        (numpy.array(durations, dtype=numpy.float64), (rows, cols)),
+        shape=shape
+    ).tocsr()
+
+    counts.sort_indices()
+    totals.sort_indices()
+    counts = counts.tocoo()
+    totals = totals.tocoo()
+
+    return (
+        counts.row.tolist(),
+        counts.col.tolist(),
+        counts.data.tolist(),
+        totals.data.tolist()
+    )
+
+
+class CooccurrenceBuilder(object):
+    """Accumulator counting tag pairs as episodes are read."""
+
+    def __init__(self):
+        """Create a new builder with no episodes."""
+        self._tag_indices = {}
+        self._rows = array.array('l')
+        self._cols = array.array('l')
+        self._durations = array.array('d')
+
+    def _get_tag_index(self, tag):
+        """Get the index of a tag in order of first appearance.
+
+        @param tag: The tag to look up.
+        @type tag: basestring
+        @return: Index of the tag.
+        @rtype: int
+        """
+        return self._tag_indices.setdefault(tag, len(self._tag_indices))
+
+    def add_episode(self, episode):
+        """Count the tag pairs of an episode in the combined dataset.
+
+        Each pair is only counted once per episode even if a tag is repeated.
+
+        @param episode: Dictionary with duration and tags keys.
+        @type episode: dict
+        """
+        indices = sorted(set(map(self._get_tag_index, episode['tags'])))
+        duration = episode['duration']
+
+        for (i, row) in enumerate(indices):
+            for col in indices[i:]:
+                self._rows.append(row)
+                self._cols.append(col)
+                self._durations.append(duration)
+
+    def build(self):
+        """Get the co-occurrence matrix for the episodes added so far.
+
+        @return: JSON-serializable document with tag_names (sorted) and
+            parallel rows, cols, counts, durations, and overlap lists.
+        @rtype: dict
+        """
+        tag_names = sorted(self._tag_indices.keys())
+        rank = [0] * len(tag_names)
+        for (i, tag) in enumerate(tag_names):
+            rank[self._tag_indices[tag]] = i
+
+        rows = array.array('l', map(
+            lambda (row, col): min(rank[row], rank[col]),
+            zip(self._rows, self._cols)
+        ))
+        cols = array.array('l', map(
+            lambda (row, col): max(rank[row], rank[col]),
+            zip(self._rows, self._cols)
+        ))
+
+        if HAS_SCIPY:
+            sums = sum_pairs_scipy(rows, cols, self._durations, len(tag_names))
+        else:
+            sums = sum_pairs_python(rows, cols, self._durations)
+
+        (pair_rows, pair_cols, counts, durations) = sums
+        counts = map(normalize_number, counts)
+
+        diagonal = [0] * len(tag_names)
+        for (row, col, count) in zip(pair_rows, pair_cols, counts):
+            if row == col:
+                diagonal[row] = count
+
+        overlap = map(
+            lambda (row, col, count): (
+                float(count) / (diagonal[row] + diagonal[col])
+            ),
+            zip(pair_rows, pair_cols, counts)
+        )
+
+        return {
+            'tag_names': tag_names,
+            'rows': pair_rows,
+            'cols': pair_cols,
+            'counts': counts,
+            'durations': map(normalize_number, durations),
+            'overlap': overlap
+        }
+
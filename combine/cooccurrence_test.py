@@ -0,0 +1,102 @@
+"""Unit tests for the tag co-occurrence matrix.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import unittest
+
+import cooccurrence
+
+TEST_EPISODES = [
+    {'duration': 10, 'tags': ['history', 'science']},
+    {'duration': 20, 'tags': ['science', 'music', 'science']},
+    {'duration': 0, 'tags': ['music', 'history']},
+    {'duration': 7.5, 'tags': ['science']},
+    {'duration': 30, 'tags': []}
+]
+
+EXPECTED_MATRIX = {
+    'tag_names': ['history', 'music', 'science'],
+    'rows': [0, 0, 0, 1, 1, 2],
+    'cols': [0, 1, 2, 1, 2, 2],
+    'counts': [2, 1, 1, 2, 1, 3],
+    'durations': [10, 0, 10, 20, 20, 37.5],
+    'overlap': [0.5, 0.25, 0.2, 0.5, 0.2, 0.5]
+}
+
+
+class CooccurrenceTests(unittest.TestCase):
+
+    def build_matrix(self):
+        builder = cooccurrence.CooccurrenceBuilder()
+        for episode in TEST_EPISODES:
+            builder.add_episode(episode)
+        return builder.build()
+
+    def test_build(self):
+        self.assertEqual(self.build_matrix(), EXPECTED_MATRIX)
+
+    def test_build_brute_force(self):
+        matrix = self.build_matrix()
+        tag_names = matrix['tag_names']
+        for (row, col, count, duration) in zip(
+            matrix['rows'],
+            matrix['cols'],
+            matrix['counts'],
+            matrix['durations']
+        ):
+            matching = filter(
+                lambda x: tag_names[row] in x['tags'] and (
+                    tag_names[col] in x['tags']
+                ),
+                TEST_EPISODES
+            )
+            self.assertEqual(count, len(matching))
+            self.assertEqual(duration, sum(map(
+                lambda x: x['duration'],
+                matching
+            )))
+
+    def test_build_empty(self):
+        builder = cooccurrence.CooccurrenceBuilder()
+        builder.add_episode({'duration': 10, 'tags': []})
+        matrix = builder.build()
+
+        self.assertEqual(matrix['tag_names'], [])
+        self.assertEqual(matrix['rows'], [])
+        self.assertEqual(matrix['overlap'], [])
+
+    def test_build_python_fallback(self):
+        has_scipy = cooccurrence.HAS_SCIPY
+        cooccurrence.HAS_SCIPY = False
+        try:
+            self.assertEqual(self.build_matrix(), EXPECTED_MATRIX)
+        finally:
+            cooccurrence.HAS_SCIPY = has_scipy
+
+    @unittest.skipUnless(cooccurrence.HAS_SCIPY, 'requires NumPy and SciPy')
+    def test_sum_pairs_scipy(self):
+        rows = [2, 0, 1, 0, 2, 0, 1]
+        cols = [2, 1, 1, 1, 2, 0, 2]
+        durations = [7.5, 0, 0, 0, 2.5, 10, 0]
+
+        python_sums = cooccurrence.sum_pairs_python(rows, cols, durations)
+        scipy_sums = cooccurrence.sum_pairs_scipy(rows, cols, durations, 3)
+        self.assertEqual(scipy_sums, python_sums)
+        self.assertEqual(python_sums, (
+            [0, 0, 1, 1, 2],
+            [0, 1, 1, 2, 2],
+            [1, 2, 1, 1, 2],
+            [10, 0, 0, 0, 10]
+        ))
+
+    def test_get_cooccurrence_location(self):
+        self.assertEqual(
+            cooccurrence.get_cooccurrence_location('/out/combined.json'),
+            '/out/combined_cooccurrence.json'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+"""Logic to read and write large JSON documents incrementally.
+
+Logic to iterate over the items of an array within a JSON document without
+loading the whole document into memory and to write a document whose array
+items are produced one at a time. This lets the combine stage work with
+episode listings larger than would comfortably fit in memory.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import re
+import stat
+import tempfile
+
+CHUNK_SIZE = 64 * 1024
+
+SEPARATOR_REGEX = re.compile(r'[\s,]*')
+
+
+def get_new_file_mode():
+    """Get the permissions open gives a new file under the current umask.
+
+    @return: Permission bits (like 0644 under a umask of 022).
+    @rtype: int
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0666 & ~umask
+
+
+NEW_FILE_MODE = get_new_file_mode()
+
+
+def replace_file(temp_path, loc):
+    """Move a finished temporary file into place, replacing any file at loc.
+
+    Files from tempfile.mkstemp are only readable by their owner so the
+    temporary file is first given the permissions of the file it replaces or,
+    if there is none, the permissions open would have given a new file.
+
+    @param temp_path: The location of the finished temporary file.
+    @type temp_path: basestring
+    @param loc: The location to which the file should be moved.
+    @type loc: basestring
+    """
+    if os.path.exists(loc):
+        mode = stat.S_IMODE(os.stat(loc).st_mode)
+    else:
+        mode = NEW_FILE_MODE
+
+    os.chmod(temp_path, mode)
+    os.rename(temp_path, loc)
+
+
+def iterate_array(f, key, chunk_size=CHUNK_SIZE):
+    """Iterate over the items of an array within a JSON object.
+
+    Reads the file in chunks, decoding each array item as soon as it has been
+    read. The array is found by looking for its key so the document should not
+    contain that key (in quotes) as a string anywhere before the array itself.
+    Items are expected to be objects, arrays, or strings.
+
+    @param f: File-like object with the JSON document.
+    @type f: file-like object
+    @param key: The key of the array within the document (like episodes).
+    @type key: basestring
+    @keyword chunk_size: The number of bytes to read at a time. Defaults to
+        CHUNK_SIZE.
+    @type chunk_size: int
+    @return: Generator over the decoded items of the array in order.
+    @rtype: generator
+    @raise ValueError: Raised if the array cannot be found or the document ends
+        before the array does.
+    """
+    decoder = json.JSONDecoder()
+    start_regex = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+
+    buf = ''
+    while True:
+        match = start_regex.search(buf)
+        if match != None:
+            break
+
+        chunk = f.read(chunk_size)
+        if not chunk:
+            raise ValueError('Array %s not found' % key)
+        buf += chunk
+
+    pos = match.end()
+    while True:
+        pos = SEPARATOR_REGEX.match(buf, pos).end()
+        if pos == len(buf):
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError('Array %s not terminated' % key)
+            buf = chunk
+            pos = 0
+            continue
+
+        if buf[pos] == ']':
+            return
+
+        try:
+            (item, pos) = decoder.raw_decode(buf, pos)
+        except ValueError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+
+        yield item
+
+
+def encode(item):
+    """Encode an item as it is written by ArrayWriter.
+
+    @param item: The JSON-serializable item to encode.
+    @type item: object
+    @return: JSON encoding of the item on a single line with sorted keys.
+    @rtype: str
+    """
+    return json.dumps(item, sort_keys=True)
+
+
+def get_sibling_location(loc, suffix):
+    """Get the location of a file derived from and stored next to a JSON file.
+
+    @param loc: The location of the original JSON file (like combined.json).
+    @type loc: basestring
+    @param suffix: Suffix added to the original file's name before its
+        extension (like _cooccurrence).
+    @type suffix: basestring
+    @return: Location of the derived file (like combined_cooccurrence.json).
+    @rtype: basestring
+    """
+    (root, extension) = os.path.splitext(loc)
+    return root + suffix + (extension or '.json')
+
+
+def write_compact(loc, document):
+    """Write a JSON document without whitespace, replacing any prior file.
+
+    The document is written to a temporary file in the same directory as loc
+    which only replaces loc once complete.
+
+    @param loc: The location to which the document should be written.
+    @type loc: basestring
+    @param document: The JSON-serializable document to write.
+    @type document: object
+    """
+    directory = os.path.dirname(os.path.abspath(loc))
+    (handle, temp_path) = tempfile.mkstemp(dir=directory)
+    with os.fdopen(handle, 'w') as f:
+        json.dump(document, f, separators=(',', ':'), sort_keys=True)
+    replace_file(temp_path, loc)
+
+
+class ArrayWriter(object):
+    """Writer producing a JSON object with one array streamed item by item.
+
+    Output goes to a temporary file in the same directory as the target which
+    replaces the target only when the writer is closed so that a failure never
+    leaves a truncated file behind.
+    """
+
+    def __init__(self, loc, key):
+        """Create a new writer, starting a new temporary file.
+
+        @param loc: The location of the JSON file to write.
+        @type loc: basestring
+        @param key: The key of the streamed array (like episodes).
+        @type key: basestring
+        """
+        self._loc = loc
+        self.count = 0
+
+        directory = os.path.dirname(os.path.abspath(loc))
+        (handle, self._temp_path) = tempfile.mkstemp(dir=directory)
+        self._file = os.fdopen(handle, 'w')
+        self._file.write('{%s: [' % json.dumps(key))
+
+    def write(self, item):
+        """Append an item to the streamed array.
+
+        @param item: The JSON-serializable item to append.
+        @type item: object
+        """
+        self.write_encoded(encode(item))
+
+    def write_encoded(self, encoded_item):
+        """Append an item already encoded with encode to the streamed array.
+
+        @param encoded_item: The JSON encoding of the item.
+        @type encoded_item: str
+        """
+        if self.count > 0:
+            self._file.write(', ')
+        self._file.write(encoded_item)
+        self.count += 1
+
+    def get_directory(self):
+        """Get the directory in which the output file is written.
+
+        @return: Directory holding the output and its temporary file.
+        @rtype: str
+        """
+        return os.path.dirname(self._temp_path)
+
+    def close(self, other_values=None):
+        """Finish the document and atomically replace the target file.
+
+        @keyword other_values: Additional keys and values to include in the
+            object after the streamed array. Defaults to None.
+        @type other_values: dict
+        """
+        self._file.write(']')
+
+        for key in sorted((other_values or {}).keys()):
+            self._file.write(', %s: %s' % (
+                json.dumps(key),
+                json.dumps(other_values[key], sort_keys=True)
+            ))
+
+        self._file.write('}')
+        self._file.close()
+        replace_file(self._temp_path, self._loc)
+
+    def abort(self):
+        """Discard the output, leaving any existing target file unchanged."""
+        self._file.close()
+        os.remove(self._temp_path)
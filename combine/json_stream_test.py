@@ -0,0 +1,102 @@
+"""Unit tests for streaming JSON reading and writing.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import shutil
+import StringIO
+import tempfile
+import unittest
+
+import json_stream
+
+TEST_DOCUMENT = {
+    'name': 'test',
+    'episodes': [
+        {'name': 'a, b', 'tags': ['x]', '{y'], 'duration': 10},
+        {'name': 'c "d"', 'tags': [], 'duration': 2.5},
+        ['nested', [1, 2]],
+        'plain ] string'
+    ],
+    'shows': ['A']
+}
+
+
+class JSONStreamTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loc = os.path.join(self.directory, 'test.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_iterate_array(self):
+        f = StringIO.StringIO(json.dumps(TEST_DOCUMENT))
+        items = list(json_stream.iterate_array(f, 'episodes'))
+        self.assertEqual(items, TEST_DOCUMENT['episodes'])
+
+    def test_iterate_array_small_chunks(self):
+        contents = json.dumps(TEST_DOCUMENT, indent=4)
+        for chunk_size in [1, 2, 3, 7, 16]:
+            f = StringIO.StringIO(contents)
+            items = list(json_stream.iterate_array(f, 'episodes', chunk_size))
+            self.assertEqual(items, TEST_DOCUMENT['episodes'])
+
+    def test_iterate_array_empty(self):
+        f = StringIO.StringIO('{"episodes": [ ], "shows": []}')
+        self.assertEqual(list(json_stream.iterate_array(f, 'episodes', 2)), [])
+
+    def test_iterate_array_missing(self):
+        f = StringIO.StringIO('{"shows": []}')
+        with self.assertRaises(ValueError):
+            list(json_stream.iterate_array(f, 'episodes'))
+
+    def test_iterate_array_truncated(self):
+        f = StringIO.StringIO('{"episodes": [{"name": "a"}, {"name": ')
+        with self.assertRaises(ValueError):
+            list(json_stream.iterate_array(f, 'episodes', 4))
+
+    def test_array_writer(self):
+        writer = json_stream.ArrayWriter(self.loc, 'episodes')
+        for episode in TEST_DOCUMENT['episodes']:
+            writer.write(episode)
+        writer.close({'name': 'test', 'shows': ['A']})
+
+        self.assertEqual(writer.count, len(TEST_DOCUMENT['episodes']))
+        with open(self.loc) as f:
+            self.assertEqual(json.load(f), TEST_DOCUMENT)
+        with open(self.loc) as f:
+            self.assertEqual(
+                list(json_stream.iterate_array(f, 'episodes', 5)),
+                TEST_DOCUMENT['episodes']
+            )
+
+    def test_array_writer_abort(self):
+        with open(self.loc, 'w') as f:
+            json.dump({'episodes': []}, f)
+
+        writer = json_stream.ArrayWriter(self.loc, 'episodes')
+        writer.write({'name': 'a'})
+        writer.abort()
+
+        self.assertEqual(os.listdir(self.directory), ['test.json'])
+        with open(self.loc) as f:
+            self.assertEqual(json.load(f), {'episodes': []})
+
+    def test_get_sibling_location(self):
+        self.assertEqual(
+            json_stream.get_sibling_location('/out/combined.json', '_rollups'),
+            '/out/combined_rollups.json'
+        )
+        self.assertEqual(
+            json_stream.get_sibling_location('/out/combined', '_rollups'),
+            '/out/combined_rollups.json'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
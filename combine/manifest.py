@@ -0,0 +1,210 @@
+"""Record of the show files already combined and their cached results.
+
+Logic and structures to remember, between runs of the combine stage, which
+version of each show's JSON file was last combined along with that show's
+totals and the location of its already mapped episodes. A show only needs to
+be reprocessed if its file changed or if the tag mapping changed for a tag
+that appears in that show.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+import json_stream
+
+MANIFEST_EXTENSION = '.manifest'
+PARTS_EXTENSION = '.parts'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def get_manifest_location(out_loc):
+    """Get the location of the manifest for a combined JSON file.
+
+    @param out_loc: Location of the combined JSON file.
+    @type out_loc: basestring
+    @return: Location of the manifest for that file.
+    @rtype: basestring
+    """
+    return out_loc + MANIFEST_EXTENSION
+
+
+def get_parts_directory(out_loc):
+    """Get the directory holding cached per-show episodes for a combined file.
+
+    @param out_loc: Location of the combined JSON file.
+    @type out_loc: basestring
+    @return: Directory in which each show's mapped episodes are cached.
+    @rtype: basestring
+    """
+    return out_loc + PARTS_EXTENSION
+
+
+def hash_file(loc):
+    """Get the SHA1 digest of a file's contents.
+
+    @param loc: The location of the file.
+    @type loc: basestring
+    @return: Hex digest of the file's contents.
+    @rtype: str
+    """
+    digest = hashlib.sha1()
+    with open(loc, 'rb') as f:
+        chunk = f.read(HASH_CHUNK_SIZE)
+        while chunk:
+            digest.update(chunk)
+            chunk = f.read(HASH_CHUNK_SIZE)
+    return digest.hexdigest()
+
+
+def hash_relevant_mapping(mapper, source_tags):
+    """Get a digest of how the tag mapping renames the tags in a show.
+
+    @param mapper: The compiled tag mapping.
+    @type mapper: tag_mapper.TagMapper
+    @param source_tags: The (unmapped) tags appearing in the show.
+    @type source_tags: list of str
+    @return: Hex digest of the final name of each tag in source_tags.
+    @rtype: str
+    """
+    renamed = dict(zip(source_tags, mapper.map_tags(source_tags)))
+    return hashlib.sha1(json.dumps(renamed, sort_keys=True)).hexdigest()
+
+
+class CombineManifest(object):
+    """Record of each show's source file version and cached combine results."""
+
+    def __init__(self, loc, shows=None):
+        """Create a new manifest.
+
+        @param loc: The location to which this manifest is saved.
+        @type loc: basestring
+        @keyword shows: Entries by show name where each entry is a dictionary
+            with loc, size, mtime, sha1, source_tags, mapping_sha1, part, and
+            aggregate keys. Defaults to None (no shows).
+        @type shows: dict
+        """
+        self.loc = loc
+        self.shows = shows or {}
+
+    def is_current(self, name, loc, mapper):
+        """Determine if a show's cached results can be reused.
+
+        The file's contents are only hashed if its size or modification time
+        differ from those recorded. If the contents turn out to be unchanged,
+        the recorded size and modification time are refreshed so that the
+        file is not hashed again once this manifest is saved.
+
+        @param name: The name of the podcast (like This American Life).
+        @type name: basestring
+        @param loc: The location of the show's JSON file.
+        @type loc: basestring
+        @param mapper: The compiled tag mapping to be applied.
+        @type mapper: tag_mapper.TagMapper
+        @return: True if neither the show's file nor the tag mapping entries
+            for its tags have changed since its results were cached.
+        @rtype: bool
+        """
+        entry = self.shows.get(name)
+        if entry == None or entry['loc'] != loc:
+            return False
+
+        if not os.path.isfile(entry['part']):
+            return False
+
+        stat = os.stat(loc)
+        same_stat = stat.st_size == entry['size']
+        same_stat = same_stat and stat.st_mtime == entry['mtime']
+        if not same_stat:
+            if hash_file(loc) != entry['sha1']:
+                return False
+            entry['size'] = stat.st_size
+            entry['mtime'] = stat.st_mtime
+
+        mapping_sha1 = hash_relevant_mapping(mapper, entry['source_tags'])
+        return mapping_sha1 == entry['mapping_sha1']
+
+    def update(self, name, loc, mapper, aggregate, source_tags, part_loc):
+        """Record the results of combining a show.
+
+        @param name: The name of the podcast (like This American Life).
+        @type name: basestring
+        @param loc: The location of the show's JSON file.
+        @type loc: basestring
+        @param mapper: The compiled tag mapping applied.
+        @type mapper: tag_mapper.TagMapper
+        @param aggregate: The show's totals.
+        @type aggregate: dict
+        @param source_tags: The (unmapped) tags appearing in the show.
+        @type source_tags: list of str
+        @param part_loc: Location of the file with the show's mapped episodes.
+        @type part_loc: basestring
+        """
+        stat = os.stat(loc)
+        self.shows[name] = {
+            'loc': loc,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha1': hash_file(loc),
+            'source_tags': sorted(source_tags),
+            'mapping_sha1': hash_relevant_mapping(mapper, source_tags),
+            'part': part_loc,
+            'aggregate': aggregate
+        }
+
+    def get_aggregate(self, name):
+        """Get the cached totals for a show.
+
+        @param name: The name of the podcast (like This American Life).
+        @type name: basestring
+        @return: The show's totals as provided to update.
+        @rtype: dict
+        """
+        return self.shows[name]['aggregate']
+
+    def get_part(self, name):
+        """Get the location of the cached mapped episodes for a show.
+
+        @param name: The name of the podcast (like This American Life).
+        @type name: basestring
+        @return: Location of the file with the show's mapped episodes.
+        @rtype: basestring
+        """
+        return self.shows[name]['part']
+
+    def retain(self, names):
+        """Forget shows no longer being combined.
+
+        @param names: The names of the shows to keep.
+        @type names: collection of str
+        """
+        for name in self.shows.keys():
+            if not name in names:
+                del self.shows[name]
+
+    def save(self):
+        """Write this manifest to disk, replacing any prior version."""
+        directory = os.path.dirname(os.path.abspath(self.loc))
+        (handle, temp_path) = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'shows': self.shows}, f, sort_keys=True)
+        json_stream.replace_file(temp_path, self.loc)
+
+
+def load_manifest(loc):
+    """Load a combine manifest.
+
+    @param loc: The location of the manifest.
+    @type loc: basestring
+    @return: The loaded manifest or an empty manifest if none has been saved.
+    @rtype: CombineManifest
+    """
+    if not os.path.isfile(loc):
+        return CombineManifest(loc)
+
+    with open(loc) as f:
+        return CombineManifest(loc, json.load(f)['shows'])
@@ -1,32 +1,233 @@
-"""Short program renaming episode tags within a JSON file.
+"""Short program renaming episode tags within JSON files.
 
-Usage: python refine.py [TAG MAPPING] [TARGET FILE]
+Usage: python refine.py [TAG MAPPING] [TARGET FILE] [TARGET FILE (optional)]...
 
-Will open the JSON file at TARGET FILE and, in place, rename all tags matching
-keys in TAG MAPPING to the corresponding values in TAG MAPPING where TAG MAPPING
-is the location of a JSON file describing how tags should be renamed.
+Will open each JSON file matching TARGET FILE (which may be a glob pattern like
+data/*.json) and, in place, rename all tags matching keys in TAG MAPPING to the
+corresponding values in TAG MAPPING where TAG MAPPING is the location of a JSON
+file describing how tags should be renamed. The mapping is loaded once and the
+target files are refined in parallel, one worker process per core. If any
+TARGET FILE does not match an existing file, the unmatched names are reported
+and no files are refined.
+
+Each refined file gets a small marker file next to it recording the version of
+the tag mapping applied. Files which have not changed since they were refined
+with the current mapping are skipped so that re-running refine after editing a
+few files (or without editing the mapping) only touches what changed.
 
 @author: Sam Pottinger
 @license: MIT License
 """
 
+import glob
 import json
+import multiprocessing
+import os
 import sys
+import tempfile
+
+import json_stream
+import manifest
+import tag_mapper
+
+MARKER_EXTENSION = '.refined'
+
+USAGE_STR = ('python refine.py [tag mapping] [target file] '
+    '[target file (optional)]...')
+
+
+def get_marker_location(target_loc):
+    """Get the location of the marker recording how a file was refined.
+
+    @param target_loc: The location of the refined JSON file.
+    @type target_loc: basestring
+    @return: Location of the marker for that file.
+    @rtype: basestring
+    """
+    return target_loc + MARKER_EXTENSION
+
+
+def is_refined(target_loc, mapping_sha1):
+    """Determine if a file was already refined with the current tag mapping.
+
+    @param target_loc: The location of the JSON file to refine.
+    @type target_loc: basestring
+    @param mapping_sha1: Hex digest of the tag mapping file to be applied.
+    @type mapping_sha1: basestring
+    @return: True if the file has not changed since it was refined with the
+        tag mapping and False otherwise.
+    @rtype: bool
+    """
+    marker_loc = get_marker_location(target_loc)
+    if not os.path.isfile(marker_loc):
+        return False
+
+    with open(marker_loc) as f:
+        marker = json.load(f)
+
+    stat = os.stat(target_loc)
+    same_stat = stat.st_size == marker['size']
+    same_stat = same_stat and stat.st_mtime == marker['mtime']
+    return same_stat and marker['mapping_sha1'] == mapping_sha1
+
+
+def mark_refined(target_loc, mapping_sha1):
+    """Record that a file has been refined with a tag mapping.
+
+    The marker only replaces any prior marker once it is complete.
+
+    @param target_loc: The location of the refined JSON file.
+    @type target_loc: basestring
+    @param mapping_sha1: Hex digest of the tag mapping file applied.
+    @type mapping_sha1: basestring
+    """
+    stat = os.stat(target_loc)
+    write_atomically(get_marker_location(target_loc), {
+        'mapping_sha1': mapping_sha1,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime
+    })
+
+
+def write_atomically(loc, target):
+    """Write a JSON document, replacing any prior file only once complete.
+
+    The new file keeps the permissions of the file it replaces.
+
+    @param loc: The location to which the document should be written.
+    @type loc: basestring
+    @param target: The JSON-serializable document to write.
+    @type target: dict
+    """
+    directory = os.path.dirname(os.path.abspath(loc))
+    (handle, temp_path) = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(handle, 'w') as f:
+            json.dump(target, f)
+        json_stream.replace_file(temp_path, loc)
+    except:
+        os.remove(temp_path)
+        raise
+
+
+def refine_target(target, mapper):
+    """Rename the tags of every episode in a loaded JSON document.
+
+    @param target: The loaded document with an episodes list.
+    @type target: dict
+    @param mapper: The compiled tag mapping to apply.
+    @type mapper: tag_mapper.TagMapper
+    @return: True if any episode's tags changed and False otherwise.
+    @rtype: bool
+    """
+    changed = False
+    for episode in target['episodes']:
+        new_tags = mapper.map_unique_tags(episode['tags'])
+        changed = changed or new_tags != episode['tags']
+        episode['tags'] = new_tags
+    return changed
+
+
+def refine_file(refine_args):
+    """Refine a single JSON file in place unless it is already up to date.
+
+    @param refine_args: Tuple of the location of the JSON file to refine, the
+        compiled tag mapping, and the hex digest of the tag mapping file.
+    @type refine_args: tuple
+    @return: True if the file was rewritten and False if it was skipped or
+        already had the mapped tags.
+    @rtype: bool
+    """
+    (target_loc, mapper, mapping_sha1) = refine_args
+
+    if is_refined(target_loc, mapping_sha1):
+        return False
+
+    with open(target_loc) as f:
+        target = json.load(f)
+
+    changed = refine_target(target, mapper)
+    if changed:
+        write_atomically(target_loc, target)
+
+    mark_refined(target_loc, mapping_sha1)
+    return changed
+
+
+def expand_targets(patterns):
+    """Find the files matching target file names or glob patterns.
+
+    @param patterns: File names or glob patterns (like data/*.json).
+    @type patterns: list of str
+    @return: Tuple of the sorted unique locations of matching files (excluding
+        markers) and the patterns which did not match any file.
+    @rtype: tuple of list
+    """
+    locs = set()
+    unmatched = []
+    for pattern in patterns:
+        matches = filter(
+            lambda x: not x.endswith(MARKER_EXTENSION),
+            glob.glob(pattern)
+        )
+        if matches:
+            locs.update(matches)
+        else:
+            unmatched.append(pattern)
+
+    return (sorted(locs), unmatched)
+
+
+def refine_files(tag_mapping_loc, target_locs, workers=None):
+    """Refine many JSON files in place using a single tag mapping.
+
+    @param tag_mapping_loc: The location of the tag mapping JSON file.
+    @type tag_mapping_loc: basestring
+    @param target_locs: The locations of the JSON files to refine.
+    @type target_locs: list of str
+    @keyword workers: The number of worker processes to use. If 1, files are
+        refined within this process. If None, uses the number of cores on
+        this machine.
+    @type workers: int
+    @return: The locations of the files which were rewritten.
+    @rtype: list of str
+    """
+    mapper = tag_mapper.load_tag_mapper(tag_mapping_loc)
+    mapping_sha1 = manifest.hash_file(tag_mapping_loc)
+    refine_args = map(lambda x: (x, mapper, mapping_sha1), target_locs)
+
+    if workers == 1 or len(refine_args) <= 1:
+        results = map(refine_file, refine_args)
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            results = pool.map(refine_file, refine_args)
+        finally:
+            pool.close()
+            pool.join()
+
+    return map(
+        lambda (loc, rewritten): loc,
+        filter(lambda (loc, rewritten): rewritten, zip(target_locs, results))
+    )
+
+
+def main():
+    """Driver for the refine program."""
+    if len(sys.argv) < 3:
+        print USAGE_STR
+        sys.exit(1)
 
-tag_mapping_src = sys.argv[1]
-target_file = sys.argv[2]
+    (target_locs, unmatched) = expand_targets(sys.argv[2:])
+    if unmatched:
+        for pattern in unmatched:
+            print 'No files match %s' % pattern
+        sys.exit(1)
 
-with open(tag_mapping_src) as f:
-    tag_mapping = json.load(f)
+    rewritten = refine_files(sys.argv[1], target_locs)
 
-with open(target_file) as f:
-    target = json.load(f)
+    print 'Refined %d of %d files.' % (len(rewritten), len(target_locs))
 
-for episode in target['episodes']:
-    tags = episode['tags']
-    tags = map(lambda x: tag_mapping[x] if x in tag_mapping else x, tags)
-    tags = sorted(set(tags))
-    episode['tags'] = tags
 
-with open(target_file, 'w') as f:
-    json.dump(target, f)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Unit tests for renaming tags within JSON files in place.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import refine
+
+
+class RefineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.target_dir = os.path.join(self.directory, 'targets')
+        os.mkdir(self.target_dir)
+        self.mapping_loc = os.path.join(self.directory, 'mapping.json')
+        self.write_json(self.mapping_loc, {'cats': 'cat', 'nyc': 'new york'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_json(self, loc, contents):
+        with open(loc, 'w') as f:
+            json.dump(contents, f)
+
+    def read_json(self, loc):
+        with open(loc) as f:
+            return json.load(f)
+
+    def write_target(self, name, tags):
+        loc = os.path.join(self.target_dir, name)
+        self.write_json(loc, {'episodes': [{'name': 'a', 'tags': tags}]})
+        return loc
+
+    def read_tags(self, loc):
+        return self.read_json(loc)['episodes'][0]['tags']
+
+    def test_expand_targets(self):
+        first_loc = self.write_target('first.json', ['cats'])
+        second_loc = self.write_target('second.json', ['dog'])
+        refine.refine_files(self.mapping_loc, [first_loc], workers=1)
+        self.assertTrue(os.path.isfile(first_loc + refine.MARKER_EXTENSION))
+
+        pattern = os.path.join(self.target_dir, '*')
+        missing = os.path.join(self.target_dir, 'missing*.json')
+        self.assertEqual(
+            refine.expand_targets([pattern, first_loc, missing]),
+            ([first_loc, second_loc], [missing])
+        )
+
+    def test_refine_files(self):
+        loc = self.write_target('target.json', ['cats', 'NYC', 'nyc', 'dog'])
+
+        rewritten = refine.refine_files(self.mapping_loc, [loc], workers=1)
+        self.assertEqual(rewritten, [loc])
+        self.assertEqual(self.read_tags(loc), ['NYC', 'cat', 'dog', 'new york'])
+
+    def test_refine_files_workers(self):
+        locs = map(
+            lambda x: self.write_target('target%d.json' % x, ['cats']),
+            range(3)
+        )
+        unchanged_loc = self.write_target('unchanged.json', ['dog'])
+
+        rewritten = refine.refine_files(
+            self.mapping_loc,
+            locs + [unchanged_loc],
+            workers=2
+        )
+        self.assertEqual(rewritten, locs)
+        for loc in locs:
+            self.assertEqual(self.read_tags(loc), ['cat'])
+
+    def test_refine_files_skips_refined(self):
+        loc = self.write_target('target.json', ['cats'])
+        refine.refine_files(self.mapping_loc, [loc], workers=1)
+        self.assertEqual(self.read_tags(loc), ['cat'])
+
+        sha1 = refine.manifest.hash_file(self.mapping_loc)
+        os.utime(loc, (1000000000, 1000000000))
+        refine.mark_refined(loc, sha1)
+
+        self.write_target('target.json', ['nyc'])
+        os.utime(loc, (1000000000, 1000000000))
+
+        self.assertEqual(
+            refine.refine_files(self.mapping_loc, [loc], workers=1),
+            []
+        )
+        self.assertEqual(self.read_tags(loc), ['nyc'])
+
+    def test_refine_files_mapping_changed(self):
+        loc = self.write_target('target.json', ['cats'])
+        refine.refine_files(self.mapping_loc, [loc], workers=1)
+
+        self.write_json(self.mapping_loc, {'cats': 'cat', 'cat': 'feline'})
+        rewritten = refine.refine_files(self.mapping_loc, [loc], workers=1)
+        self.assertEqual(rewritten, [loc])
+        self.assertEqual(self.read_tags(loc), ['feline'])
+
+    def test_refine_files_target_changed(self):
+        loc = self.write_target('target.json', ['cats'])
+        refine.refine_files(self.mapping_loc, [loc], workers=1)
+        sha1 = refine.manifest.hash_file(self.mapping_loc)
+
+        stat = os.stat(loc)
+        os.utime(loc, (stat.st_atime, stat.st_mtime + 10))
+        self.assertFalse(refine.is_refined(loc, sha1))
+
+        self.write_target('target.json', ['cat', 'nyc'])
+        rewritten = refine.refine_files(self.mapping_loc, [loc], workers=1)
+        self.assertEqual(rewritten, [loc])
+        self.assertEqual(self.read_tags(loc), ['cat', 'new york'])
+        self.assertTrue(refine.is_refined(loc, sha1))
+
+    def test_refine_files_unchanged_tags(self):
+        loc = self.write_target('target.json', ['cat', 'dog'])
+        with open(loc) as f:
+            contents = f.read()
+        stat = os.stat(loc)
+        os.utime(loc, (stat.st_atime, stat.st_mtime - 10))
+        mtime = os.stat(loc).st_mtime
+
+        rewritten = refine.refine_files(self.mapping_loc, [loc], workers=1)
+        self.assertEqual(rewritten, [])
+        self.assertEqual(os.stat(loc).st_mtime, mtime)
+        with open(loc) as f:
+            self.assertEqual(f.read(), contents)
+
+        sha1 = refine.manifest.hash_file(self.mapping_loc)
+        self.assertTrue(refine.is_refined(loc, sha1))
+
+
+if __name__ == '__main__':
+    unittest.main()
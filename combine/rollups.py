@@ -0,0 +1,250 @@
+"""Pre-aggregated timelines of episodes for the combined podcast dataset.
+
+Logic to total the number of episodes and their duration by month and by year
+for each show and by month for each tag. Totals are stored as dense lists
+indexed by offset from the first month (or year) in the dataset so that the
+visualizations can draw timelines without grouping every episode by date when
+they load:
+
+    shows.monthly_episodes[show index][month offset]
+
+where month offset 0 is start_month (like 2005-01) and there are num_months
+entries in each list (likewise for years with start_year and num_years). Most
+tags only appear in a handful of months so each tag's lists instead start at
+the month offset given in tags.month_offsets and end at the last month in
+which that tag appears:
+
+    tags.monthly_episodes[tag index][month offset - month_offsets[tag index]]
+
+Show and tag indices refer to the sorted show_names and tag_names lists.
+Episodes without a date are not included and each of an episode's tags is only
+counted once even if repeated.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+
+import json_stream
+
+ROLLUPS_SUFFIX = '_rollups'
+
+MONTHS_PER_YEAR = 12
+
+
+def get_rollups_location(combined_loc):
+    """Get the location of the time rollups for a combined JSON file.
+
+    @param combined_loc: Location of the combined JSON file (like
+        combined.json).
+    @type combined_loc: basestring
+    @return: Location of the rollups file (like combined_rollups.json).
+    @rtype: basestring
+    """
+    return json_stream.get_sibling_location(combined_loc, ROLLUPS_SUFFIX)
+
+
+def get_month_number(date_str):
+    """Get the number of months between year zero and an episode's date.
+
+    @param date_str: ISO 8601 date (like 2014-04-23) optionally followed by a
+        time.
+    @type date_str: basestring
+    @return: year * 12 + month - 1
+    @rtype: int
+    """
+    (year, month) = date_str.split('-')[:2]
+    return int(year) * MONTHS_PER_YEAR + int(month) - 1
+
+
+def format_month(month_number):
+    """Describe a month number as returned by get_month_number.
+
+    @param month_number: The month to describe.
+    @type month_number: int
+    @return: The month formatted as YYYY-MM (like 2014-04).
+    @rtype: str
+    """
+    (year, month) = divmod(month_number, MONTHS_PER_YEAR)
+    return '%04d-%02d' % (year, month + 1)
+
+
+def create_timeline_entry():
+    """Create the totals kept for one name (show or tag) in one time bucket.
+
+    @return: List with the number of episodes and their total duration.
+    @rtype: list of int
+    """
+    return [0, 0]
+
+
+def densify(totals, names, start, length):
+    """Convert sparse totals into dense per-name lists.
+
+    @param totals: Totals (list of episode count and duration) keyed by tuple
+        of name and bucket number.
+    @type totals: dict
+    @param names: The names in output order.
+    @type names: list of str
+    @param start: The bucket number at offset zero.
+    @type start: int
+    @param length: The number of buckets in each list.
+    @type length: int
+    @return: Tuple of episode counts and durations, each a list with one list
+        of length entries per name.
+    @rtype: tuple of list
+    """
+    name_indices = dict(map(lambda (i, name): (name, i), enumerate(names)))
+    episodes = map(lambda x: [0] * length, names)
+    durations = map(lambda x: [0] * length, names)
+
+    for ((name, bucket), (count, duration)) in totals.iteritems():
+        name_index = name_indices[name]
+        episodes[name_index][bucket - start] = count
+        durations[name_index][bucket - start] = duration
+
+    return (episodes, durations)
+
+
+def densify_trimmed(totals, names, start):
+    """Convert sparse totals into per-name lists covering only active buckets.
+
+    @param totals: Totals (list of episode count and duration) keyed by tuple
+        of name and bucket number.
+    @type totals: dict
+    @param names: The names in output order.
+    @type names: list of str
+    @param start: The bucket number at offset zero.
+    @type start: int
+    @return: Tuple of offsets, episode counts, and durations. Offsets has the
+        offset of the first bucket in which each name appears. Counts and
+        durations each have one list per name running from that name's first
+        to last bucket.
+    @rtype: tuple of list
+    """
+    buckets_by_name = collections.defaultdict(list)
+    for (name, bucket) in totals.iterkeys():
+        buckets_by_name[name].append(bucket)
+
+    first_buckets = map(lambda x: min(buckets_by_name[x]), names)
+    last_buckets = map(lambda x: max(buckets_by_name[x]), names)
+
+    offsets = map(lambda x: x - start, first_buckets)
+    episodes = map(
+        lambda (first, last): [0] * (last - first + 1),
+        zip(first_buckets, last_buckets)
+    )
+    durations = map(lambda x: [0] * len(x), episodes)
+
+    name_indices = dict(map(lambda (i, name): (name, i), enumerate(names)))
+    for ((name, bucket), (count, duration)) in totals.iteritems():
+        name_index = name_indices[name]
+        position = bucket - start - offsets[name_index]
+        episodes[name_index][position] = count
+        durations[name_index][position] = duration
+
+    return (offsets, episodes, durations)
+
+
+class RollupBuilder(object):
+    """Accumulator totaling episodes by show or tag and time bucket."""
+
+    def __init__(self):
+        """Create a new builder with no episodes."""
+        self._show_months = collections.defaultdict(create_timeline_entry)
+        self._tag_months = collections.defaultdict(create_timeline_entry)
+        self._show_names = set()
+        self._tag_names = set()
+
+    def add_episode(self, episode):
+        """Add an episode in the combined dataset to the totals.
+
+        @param episode: Dictionary with show, date, duration, and tags keys.
+        @type episode: dict
+        """
+        if not episode['date']:
+            return
+
+        month_number = get_month_number(episode['date'])
+        duration = episode['duration']
+
+        self._show_names.add(episode['show'])
+        entry = self._show_months[(episode['show'], month_number)]
+        entry[0] += 1
+        entry[1] += duration
+
+        for tag in set(episode['tags']):
+            self._tag_names.add(tag)
+            entry = self._tag_months[(tag, month_number)]
+            entry[0] += 1
+            entry[1] += duration
+
+    def build(self):
+        """Get the rollups for the episodes added so far.
+
+        @return: JSON-serializable document with start_month, num_months,
+            start_year, num_years, shows (show_names and monthly and yearly
+            episodes and duration lists), and tags (tag_names, month_offsets,
+            and monthly episodes and duration lists).
+        @rtype: dict
+        """
+        month_numbers = map(lambda (name, month): month, self._show_months)
+        if len(month_numbers) == 0:
+            start_month = 0
+            num_months = 0
+        else:
+            start_month = min(month_numbers)
+            num_months = max(month_numbers) - start_month + 1
+
+        show_years = collections.defaultdict(create_timeline_entry)
+        for ((show, month), (count, duration)) in self._show_months.items():
+            entry = show_years[(show, month / MONTHS_PER_YEAR)]
+            entry[0] += count
+            entry[1] += duration
+
+        start_year = start_month / MONTHS_PER_YEAR
+        if num_months == 0:
+            num_years = 0
+        else:
+            end_year = (start_month + num_months - 1) / MONTHS_PER_YEAR
+            num_years = end_year - start_year + 1
+
+        show_names = sorted(self._show_names)
+        tag_names = sorted(self._tag_names)
+
+        (show_monthly_episodes, show_monthly_duration) = densify(
+            self._show_months,
+            show_names,
+            start_month,
+            num_months
+        )
+        (show_yearly_episodes, show_yearly_duration) = densify(
+            show_years,
+            show_names,
+            start_year,
+            num_years
+        )
+        (tag_offsets, tag_monthly_episodes, tag_monthly_duration) = (
+            densify_trimmed(self._tag_months, tag_names, start_month)
+        )
+
+        return {
+            'start_month': format_month(start_month) if num_months else None,
+            'num_months': num_months,
+            'start_year': start_year if num_years else None,
+            'num_years': num_years,
+            'shows': {
+                'show_names': show_names,
+                'monthly_episodes': show_monthly_episodes,
+                'monthly_duration': show_monthly_duration,
+                'yearly_episodes': show_yearly_episodes,
+                'yearly_duration': show_yearly_duration
+            },
+            'tags': {
+                'tag_names': tag_names,
+                'month_offsets': tag_offsets,
+                'monthly_episodes': tag_monthly_episodes,
+                'monthly_duration': tag_monthly_duration
+            }
+        }
@@ -0,0 +1,122 @@
+"""Unit tests for the per month and per year episode totals.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import unittest
+
+import rollups
+
+TEST_EPISODES = [
+    {'show': 'A', 'date': '2013-11-20', 'duration': 10, 'tags': ['x']},
+    {
+        'show': 'A',
+        'date': '2013-11-02T08:00:00',
+        'duration': 20,
+        'tags': ['x', 'y', 'x']
+    },
+    {'show': 'B', 'date': '2014-01-15', 'duration': 5, 'tags': ['y']},
+    {'show': 'A', 'date': '2014-02-01', 'duration': 30, 'tags': []},
+    {'show': 'C', 'date': None, 'duration': 99, 'tags': ['x', 'z']}
+]
+
+EXPECTED_ROLLUPS = {
+    'start_month': '2013-11',
+    'num_months': 4,
+    'start_year': 2013,
+    'num_years': 2,
+    'shows': {
+        'show_names': ['A', 'B'],
+        'monthly_episodes': [[2, 0, 0, 1], [0, 0, 1, 0]],
+        'monthly_duration': [[30, 0, 0, 30], [0, 0, 5, 0]],
+        'yearly_episodes': [[2, 1], [0, 1]],
+        'yearly_duration': [[30, 30], [0, 5]]
+    },
+    'tags': {
+        'tag_names': ['x', 'y'],
+        'month_offsets': [0, 0],
+        'monthly_episodes': [[2], [1, 0, 1]],
+        'monthly_duration': [[30], [20, 0, 5]]
+    }
+}
+
+
+class RollupsTests(unittest.TestCase):
+
+    def build_rollups(self, episodes):
+        builder = rollups.RollupBuilder()
+        for episode in episodes:
+            builder.add_episode(episode)
+        return builder.build()
+
+    def test_month_number(self):
+        month_number = rollups.get_month_number('2014-04-23T10:00:00')
+        self.assertEqual(rollups.format_month(month_number), '2014-04')
+        self.assertEqual(
+            rollups.get_month_number('2015-01-01') - month_number,
+            9
+        )
+
+    def test_build(self):
+        self.assertEqual(self.build_rollups(TEST_EPISODES), EXPECTED_ROLLUPS)
+
+    def test_build_month_offsets(self):
+        built = self.build_rollups(TEST_EPISODES[2:4] + TEST_EPISODES[:1])
+        self.assertEqual(built['tags']['tag_names'], ['x', 'y'])
+        self.assertEqual(built['tags']['month_offsets'], [0, 2])
+        self.assertEqual(built['tags']['monthly_episodes'], [[1], [1]])
+        self.assertEqual(built['tags']['monthly_duration'], [[10], [5]])
+
+    def test_build_brute_force(self):
+        built = self.build_rollups(TEST_EPISODES)
+        start_month = rollups.get_month_number(built['start_month'])
+        dated = filter(lambda x: x['date'], TEST_EPISODES)
+
+        def total(matching, offset):
+            matching = filter(
+                lambda x: rollups.get_month_number(x['date']) == (
+                    start_month + offset
+                ),
+                matching
+            )
+            return [len(matching), sum(map(lambda x: x['duration'], matching))]
+
+        shows = built['shows']
+        for (index, show) in enumerate(shows['show_names']):
+            matching = filter(lambda x: x['show'] == show, dated)
+            for offset in range(built['num_months']):
+                self.assertEqual(total(matching, offset), [
+                    shows['monthly_episodes'][index][offset],
+                    shows['monthly_duration'][index][offset]
+                ])
+
+        tags = built['tags']
+        for (index, tag) in enumerate(tags['tag_names']):
+            matching = filter(lambda x: tag in x['tags'], dated)
+            first_offset = tags['month_offsets'][index]
+            for (position, count) in enumerate(tags['monthly_episodes'][index]):
+                self.assertEqual(total(matching, first_offset + position), [
+                    count,
+                    tags['monthly_duration'][index][position]
+                ])
+
+    def test_build_empty(self):
+        built = self.build_rollups([
+            {'show': 'A', 'date': None, 'duration': 5, 'tags': ['a']}
+        ])
+        self.assertEqual(built['start_month'], None)
+        self.assertEqual(built['num_months'], 0)
+        self.assertEqual(built['num_years'], 0)
+        self.assertEqual(built['shows']['show_names'], [])
+        self.assertEqual(built['tags']['tag_names'], [])
+
+    def test_get_rollups_location(self):
+        self.assertEqual(
+            rollups.get_rollups_location('/out/combined.json'),
+            '/out/combined_rollups.json'
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
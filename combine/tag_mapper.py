@@ -0,0 +1,173 @@
+"""Compiled engine renaming episode tags according to a tag mapping.
+
+Logic and structures to apply a tag mapping (a JSON object whose keys are tags
+and whose values are what those tags should be renamed to) to many episodes.
+The mapping is compiled once when loaded:
+
+    - Chained renames (like "nyc" to "new york city" to "new york") are
+      resolved to their final name.
+    - Keys starting with "re:" are treated as regular expression rules where
+      any tag fully matching the expression is renamed to the rule's value
+      (which may use backreferences like \\1). Literal keys take precedence over
+      rules and rules are tried in order of their keys.
+    - Tags can optionally be case-folded (lowercased) before being mapped.
+
+Each distinct tag is only resolved once with its result remembered so that
+mapping a large corpus mostly consists of single dictionary lookups and all
+episodes share a single copy of each resulting tag string.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import re
+
+PATTERN_PREFIX = 're:'
+
+
+class TagMapper(object):
+    """Precompiled tag mapping applied to episode tag lists."""
+
+    def __init__(self, tag_mapping, case_fold=False):
+        """Compile a tag mapping.
+
+        @param tag_mapping: Dictionary mapping the original name of a tag (or a
+            regular expression prefixed with PATTERN_PREFIX) to what that tag
+            should be called.
+        @type tag_mapping: dict
+        @keyword case_fold: If True, tags and literal mapping keys are
+            lowercased before being compared and unmapped tags are returned
+            lowercased. Defaults to False.
+        @type case_fold: bool
+        """
+        self._case_fold = case_fold
+        self._interned = {}
+        self._resolved = {}
+
+        literal_mapping = {}
+        patterns = []
+        for (key, value) in sorted(tag_mapping.items()):
+            if key.startswith(PATTERN_PREFIX):
+                expression = key[len(PATTERN_PREFIX):]
+                patterns.append((re.compile(expression + '$'), value))
+            else:
+                literal_mapping[self._fold(key)] = value
+
+        self._patterns = patterns
+        self._literal_mapping = dict(map(
+            lambda x: (x, self._intern(self._follow_chain(literal_mapping, x))),
+            literal_mapping.keys()
+        ))
+
+    def _fold(self, tag):
+        """Case-fold a tag if this mapper is case-insensitive.
+
+        @param tag: The tag to fold.
+        @type tag: basestring
+        @return: The tag lowercased if case folding and unchanged otherwise.
+        @rtype: basestring
+        """
+        return tag.lower() if self._case_fold else tag
+
+    def _intern(self, tag):
+        """Get the single shared copy of a tag string.
+
+        @param tag: The tag to intern.
+        @type tag: basestring
+        @return: Equal string shared by all uses of this tag.
+        @rtype: basestring
+        """
+        return self._interned.setdefault(tag, tag)
+
+    def _follow_chain(self, literal_mapping, tag):
+        """Follow a tag through chained renames to its final name.
+
+        @param literal_mapping: The (folded) literal renames.
+        @type literal_mapping: dict
+        @param tag: The (folded) tag to resolve.
+        @type tag: basestring
+        @return: The final name of the tag. If the renames form a cycle, the
+            last name reached before revisiting a name.
+        @rtype: basestring
+        """
+        seen = set([tag])
+        while tag in literal_mapping:
+            next_tag = self._fold(literal_mapping[tag])
+            if next_tag in seen:
+                return tag
+            seen.add(next_tag)
+            tag = next_tag
+        return tag
+
+    def _resolve(self, folded_tag):
+        """Determine the final name for a (folded) tag not seen before.
+
+        @param folded_tag: The tag to resolve.
+        @type folded_tag: basestring
+        @return: The final name of the tag.
+        @rtype: basestring
+        """
+        if folded_tag in self._literal_mapping:
+            return self._literal_mapping[folded_tag]
+
+        for (pattern, value) in self._patterns:
+            match = pattern.match(folded_tag)
+            if match != None:
+                renamed = self._fold(match.expand(value))
+                return self._literal_mapping.get(renamed, self._intern(renamed))
+
+        return self._intern(folded_tag)
+
+    def map_tag(self, tag):
+        """Get the final name of a single tag.
+
+        @param tag: The original tag.
+        @type tag: basestring
+        @return: The tag after case folding (if enabled) and renaming.
+        @rtype: basestring
+        """
+        resolved = self._resolved.get(tag)
+        if resolved == None:
+            resolved = self._resolve(self._fold(tag))
+            self._resolved[tag] = resolved
+        return resolved
+
+    def map_tags(self, tags):
+        """Rename each tag in a list.
+
+        @param tags: The original tags.
+        @type tags: list of str
+        @return: Renamed tags in the same order (including duplicates).
+        @rtype: list of str
+        """
+        resolved = self._resolved
+        return map(
+            lambda x: resolved[x] if x in resolved else self.map_tag(x),
+            tags
+        )
+
+    def map_unique_tags(self, tags):
+        """Rename each tag in a list, removing duplicates.
+
+        @param tags: The original tags.
+        @type tags: list of str
+        @return: Sorted unique renamed tags.
+        @rtype: list of str
+        """
+        return sorted(set(self.map_tags(tags)))
+
+
+def load_tag_mapper(loc, case_fold=False):
+    """Load and compile a tag mapping from a JSON file.
+
+    @param loc: The location of the JSON file with the tag mapping.
+    @type loc: basestring
+    @keyword case_fold: If True, tags are compared case-insensitively. Defaults
+        to False.
+    @type case_fold: bool
+    @return: The compiled mapping.
+    @rtype: TagMapper
+    """
+    with open(loc) as f:
+        return TagMapper(json.load(f), case_fold)
@@ -0,0 +1,85 @@
+"""Unit tests for the compiled tag mapping.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import unittest
+
+import tag_mapper
+
+
+class TagMapperTests(unittest.TestCase):
+
+    def test_map_tag_unmapped(self):
+        mapper = tag_mapper.TagMapper({'a': 'b'})
+        self.assertEqual(mapper.map_tag('c'), 'c')
+
+    def test_map_tag_chain(self):
+        mapper = tag_mapper.TagMapper({
+            'nyc': 'new york city',
+            'new york city': 'new york',
+            'new york': 'new york state'
+        })
+        self.assertEqual(mapper.map_tag('nyc'), 'new york state')
+        self.assertEqual(mapper.map_tag('new york city'), 'new york state')
+
+    def test_map_tag_cycle(self):
+        mapper = tag_mapper.TagMapper({'a': 'b', 'b': 'c', 'c': 'a', 'd': 'd'})
+        self.assertEqual(mapper.map_tag('a'), 'c')
+        self.assertEqual(mapper.map_tag('b'), 'a')
+        self.assertEqual(mapper.map_tag('c'), 'b')
+        self.assertEqual(mapper.map_tag('d'), 'd')
+
+    def test_map_tag_pattern(self):
+        mapper = tag_mapper.TagMapper({'re:b(.*)s': 'b\\1'})
+        self.assertEqual(mapper.map_tag('bats'), 'bat')
+        self.assertEqual(mapper.map_tag('abats'), 'abats')
+        self.assertEqual(mapper.map_tag('batsman'), 'batsman')
+
+    def test_map_tag_pattern_precedence(self):
+        mapper = tag_mapper.TagMapper({
+            'bats': 'flying mammals',
+            're:b(.*)s': 'b\\1',
+            're:(.*)t': '\\1'
+        })
+        self.assertEqual(mapper.map_tag('bats'), 'flying mammals')
+        self.assertEqual(mapper.map_tag('bits'), 'bit')
+        self.assertEqual(mapper.map_tag('cat'), 'ca')
+
+    def test_map_tag_pattern_chain(self):
+        mapper = tag_mapper.TagMapper({
+            're:(.*)s': '\\1',
+            'cat': 'animals',
+            'animals': 'animal'
+        })
+        self.assertEqual(mapper.map_tag('cats'), 'animal')
+
+    def test_map_tag_case_fold(self):
+        mapper = tag_mapper.TagMapper(
+            {'NYC': 'New York', 're:(.*) CITY': '\\1'},
+            case_fold=True
+        )
+        self.assertEqual(mapper.map_tag('nyc'), 'new york')
+        self.assertEqual(mapper.map_tag('Nyc'), 'new york')
+        self.assertEqual(mapper.map_tag('Other'), 'other')
+        self.assertEqual(mapper.map_tag('Boston'), 'boston')
+
+    def test_map_tag_case_sensitive(self):
+        mapper = tag_mapper.TagMapper({'NYC': 'New York'})
+        self.assertEqual(mapper.map_tag('nyc'), 'nyc')
+        self.assertEqual(mapper.map_tag('NYC'), 'New York')
+
+    def test_map_tags(self):
+        mapper = tag_mapper.TagMapper({'a': 'c', 'b': 'c'})
+        self.assertEqual(mapper.map_tags(['b', 'd', 'a']), ['c', 'd', 'c'])
+        self.assertEqual(mapper.map_unique_tags(['b', 'd', 'a']), ['c', 'd'])
+
+    def test_map_tags_shared(self):
+        mapper = tag_mapper.TagMapper({'a': 'same', 'b': 'same'})
+        (first, second) = mapper.map_tags(['a', 'b'])
+        self.assertTrue(first is second)
+
+
+if __name__ == '__main__':
+    unittest.main()
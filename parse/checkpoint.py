@@ -0,0 +1,126 @@
+"""Journal of completed work allowing interrupted crawls to resume.
+
+Logic and structures to record each episode page as soon as it is downloaded
+and parsed so that, if a long crawl dies partway through (network failure, a
+page the parser does not understand, etc), a later run can pick up where the
+crawl stopped instead of starting over. The journal is an append-only file
+next to the crawl's output JSON file with one JSON object per line containing
+the URL of a completed page and the record parsed from it.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+import json
+import os
+
+import common
+
+JOURNAL_EXTENSION = '.journal'
+
+
+def get_journal_location(episodes_loc):
+    """Get the location of the journal for a crawl's output JSON file.
+
+    @param episodes_loc: Location of the JSON file to which the crawl writes.
+    @type episodes_loc: basestring
+    @return: Location of the journal for that crawl.
+    @rtype: basestring
+    """
+    return episodes_loc + JOURNAL_EXTENSION
+
+
+class CrawlJournal(object):
+    """Append-only record of pages already crawled and their parsed records."""
+
+    def __init__(self, loc, resume=False):
+        """Open a journal, either resuming or replacing a prior journal.
+
+        @param loc: The location of the journal file.
+        @type loc: basestring
+        @keyword resume: If True, keep and load the records of a prior journal
+            at loc. If False, discard any prior journal. Defaults to False.
+        @type resume: bool
+        """
+        self.loc = loc
+        self.records = collections.OrderedDict()
+        self._encoder = common.DateJSONEncoder()
+
+        if resume and os.path.isfile(loc):
+            self._file = open(loc, 'r+')
+            self._file.truncate(self._load())
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self._file = open(loc, 'w')
+
+    def _load(self):
+        """Read the records of a prior journal at this journal's location.
+
+        Reading stops at the first line that is incomplete or cannot be decoded
+        as that line was likely cut short by the crash which interrupted the
+        prior crawl.
+
+        @return: The number of bytes at the start of the journal file holding
+            complete entries.
+        @rtype: int
+        """
+        valid_size = 0
+
+        with open(self.loc) as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                self.records[entry['loc']] = entry['record']
+                valid_size += len(line)
+
+        return valid_size
+
+    def __contains__(self, loc):
+        """Determine if a page has already been crawled.
+
+        @param loc: The URL of the page.
+        @type loc: basestring
+        @return: True if the page has a record in the journal and False
+            otherwise.
+        @rtype: bool
+        """
+        return loc in self.records
+
+    def get(self, loc):
+        """Get the record parsed from a page already crawled.
+
+        @param loc: The URL of the page.
+        @type loc: basestring
+        @return: The record saved for the page.
+        @rtype: dict
+        """
+        return self.records[loc]
+
+    def record(self, loc, record):
+        """Save the record parsed from a page, writing it to disk immediately.
+
+        @param loc: The URL of the page.
+        @type loc: basestring
+        @param record: The record parsed from the page.
+        @type record: dict
+        """
+        self._file.write(self._encoder.encode({'loc': loc, 'record': record}))
+        self._file.write('\n')
+        self._file.flush()
+        self.records[loc] = record
+
+    def close(self):
+        """Close the journal file, keeping it on disk for a later resume."""
+        self._file.close()
+
+    def remove(self):
+        """Close and delete the journal once its crawl has been saved."""
+        self.close()
+        os.remove(self.loc)
@@ -0,0 +1,71 @@
+"""Unit tests for the crawl checkpoint journal.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import checkpoint
+
+
+class CrawlJournalTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loc = os.path.join(self.directory, 'episodes.json.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_and_resume(self):
+        journal = checkpoint.CrawlJournal(self.loc)
+        journal.record('/1', {'name': 'a', 'date': datetime.date(2015, 1, 2)})
+        journal.record('/2', {'name': 'b'})
+        journal.close()
+
+        resumed = checkpoint.CrawlJournal(self.loc, resume=True)
+        self.assertTrue('/1' in resumed)
+        self.assertFalse('/3' in resumed)
+        self.assertEqual(resumed.get('/1'), {'name': 'a', 'date': '2015-01-02'})
+        self.assertEqual(resumed.records.keys(), ['/1', '/2'])
+
+        resumed.record('/3', {'name': 'c'})
+        resumed.close()
+
+        self.assertEqual(
+            checkpoint.CrawlJournal(self.loc, resume=True).records.keys(),
+            ['/1', '/2', '/3']
+        )
+
+    def test_resume_truncated(self):
+        with open(self.loc, 'w') as f:
+            f.write('{"loc": "/1", "record": {"name": "a"}}\n{"loc": "/2", "re')
+
+        journal = checkpoint.CrawlJournal(self.loc, resume=True)
+        self.assertEqual(journal.records.keys(), ['/1'])
+        journal.record('/3', {'name': 'c'})
+        journal.close()
+
+        self.assertEqual(
+            checkpoint.CrawlJournal(self.loc, resume=True).records.keys(),
+            ['/1', '/3']
+        )
+
+    def test_no_resume_discards(self):
+        journal = checkpoint.CrawlJournal(self.loc)
+        journal.record('/1', {'name': 'a'})
+        journal.close()
+
+        journal = checkpoint.CrawlJournal(self.loc)
+        self.assertFalse('/1' in journal)
+        journal.remove()
+        self.assertFalse(os.path.isfile(self.loc))
+
+
+if __name__ == '__main__':
+    unittest.main()
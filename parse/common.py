@@ -7,13 +7,54 @@
 import collections
 import datetime
 import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import re
 import rfc822
+import stat
+import tempfile
+import threading
+import time
+import urlparse
+import xml.etree.cElementTree
 
+import bs4
 import nltk
+import requests
+import requests.adapters
+import requests.packages.urllib3.util.retry
+
+import response_cache
+
+try:
+    import lxml
+    SOUP_FEATURES = 'lxml'
+except ImportError:
+    SOUP_FEATURES = 'html.parser'
 
 
 DEFAULT_HEADERS = {'User-Agent': 'Digital Anthropology Podcast Crawler'}
 
+HTTP_POOL_SIZE = 10
+HTTP_RETRIES = 3
+HTTP_BACKOFF = 0.5
+HTTP_RETRY_STATUSES = [500, 502, 503, 504]
+HTTP_TIMEOUT = 30
+
+CACHE_DIR = '.http_cache'
+CACHE_TTL = 12 * 60 * 60
+CACHE_MAX_SIZE = 512 * 1024 * 1024
+CACHE_DIR_ENV = 'PODCAST_CACHE_DIR'
+CACHE_OFFLINE_ENV = 'PODCAST_CACHE_OFFLINE'
+
+ITUNES_NAMESPACE = 'http://www.itunes.com/dtds/podcast-1.0.dtd'
+ITUNES_DURATION_TAG = '{%s}duration' % ITUNES_NAMESPACE
+
+FETCH_WORKERS = 8
+FETCH_PER_HOST = 4
+FETCH_DELAY = 0.1
+
 STEMMER = nltk.stem.snowball.SnowballStemmer('english')
 TAG_TYPES = ['NN', 'NNP', 'NNS', 'NNPS']
 TAG_COUNT_THRESHOLD = 1
@@ -23,6 +64,13 @@ DEFAULT_CHUNK_PATTERN = """
       {(<NN>|<NNP>|<NNS>|<NNPS>)+}
 """
 DEFAULT_CHUNKER =  nltk.RegexpParser(DEFAULT_CHUNK_PATTERN)
+STEM_CACHE_SIZE = 50000
+DELETED_CHARACTERS = '()-/'
+DELETED_CHARACTERS_TABLE = dict(map(
+    lambda x: (ord(x), None),
+    DELETED_CHARACTERS
+))
+NLP_CHUNKS_PER_WORKER = 4
 
 MONTH_ABBRV = {
     'Jan': 1,
@@ -77,6 +125,130 @@ def interpret_duration(duration_str):
     return seconds
 
 
+def create_soup(content, parse_only=None):
+    """Parse HTML with the fastest parser available.
+
+    Uses lxml when it is installed and falls back to Python's html.parser
+    otherwise.
+
+    @param content: The raw HTML to parse.
+    @type content: basestring
+    @keyword parse_only: Strainer restricting parsing to the elements a parser
+        reads (see create_strainer) or None to parse the whole document.
+        Defaults to None.
+    @type parse_only: bs4.SoupStrainer
+    @return: Soup for the provided content.
+    @rtype: bs4.BeautifulSoup
+    """
+    return bs4.BeautifulSoup(content, SOUP_FEATURES, parse_only=parse_only)
+
+
+def get_attribute_values(attrs, name):
+    """Get the space separated values of an attribute on a tag being parsed.
+
+    @param attrs: The attributes of the tag.
+    @type attrs: dict
+    @param name: The name of the attribute (like class).
+    @type name: basestring
+    @return: Set of values found in the attribute.
+    @rtype: set of str
+    """
+    values = attrs.get(name)
+    if values == None:
+        return set()
+    elif isinstance(values, basestring):
+        return set(values.split())
+    else:
+        return set(values)
+
+
+def create_strainer(classes=None, rels=None):
+    """Create a strainer restricting parsing to the elements a parser reads.
+
+    Elements matching the strainer are kept along with all of their
+    descendants. All other elements (unless inside a kept element) are skipped.
+
+    @keyword classes: Keep elements with any of these CSS classes. Defaults to
+        None (no classes).
+    @type classes: list of str
+    @keyword rels: Keep elements with any of these rel values. Defaults to None
+        (no rel values).
+    @type rels: list of str
+    @return: Strainer to pass to create_soup.
+    @rtype: bs4.SoupStrainer
+    """
+    classes = frozenset(classes or [])
+    rels = frozenset(rels or [])
+
+    def matches(name, attrs):
+        if attrs == None:
+            return False
+        matched_classes = get_attribute_values(attrs, 'class') & classes
+        matched_rels = get_attribute_values(attrs, 'rel') & rels
+        return len(matched_classes) > 0 or len(matched_rels) > 0
+
+    return bs4.SoupStrainer(matches)
+
+
+_stem_cache = collections.OrderedDict()
+
+
+def stem_word(word):
+    """Stem a single word, remembering recent results.
+
+    Stemming is repeated for every occurance of every word across all episode
+    descriptions so results are kept in a bounded least recently used cache
+    holding up to STEM_CACHE_SIZE words.
+
+    @param word: The word to stem.
+    @type word: basestring
+    @return: The stem of the provided word.
+    @rtype: basestring
+    """
+    try:
+        stemmed = _stem_cache.pop(word)
+    except KeyError:
+        stemmed = STEMMER.stem(word)
+
+    _stem_cache[word] = stemmed
+    if len(_stem_cache) > STEM_CACHE_SIZE:
+        _stem_cache.popitem(last=False)
+
+    return stemmed
+
+
+def chunk_noun_phrases(tagged_description):
+    """Get the noun phrases from a part of speech tagged description.
+
+    @param tagged_description: List of (token, part of speech) pairs.
+    @type tagged_description: list of tuple
+    @return: List of noun phrases found in the provided tagged tokens.
+    @rtype: list of nltk.tree.Tree
+    """
+    result = DEFAULT_CHUNKER.parse(tagged_description)
+    trees = filter(lambda x: type(x) == nltk.tree.Tree, result)
+    noun_phrases = filter(lambda x: x.label() == 'NP', trees)
+
+    return noun_phrases
+
+
+def get_noun_phrases_batch(descriptions):
+    """Use nltk to get the noun phrases within many episode descriptions.
+
+    Part of speech tagging is run over all descriptions in a single batch which
+    avoids per-call tagger overhead.
+
+    @param descriptions: The text samples or episode descriptions from which
+        nouns should be extracted.
+    @type descriptions: list of basestring
+    @return: List with one list of noun phrases per provided description.
+    @rtype: list of list of nltk.tree.Tree
+    """
+    tokenized_descriptions = map(nltk.word_tokenize, descriptions)
+    tagged_descriptions = nltk.pos_tag_sents(tokenized_descriptions)
+    return map(chunk_noun_phrases, tagged_descriptions)
+
+
 def get_noun_phrases(description_content):
     """Use nltk to get all of the noun phrases within an episode description.
 
@@ -86,13 +258,81 @@ def get_noun_phrases(description_content):
     @return: List of noun phrases found in the provided text sample.
     @rtype: list of str
     """
-    tokenized_description = nltk.word_tokenize(description_content)
-    tokenized_description = nltk.pos_tag(tokenized_description)
-    result = DEFAULT_CHUNKER.parse(tokenized_description)
-    trees = filter(lambda x: type(x) == nltk.tree.Tree, result)
-    noun_phrases = filter(lambda x: x.label() == 'NP', trees)
+    return get_noun_phrases_batch([description_content])[0]
 
-    return noun_phrases
+
+def stem_phrase(phrase):
+    """Stem each word of a space separated phrase.
+
+    @param phrase: The phrase to stem (like "the solar eclipses").
+    @type phrase: basestring
+    @return: The phrase with each word replaced by its stem.
+    @rtype: basestring
+    """
+    return ' '.join(map(stem_word, phrase.split(' ')))
+
+
+def compile_filtered_phrases(filtered_phrases):
+    """Build a hash set of noun phrases to exclude as tags.
+
+    The returned set contains each phrase as given along with its stemmed form
+    so that both human-readable phrases and the stems used as tags are
+    filtered with a single constant time lookup.
+
+    @param filtered_phrases: The noun phrases to exclude.
+    @type filtered_phrases: iterable over str
+    @return: Set of phrases and their stems.
+    @rtype: frozenset of str
+    """
+    filtered_phrases = list(filtered_phrases)
+    stemmed_phrases = map(stem_phrase, filtered_phrases)
+    return frozenset(filtered_phrases + stemmed_phrases)
+
+
+_filtered_phrase_sets = {}
+
+
+def get_filtered_phrases(filtered_phrases):
+    """Get the compiled hash set for a collection of filtered phrases.
+
+    Collections are compiled once and reused. Like get_normalizer, lists (like
+    nintyninepi.FILTERED_PHRASES) are treated as constants so changes after
+    their first use will not be reflected. Sets already compiled through
+    compile_filtered_phrases or load_filtered_phrases are returned unchanged.
+
+    @param filtered_phrases: The noun phrases to exclude.
+    @type filtered_phrases: list of str or frozenset of str
+    @return: Set of phrases and their stems.
+    @rtype: frozenset of str
+    """
+    if isinstance(filtered_phrases, frozenset):
+        return filtered_phrases
+
+    cached = _filtered_phrase_sets.get(id(filtered_phrases))
+    if cached != None and cached[0] is filtered_phrases:
+        return cached[1]
+
+    compiled = compile_filtered_phrases(filtered_phrases)
+    _filtered_phrase_sets[id(filtered_phrases)] = (filtered_phrases, compiled)
+    return compiled
+
+
+def load_filtered_phrases(loc):
+    """Load noun phrases to exclude as tags from a text file.
+
+    The file should have one phrase per line. Blank lines and lines starting
+    with # are ignored.
+
+    @param loc: The location of the file to load.
+    @type loc: basestring
+    @return: Set of phrases and their stems.
+    @rtype: frozenset of str
+    """
+    with open(loc) as f:
+        lines = map(lambda x: x.strip().lower(), f)
+
+    phrases = filter(lambda x: x != '' and not x.startswith('#'), lines)
+    return compile_filtered_phrases(phrases)
 
 
 def should_filter(target, stem_mapping, filtered_phrases):
@@ -103,56 +343,171 @@ def should_filter(target, stem_mapping, filtered_phrases):
     @param stem_mapping: Renaming of noun phrases through which target should
         be translated before tested for filtering.
     @type stem_mapping: dict (str to str)
-    @param filtered_phrases: List of noun phrases to exclude.
-    @type filtered_phrases: list of str
+    @param filtered_phrases: Noun phrases to exclude. Lists will be compiled
+        through get_filtered_phrases.
+    @type filtered_phrases: list of str or frozenset of str
     """
+    filtered_phrases = get_filtered_phrases(filtered_phrases)
     filtered = target in filtered_phrases
     filtered = filtered or stem_mapping[target] in filtered_phrases
     return filtered
 
 
-def get_tags_by_nlp(description_content, replacements, stem_mapping,
-    filtered_phrases):
-    """Find the tags for a podcast episode given its text description.
+class DescriptionNormalizer(object):
+    """Precompiled normalization of episode descriptions.
+
+    Lower cases a description, deletes DELETED_CHARACTERS with a single
+    translation table, and applies all phrase replacements in a single scan
+    using one regular expression built from a trie of the phrases being
+    replaced. Matching at each position of the description only follows a
+    single path through the trie so cost grows with the length of the text
+    rather than the number of replacements. Where phrases overlap, the leftmost
+    and then longest phrase is replaced and replaced text is not scanned again.
+    """
+
+    def __init__(self, replacements):
+        """Compile a normalizer for a set of phrase replacements.
+
+        @param replacements: Dict mapping original substring and substring that
+            it should be replaced with.
+        @type replacements: dict (str to str)
+        """
+        self._replacements = dict(filter(
+            lambda (original, replacement): original != '',
+            replacements.items()
+        ))
+
+        trie = {}
+        for original in self._replacements:
+            node = trie
+            for character in original:
+                node = node.setdefault(character, {})
+            node[''] = True
+
+        if len(trie) == 0:
+            self._pattern = None
+        else:
+            self._pattern = re.compile(self._get_trie_pattern(trie))
+
+    def _get_trie_pattern(self, node):
+        """Build a regular expression matching all phrases in a trie.
+
+        @param node: Dictionary mapping a character to the trie node following
+            it with an empty string key marking the end of a phrase.
+        @type node: dict
+        @return: Regular expression preferring the longest phrase.
+        @rtype: str
+        """
+        branches = map(
+            lambda x: re.escape(x) + self._get_trie_pattern(node[x]),
+            sorted(filter(lambda x: x != '', node.keys()))
+        )
+        is_terminal = '' in node
+
+        if len(branches) == 0:
+            return ''
+        elif len(branches) == 1 and not is_terminal:
+            return branches[0]
+        else:
+            pattern = '(?:' + '|'.join(branches) + ')'
+            return pattern + '?' if is_terminal else pattern
+
+    def normalize(self, description_content):
+        """Prepare an episode description for natural language processing.
+
+        @param description_content: Text description of a podcast episode.
+        @type description_content: basestring
+        @return: Lower case description with punctuation removed and
+            replacements applied.
+        @rtype: basestring
+        """
+        description_content = description_content.lower()
+
+        if isinstance(description_content, unicode):
+            description_content = description_content.translate(
+                DELETED_CHARACTERS_TABLE
+            )
+        else:
+            description_content = description_content.translate(
+                None,
+                DELETED_CHARACTERS
+            )
+
+        if self._pattern == None:
+            return description_content
+
+        return self._pattern.sub(
+            lambda x: self._replacements[x.group(0)],
+            description_content
+        )
+
+
+_normalizers = {}
+
+
+def get_normalizer(replacements):
+    """Get the precompiled normalizer for a dict of phrase replacements.
+
+    Normalizers are built once per replacements dict and reused. Replacement
+    dicts (like nintyninepi.MAPPED_PHRASES) are treated as constants so changes
+    to a dict after its first use will not be reflected.
+
+    @param replacements: Dict mapping original substring and substring that it
+        should be replaced with.
+    @type replacements: dict (str to str)
+    @return: Normalizer applying the provided replacements.
+    @rtype: DescriptionNormalizer
+    """
+    cached = _normalizers.get(id(replacements))
+    if cached != None and cached[0] is replacements:
+        return cached[1]
+
+    normalizer = DescriptionNormalizer(replacements)
+    _normalizers[id(replacements)] = (replacements, normalizer)
+    return normalizer
+
+
+def normalize_description(description_content, replacements):
+    """Prepare an episode description for natural language processing.
 
     @param description_content: Text description of a podcast episode.
     @type description_content: basestring
     @param replacements: Dict mapping original substring and substring that it
         should be replaced with.
     @type replacements: dict (str to str)
+    @return: Lower case description with punctuation removed and replacements
+        applied.
+    @rtype: basestring
+    """
+    return get_normalizer(replacements).normalize(description_content)
+
+
+def get_tags_from_noun_phrases(noun_phrases, stem_mapping, filtered_phrases):
+    """Turn the noun phrases from a single episode description into tags.
+
+    @param noun_phrases: The noun phrases found in the episode description.
+    @type noun_phrases: list of nltk.tree.Tree
     @param stem_mapping: Mapping from stems to human readable strings that
-        should be reported.
+        should be reported. Will be updated with the provided phrases.
     @type stem_mapping: dict (str to str)
-    @param filtered_phrases: List of noun phrases to exclude as tags.
-    @type filtered_phrases: list of str
-    @return: List of tags parsed from the provided episode description.
+    @param filtered_phrases: Noun phrases to exclude as tags. Lists will be
+        compiled through get_filtered_phrases.
+    @type filtered_phrases: list of str or frozenset of str
+    @return: List of tags (stems) for the episode.
     @rtype: list of str
     """
-    description_content = description_content.lower()
-    
-    description_content = description_content.replace('(', '')
-    description_content = description_content.replace(')', '')
-    description_content = description_content.replace('-', '')
-    description_content = description_content.replace('/', '')
-
-    for replacement in replacements:
-        description_content = description_content.replace(
-            replacement,
-            replacements[replacement]
-        )
-    
-    noun_phrases = get_noun_phrases(description_content)
     noun_phrases_flat = []
     for tree in noun_phrases:
         components = map(lambda x: x[0].encode('ascii', 'ignore'), tree)
-        stemmed_components = map(lambda x: STEMMER.stem(x), components)
+        stemmed_components = map(stem_word, components)
         
         stemmed_phrase = ' '.join(stemmed_components)
         orig_phrase = ' '.join(components)
         
         stem_mapping[stemmed_phrase] = orig_phrase
-        noun_phrases_flat.append(' '.join(stemmed_components))
+        noun_phrases_flat.append(stemmed_phrase)
 
+    filtered_phrases = get_filtered_phrases(filtered_phrases)
     noun_phrases_flat = filter(
         lambda x: not should_filter(x, stem_mapping, filtered_phrases),
         noun_phrases_flat
@@ -161,6 +516,150 @@ def get_tags_by_nlp(description_content, replacements, stem_mapping,
     return sorted(set(noun_phrases_flat))
 
 
+def get_tags_by_nlp_batch(descriptions, replacements, stem_mapping,
+    filtered_phrases):
+    """Find the tags for many podcast episodes given their text descriptions.
+
+    Produces the same tags and stem_mapping as calling get_tags_by_nlp on each
+    description in order but part of speech tags all descriptions at once.
+
+    @param descriptions: Text descriptions of podcast episodes.
+    @type descriptions: list of basestring
+    @param replacements: Dict mapping original substring and substring that it
+        should be replaced with.
+    @type replacements: dict (str to str)
+    @param stem_mapping: Mapping from stems to human readable strings that
+        should be reported.
+    @type stem_mapping: dict (str to str)
+    @param filtered_phrases: Noun phrases to exclude as tags. Lists will be
+        compiled through get_filtered_phrases.
+    @type filtered_phrases: list of str or frozenset of str
+    @return: List with one list of tags per provided description.
+    @rtype: list of list of str
+    """
+    normalizer = get_normalizer(replacements)
+    normalized_descriptions = map(normalizer.normalize, descriptions)
+    noun_phrase_sets = get_noun_phrases_batch(normalized_descriptions)
+    return map(
+        lambda x: get_tags_from_noun_phrases(
+            x,
+            stem_mapping,
+            filtered_phrases
+        ),
+        noun_phrase_sets
+    )
+
+
+def _get_tags_by_nlp_chunk(args):
+    """Find tags for a chunk of descriptions inside a worker process.
+
+    @param args: Tuple of descriptions (list of str), replacements (dict), and
+        filtered_phrases (list of str) as given to get_tags_by_nlp_batch.
+    @type args: tuple
+    @return: Tuple of the tag lists for the descriptions and the stem mapping
+        built while processing them.
+    @rtype: tuple
+    """
+    (descriptions, replacements, filtered_phrases) = args
+    stem_mapping = {}
+    tag_lists = get_tags_by_nlp_batch(
+        descriptions,
+        replacements,
+        stem_mapping,
+        filtered_phrases
+    )
+    return (tag_lists, stem_mapping)
+
+
+def get_tags_by_nlp_parallel(descriptions, replacements, stem_mapping,
+    filtered_phrases, workers=None):
+    """Find the tags for many podcast episodes using a pool of processes.
+
+    Splits descriptions into contiguous chunks tagged in separate processes.
+    Each chunk builds its own stem mapping and those are merged in chunk order
+    so that the resulting tags and stem_mapping are identical to a serial call
+    to get_tags_by_nlp_batch.
+
+    @param descriptions: Text descriptions of podcast episodes.
+    @type descriptions: list of basestring
+    @param replacements: Dict mapping original substring and substring that it
+        should be replaced with.
+    @type replacements: dict (str to str)
+    @param stem_mapping: Mapping from stems to human readable strings that
+        should be reported.
+    @type stem_mapping: dict (str to str)
+    @param filtered_phrases: Noun phrases to exclude as tags. Lists will be
+        compiled through get_filtered_phrases.
+    @type filtered_phrases: list of str or frozenset of str
+    @keyword workers: The number of worker processes to use. If None, uses the
+        number of cores on this machine. Defaults to None.
+    @type workers: int
+    @return: List with one list of tags per provided description.
+    @rtype: list of list of str
+    """
+    if workers == None:
+        workers = multiprocessing.cpu_count()
+
+    if workers <= 1 or len(descriptions) <= 1:
+        return get_tags_by_nlp_batch(
+            descriptions,
+            replacements,
+            stem_mapping,
+            filtered_phrases
+        )
+
+    num_chunks = min(workers * NLP_CHUNKS_PER_WORKER, len(descriptions))
+    chunk_size = (len(descriptions) + num_chunks - 1) / num_chunks
+    chunks = map(
+        lambda x: (
+            descriptions[x:x+chunk_size],
+            replacements,
+            filtered_phrases
+        ),
+        range(0, len(descriptions), chunk_size)
+    )
+
+    pool = multiprocessing.Pool(min(workers, len(chunks)))
+    try:
+        results = pool.map(_get_tags_by_nlp_chunk, chunks)
+    finally:
+        pool.close()
+        pool.join()
+
+    tag_lists = []
+    for (chunk_tag_lists, chunk_stem_mapping) in results:
+        tag_lists.extend(chunk_tag_lists)
+        stem_mapping.update(chunk_stem_mapping)
+
+    return tag_lists
+
+
+def get_tags_by_nlp(description_content, replacements, stem_mapping,
+    filtered_phrases):
+    """Find the tags for a podcast episode given its text description.
+
+    @param description_content: Text description of a podcast episode.
+    @type description_content: basestring
+    @param replacements: Dict mapping original substring and substring that it
+        should be replaced with.
+    @type replacements: dict (str to str)
+    @param stem_mapping: Mapping from stems to human readable strings that
+        should be reported.
+    @type stem_mapping: dict (str to str)
+    @param filtered_phrases: Noun phrases to exclude as tags. Lists will be
+        compiled through get_filtered_phrases.
+    @type filtered_phrases: list of str or frozenset of str
+    @return: List of tags parsed from the provided episode description.
+    @rtype: list of str
+    """
+    return get_tags_by_nlp_batch(
+        [description_content],
+        replacements,
+        stem_mapping,
+        filtered_phrases
+    )[0]
+
+
 def consolidate_tags(items, stem_mapping, count_threshold):
     """Reduce the set of tags for provided items given a minimum occurance.
 
@@ -186,6 +685,508 @@ def consolidate_tags(items, stem_mapping, count_threshold):
         item['tags'] = map(lambda x: stem_mapping[x], tag_stems)
 
 
+def consolidate_new_tags(existing_items, new_items, stem_mapping,
+    count_threshold):
+    """Set the tags for newly parsed items given occurances across all items.
+
+    Like consolidate_tags but counts tag occurances across both existing_items
+    (parsed in a previous run) and new_items while only setting the tags of
+    new_items. Tags of existing items are left as they were.
+
+    @param existing_items: Previously parsed items with orig_tags key.
+    @type existing_items: list of dict
+    @param new_items: The podcasts for which the tags field needs to be set and
+        whose candidate tags are saved to orig_tags.
+    @type new_items: list of dict with orig_tags key
+    @param stem_mapping: Mapping from stem to human-readable text for tags
+        found in new_items.
+    @type stem_mapping: dict (str to str)
+    @param count_threshold: The minimum number of times a tag must occur across
+        all episodes for it to be included in the list of tags.
+    @type count_threshold: int
+    """
+    counts = collections.defaultdict(lambda: 0)
+    for item in existing_items + new_items:
+        for tag in item.get('orig_tags', []):
+            counts[tag] = counts[tag] + 1
+
+    for item in new_items:
+        tag_stems = filter(
+            lambda x: counts[x] > count_threshold,
+            item['orig_tags']
+        )
+        item['tags'] = map(lambda x: stem_mapping[x], tag_stems)
+
+
+def create_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES,
+    backoff=HTTP_BACKOFF):
+    """Create a keep-alive HTTP session suitable for crawling.
+
+    @keyword pool_size: The number of connections to keep alive per host.
+        Defaults to HTTP_POOL_SIZE.
+    @type pool_size: int
+    @keyword retries: The number of times a failed request should be retried.
+        Defaults to HTTP_RETRIES.
+    @type retries: int
+    @keyword backoff: Backoff factor (seconds) for exponential delays between
+        retries. Defaults to HTTP_BACKOFF.
+    @type backoff: float
+    @return: Session sending DEFAULT_HEADERS and reusing connections. Once
+        retries are exhausted for an error status (like 503), the last
+        response is returned rather than raising so that callers can skip
+        the page.
+    @rtype: requests.Session
+    """
+    retry = requests.packages.urllib3.util.retry.Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        raise_on_status=False
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def configure_session(pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES,
+    backoff=HTTP_BACKOFF):
+    """Replace the session shared by all parsers.
+
+    @keyword pool_size: The number of connections to keep alive per host.
+        Defaults to HTTP_POOL_SIZE.
+    @type pool_size: int
+    @keyword retries: The number of times a failed request should be retried.
+        Defaults to HTTP_RETRIES.
+    @type retries: int
+    @keyword backoff: Backoff factor (seconds) for exponential delays between
+        retries. Defaults to HTTP_BACKOFF.
+    @type backoff: float
+    @return: The new shared session.
+    @rtype: requests.Session
+    """
+    global _session
+    with _session_lock:
+        _session = create_session(pool_size, retries, backoff)
+        return _session
+
+
+def get_session():
+    """Get the session shared by all parsers, creating it if needed.
+
+    @return: The shared keep-alive session.
+    @rtype: requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session == None:
+            _session = create_session()
+        return _session
+
+
+_cache = None
+
+
+def configure_cache(directory=CACHE_DIR, ttl=CACHE_TTL,
+    max_size=CACHE_MAX_SIZE, offline=False):
+    """Keep pages downloaded through get_page in an on-disk cache.
+
+    @keyword directory: The directory in which cached pages should be saved.
+        Defaults to CACHE_DIR.
+    @type directory: basestring
+    @keyword ttl: Number of seconds a cached page is used before it is
+        revalidated with the server. Defaults to CACHE_TTL.
+    @type ttl: float
+    @keyword max_size: Maximum number of bytes the cache may use on disk before
+        least recently used pages are evicted. Defaults to CACHE_MAX_SIZE.
+    @type max_size: int
+    @keyword offline: If True, answer only from the cache without contacting
+        any server. Defaults to False.
+    @type offline: bool
+    @return: The new cache.
+    @rtype: response_cache.ResponseCache
+    """
+    global _cache
+    _cache = response_cache.ResponseCache(directory, ttl, max_size, offline)
+    return _cache
+
+
+def configure_cache_from_environ():
+    """Configure the on-disk cache using environment variables.
+
+    Uses the directory in PODCAST_CACHE_DIR (or CACHE_DIR if not set) and runs
+    offline if PODCAST_CACHE_OFFLINE is set to a non-empty value.
+
+    @return: The new cache.
+    @rtype: response_cache.ResponseCache
+    """
+    return configure_cache(
+        directory=os.environ.get(CACHE_DIR_ENV, CACHE_DIR),
+        offline=bool(os.environ.get(CACHE_OFFLINE_ENV, ''))
+    )
+
+
+def disable_cache():
+    """Stop using the on-disk cache in get_page."""
+    global _cache
+    _cache = None
+
+
+def get_page(loc, timeout=HTTP_TIMEOUT):
+    """Download a page through the shared session and cache (if configured).
+
+    @param loc: The URL of the page to download.
+    @type loc: basestring
+    @keyword timeout: Number of seconds to wait on the server before giving up.
+        Defaults to HTTP_TIMEOUT.
+    @type timeout: float
+    @return: The response from the server or the cache.
+    @rtype: requests.Response or response_cache.CachedResponse
+    """
+    if _cache == None:
+        return get_session().get(loc, timeout=timeout)
+
+    return _cache.get(
+        loc,
+        lambda headers: get_session().get(
+            loc,
+            headers=headers,
+            timeout=timeout
+        )
+    )
+
+
+def open_stream(loc, timeout=HTTP_TIMEOUT):
+    """Open a page for incremental reading through the shared session.
+
+    Unlike get_page, the body is not read into memory (or cached) and can be
+    consumed as it arrives off the socket.
+
+    @param loc: The URL of the page to open.
+    @type loc: basestring
+    @keyword timeout: Number of seconds to wait on the server before giving up.
+        Defaults to HTTP_TIMEOUT.
+    @type timeout: float
+    @return: File-like object with the decompressed page body.
+    @rtype: file-like object
+    """
+    response = get_session().get(loc, stream=True, timeout=timeout)
+    response.raise_for_status()
+    response.raw.decode_content = True
+    return response.raw
+
+
+def iterate_feed_items(stream):
+    """Incrementally parse the <item> elements of an RSS feed.
+
+    Yields each item as soon as its closing tag has been read. Items are
+    cleared and detached from their parent after being yielded so memory use
+    stays bounded by a single item regardless of the size of the feed.
+
+    @param stream: File-like object with the raw RSS feed.
+    @type stream: file-like object
+    @return: Generator over the item elements of the feed.
+    @rtype: generator over xml.etree.ElementTree.Element
+    """
+    open_elements = []
+    for (event, element) in xml.etree.cElementTree.iterparse(
+        stream,
+        events=('start', 'end')
+    ):
+        if event == 'start':
+            open_elements.append(element)
+            continue
+
+        open_elements.pop()
+        if element.tag == 'item':
+            yield element
+            element.clear()
+            if open_elements:
+                open_elements[-1].remove(element)
+
+
+class FetchEngine(object):
+    """Bounded-parallel page downloader that stays polite to each host.
+
+    Downloads pages using a pool of worker threads while capping the number of
+    requests in flight against any one host and spacing out the start of
+    requests to the same host by a minimum politeness delay.
+    """
+
+    def __init__(self, workers=FETCH_WORKERS, per_host=FETCH_PER_HOST,
+        delay=FETCH_DELAY):
+        """Create a new fetch engine.
+
+        @keyword workers: The maximum number of requests in flight across all
+            hosts. Defaults to FETCH_WORKERS.
+        @type workers: int
+        @keyword per_host: The maximum number of requests in flight against a
+            single host. Defaults to FETCH_PER_HOST.
+        @type per_host: int
+        @keyword delay: Minimum number of seconds between the start of two
+            requests to the same host. Defaults to FETCH_DELAY.
+        @type delay: float
+        """
+        self._workers = workers
+        self._per_host = per_host
+        self._delay = delay
+        self._lock = threading.Lock()
+        self._host_semaphores = {}
+        self._host_next_start = {}
+
+    def _get_host_semaphore(self, host):
+        """Get the semaphore limiting concurrent requests to a host.
+
+        @param host: The host (like www.thisamericanlife.org) to be limited.
+        @type host: basestring
+        @return: Semaphore shared by all requests to the given host.
+        @rtype: threading.BoundedSemaphore
+        """
+        with self._lock:
+            if not host in self._host_semaphores:
+                self._host_semaphores[host] = threading.BoundedSemaphore(
+                    self._per_host
+                )
+            return self._host_semaphores[host]
+
+    def _reserve_start(self, host):
+        """Reserve the next politeness-respecting start time for a host.
+
+        @param host: The host against which a request is about to be made.
+        @type host: basestring
+        @return: Number of seconds the caller should wait before starting its
+            request.
+        @rtype: float
+        """
+        with self._lock:
+            now = time.time()
+            start = max(now, self._host_next_start.get(host, now))
+            self._host_next_start[host] = start + self._delay
+            return start - now
+
+    def fetch(self, loc):
+        """Download a single page, respecting per-host limits.
+
+        @param loc: The URL of the page to download.
+        @type loc: basestring
+        @return: The response from the server.
+        @rtype: requests.Response
+        """
+        host = urlparse.urlparse(loc).netloc
+        with self._get_host_semaphore(host):
+            wait = self._reserve_start(host)
+            if wait > 0:
+                time.sleep(wait)
+            return get_page(loc)
+
+    def fetch_all(self, locs):
+        """Download many pages concurrently.
+
+        @param locs: The URLs of the pages to download.
+        @type locs: iterable over basestring
+        @return: Responses from the server in the same order as locs.
+        @rtype: list of requests.Response
+        """
+        locs = list(locs)
+        if len(locs) == 0:
+            return []
+
+        pool = multiprocessing.pool.ThreadPool(min(self._workers, len(locs)))
+        try:
+            return pool.map(self.fetch, locs)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def fetch_all(locs, workers=FETCH_WORKERS, per_host=FETCH_PER_HOST,
+    delay=FETCH_DELAY):
+    """Download many pages concurrently with a new FetchEngine.
+
+    @param locs: The URLs of the pages to download.
+    @type locs: iterable over basestring
+    @keyword workers: The maximum number of requests in flight across all
+        hosts. Defaults to FETCH_WORKERS.
+    @type workers: int
+    @keyword per_host: The maximum number of requests in flight against a
+        single host. Defaults to FETCH_PER_HOST.
+    @type per_host: int
+    @keyword delay: Minimum number of seconds between the start of two requests
+        to the same host. Defaults to FETCH_DELAY.
+    @type delay: float
+    @return: Responses from the server in the same order as locs.
+    @rtype: list of requests.Response
+    """
+    return FetchEngine(workers, per_host, delay).fetch_all(locs)
+
+
+def get_new_file_mode():
+    """Get the permissions open gives a new file under the current umask.
+
+    @return: Permission bits (like 0644 under a umask of 022).
+    @rtype: int
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0666 & ~umask
+
+
+NEW_FILE_MODE = get_new_file_mode()
+
+
+def replace_file(temp_path, loc):
+    """Move a finished temporary file into place, replacing any file at loc.
+
+    Files from tempfile.mkstemp are only readable by their owner so the
+    temporary file is first given the permissions of the file it replaces or,
+    if there is none, the permissions open would have given a new file.
+
+    @param temp_path: The location of the finished temporary file.
+    @type temp_path: basestring
+    @param loc: The location to which the file should be moved.
+    @type loc: basestring
+    """
+    if os.path.exists(loc):
+        mode = stat.S_IMODE(os.stat(loc).st_mode)
+    else:
+        mode = NEW_FILE_MODE
+
+    os.chmod(temp_path, mode)
+    os.rename(temp_path, loc)
+
+
+def load_episodes(loc):
+    """Load previously parsed episodes from a JSON file.
+
+    @param loc: The location of the JSON file.
+    @type loc: basestring
+    @return: Dictionary with an episodes key whose value is a list of
+        dictionaries describing episodes. The list is empty if the file does not
+        exist.
+    @rtype: dict
+    """
+    if not os.path.isfile(loc):
+        return {'episodes': []}
+
+    with open(loc) as f:
+        return json.load(f)
+
+
+def write_episodes(loc, episodes_info):
+    """Write parsed episodes to a JSON file.
+
+    @param loc: The location of the JSON file to write.
+    @type loc: basestring
+    @param episodes_info: Dictionary with an episodes key whose value is a list
+        of dictionaries describing episodes.
+    @type episodes_info: dict
+    """
+    write_episodes_stream(loc, episodes_info['episodes'])
+
+
+def write_episodes_stream(loc, episodes):
+    """Write episodes to a JSON file as they are produced.
+
+    @param loc: The location of the JSON file to write.
+    @type loc: basestring
+    @param episodes: Dictionaries describing episodes.
+    @type episodes: iterable over dict
+    @return: The number of episodes written.
+    @rtype: int
+    """
+    with EpisodeWriter(loc) as writer:
+        writer.write_all(episodes)
+        return writer.count
+
+
+class EpisodeWriter(object):
+    """Writer streaming episodes to a JSON file one at a time.
+
+    Episodes are encoded and written as they are provided so that only one
+    episode needs to be in memory at a time. Output goes to a temporary file in
+    the same directory which replaces the target file only once the writer is
+    closed so that a crash never leaves a truncated file behind. Can be used as
+    a context manager which closes the writer if the block succeeds and
+    discards the output otherwise.
+    """
+
+    def __init__(self, loc):
+        """Create a new writer, starting a new temporary file.
+
+        @param loc: The location of the JSON file to write.
+        @type loc: basestring
+        """
+        self._loc = loc
+        self._encoder = DateJSONEncoder()
+        self.count = 0
+
+        directory = os.path.dirname(os.path.abspath(loc))
+        (handle, self._temp_path) = tempfile.mkstemp(dir=directory)
+        self._file = os.fdopen(handle, 'w')
+        self._file.write('{"episodes": [')
+
+    def write(self, episode):
+        """Append an episode to the output file.
+
+        @param episode: Dictionary describing the episode.
+        @type episode: dict
+        """
+        if self.count > 0:
+            self._file.write(', ')
+
+        for chunk in self._encoder.iterencode(episode):
+            self._file.write(chunk)
+
+        self.count += 1
+
+    def write_all(self, episodes):
+        """Append many episodes to the output file as they are produced.
+
+        @param episodes: Dictionaries describing the episodes.
+        @type episodes: iterable over dict
+        """
+        for episode in episodes:
+            self.write(episode)
+
+    def flush(self):
+        """Push episodes written so far to the temporary file on disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        """Finish the JSON document and atomically replace the target file."""
+        self._file.write(']}')
+        self.flush()
+        self._file.close()
+        replace_file(self._temp_path, self._loc)
+
+    def abort(self):
+        """Discard the output, leaving any existing target file unchanged."""
+        self._file.close()
+        os.remove(self._temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type == None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
 class DateJSONEncoder(json.JSONEncoder):
     """JSON encoder for datetime.date.
 
@@ -0,0 +1,464 @@
+"""Unit tests for the common parsing utilities.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import BaseHTTPServer
+import collections
+import datetime
+import json
+import os
+import shutil
+import stat
+import StringIO
+import tempfile
+import threading
+import time
+import unittest
+import xml.etree.cElementTree
+
+import mox
+import nltk
+import requests
+
+import common
+
+
+FakeResponse = collections.namedtuple('FakeResponse', ['status_code', 'text'])
+CachedFakeResponse = collections.namedtuple(
+    'CachedFakeResponse',
+    ['status_code', 'text', 'headers']
+)
+
+
+def fake_pos_tag_sents(sentences):
+    return map(
+        lambda sentence: map(
+            lambda x: (x, 'DT' if x in ['a', 'the'] else 'NN'),
+            sentence
+        ),
+        sentences
+    )
+
+
+class NLPTests(mox.MoxTestBase):
+
+    def setUp(self):
+        super(NLPTests, self).setUp()
+        self.stubs.Set(nltk, 'word_tokenize', lambda x: x.split(' '))
+        self.stubs.Set(nltk, 'pos_tag_sents', fake_pos_tag_sents)
+
+    def test_stem_word(self):
+        self.assertEqual(common.stem_word('teachers'), 'teacher')
+        self.assertEqual(common.stem_word('teachers'), 'teacher')
+        self.assertEqual(common._stem_cache['teachers'], 'teacher')
+
+    def test_stem_word_bounded(self):
+        self.stubs.Set(common, 'STEM_CACHE_SIZE', 2)
+        common._stem_cache.clear()
+
+        common.stem_word('cats')
+        common.stem_word('dogs')
+        common.stem_word('cats')
+        common.stem_word('birds')
+
+        self.assertEqual(common._stem_cache.keys(), ['cats', 'birds'])
+
+    def test_normalize_description(self):
+        replacements = {
+            'the city': 'cities',
+            'the building': 'architecture',
+            'a building': 'building',
+            'the build': 'construction'
+        }
+
+        normalized = common.normalize_description(
+            u'The (Building) in THE CITY-state / a building',
+            replacements
+        )
+        self.assertEqual(normalized, u'architecture in citiesstate  building')
+
+        normalized = common.normalize_description('The build-up', replacements)
+        self.assertEqual(normalized, 'constructionup')
+
+    def test_normalize_description_no_replacements(self):
+        normalized = common.normalize_description('A (Test)', {})
+        self.assertEqual(normalized, 'a test')
+
+    def test_get_normalizer_reused(self):
+        replacements = {'the city': 'cities'}
+        self.assertTrue(
+            common.get_normalizer(replacements) is
+            common.get_normalizer(replacements)
+        )
+
+    def test_compile_filtered_phrases(self):
+        filtered_phrases = common.compile_filtered_phrases(
+            ['this episode', 'things']
+        )
+
+        self.assertTrue(isinstance(filtered_phrases, frozenset))
+        self.assertIn('this episode', filtered_phrases)
+        self.assertIn('this episod', filtered_phrases)
+        self.assertIn('thing', filtered_phrases)
+
+    def test_get_filtered_phrases_reused(self):
+        filtered_phrases = ['things']
+        compiled = common.get_filtered_phrases(filtered_phrases)
+
+        self.assertTrue(
+            common.get_filtered_phrases(filtered_phrases) is compiled
+        )
+        self.assertTrue(common.get_filtered_phrases(compiled) is compiled)
+
+    def test_load_filtered_phrases(self):
+        (handle, loc) = tempfile.mkstemp()
+        self.addCleanup(os.remove, loc)
+        with os.fdopen(handle, 'w') as f:
+            f.write('# Stopwords\nThis Episode\n\n  people \n')
+
+        filtered_phrases = common.load_filtered_phrases(loc)
+        self.assertIn('this episode', filtered_phrases)
+        self.assertIn('peopl', filtered_phrases)
+        self.assertNotIn('# stopwords', filtered_phrases)
+        self.assertNotIn('', filtered_phrases)
+
+    def test_should_filter(self):
+        stem_mapping = {'thing': 'things', 'eclips': 'eclipse'}
+        self.assertTrue(common.should_filter('thing', stem_mapping, ['things']))
+        self.assertTrue(
+            common.should_filter('eclips', stem_mapping, ['eclipse'])
+        )
+        self.assertFalse(
+            common.should_filter('eclips', stem_mapping, ['things'])
+        )
+
+    def test_get_tags_by_nlp_batch(self):
+        descriptions = [
+            'The (Solar) Eclipse',
+            'a teacher',
+            'the teachers',
+            'solar eclipses'
+        ]
+
+        serial_stem_mapping = {}
+        serial_tags = map(
+            lambda x: common.get_tags_by_nlp(
+                x,
+                {'the teachers': 'teachers'},
+                serial_stem_mapping,
+                ['eclips']
+            ),
+            descriptions
+        )
+
+        batch_stem_mapping = {}
+        batch_tags = common.get_tags_by_nlp_batch(
+            descriptions,
+            {'the teachers': 'teachers'},
+            batch_stem_mapping,
+            ['eclips']
+        )
+
+        self.assertEqual(batch_tags, serial_tags)
+        self.assertEqual(batch_stem_mapping, serial_stem_mapping)
+        self.assertEqual(
+            batch_tags,
+            [['the solar eclips'], ['a teacher'], ['teacher'], ['solar eclips']]
+        )
+        self.assertEqual(batch_stem_mapping['teacher'], 'teachers')
+
+    def test_get_tags_by_nlp_parallel(self):
+        descriptions = [
+            'the teachers',
+            'a teacher',
+            'solar eclipses',
+            'the solar eclipse',
+            'teachers',
+            'a solar eclipse'
+        ]
+
+        batch_stem_mapping = {'old': 'old'}
+        batch_tags = common.get_tags_by_nlp_batch(
+            descriptions,
+            {},
+            batch_stem_mapping,
+            ['a teacher']
+        )
+
+        parallel_stem_mapping = {'old': 'old'}
+        parallel_tags = common.get_tags_by_nlp_parallel(
+            descriptions,
+            {},
+            parallel_stem_mapping,
+            ['a teacher'],
+            workers=2
+        )
+
+        self.assertEqual(parallel_tags, batch_tags)
+        self.assertEqual(parallel_stem_mapping, batch_stem_mapping)
+
+
+class SoupTests(unittest.TestCase):
+
+    def test_create_soup(self):
+        soup = common.create_soup('<p class="a">test</p>')
+        self.assertEqual(soup.find(class_='a').getText(), 'test')
+
+    def test_create_soup_html_parser(self):
+        original_features = common.SOUP_FEATURES
+        common.SOUP_FEATURES = 'html.parser'
+        try:
+            soup = common.create_soup('<p class="a">test</p>')
+        finally:
+            common.SOUP_FEATURES = original_features
+
+        self.assertEqual(soup.find(class_='a').getText(), 'test')
+
+    def test_create_strainer(self):
+        strainer = common.create_strainer(classes=['title'], rels=['tag'])
+        soup = common.create_soup(
+            '<div><h1 class="big title">Name <em>1</em></h1>' +
+            '<p class="other">Skipped</p>' +
+            '<a rel="tag" href="/t">Tag</a></div>',
+            strainer
+        )
+
+        self.assertEqual(soup.find(class_='title').getText(), 'Name 1')
+        self.assertEqual(soup.find('a', rel='tag').getText(), 'Tag')
+        self.assertEqual(soup.find(class_='other'), None)
+
+
+class FeedTests(mox.MoxTestBase):
+
+    def test_iterate_feed_items(self):
+        parsers = []
+        iterparse = xml.etree.cElementTree.iterparse
+
+        def record_iterparse(stream, events=None):
+            parser = iterparse(stream, events)
+            parsers.append(parser)
+            return parser
+
+        self.stubs.Set(xml.etree.cElementTree, 'iterparse', record_iterparse)
+        stream = StringIO.StringIO(
+            '<rss><channel><title>Feed</title>' +
+            '<item><title>1</title></item>' +
+            '<item><title>2</title></item>' +
+            '<item><title>3</title></item>' +
+            '</channel></rss>'
+        )
+
+        titles = map(
+            lambda x: x.find('title').text,
+            common.iterate_feed_items(stream)
+        )
+
+        self.assertEqual(titles, ['1', '2', '3'])
+        channel = parsers[0].root.find('channel')
+        self.assertEqual(map(lambda x: x.tag, channel), ['title'])
+
+
+class SessionTests(mox.MoxTestBase):
+
+    def test_create_session(self):
+        session = common.create_session(pool_size=3, retries=2)
+        adapter = session.get_adapter('http://www.radiolab.org/')
+
+        self.assertEqual(
+            session.headers['User-Agent'],
+            common.DEFAULT_HEADERS['User-Agent']
+        )
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertFalse(adapter.max_retries.raise_on_status)
+
+    def test_create_session_returns_failed_response(self):
+        requests_seen = []
+
+        class UnavailableHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                requests_seen.append(self.path)
+                self.send_response(503)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), UnavailableHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            session = common.create_session(retries=2, backoff=0)
+            response = session.get(
+                'http://127.0.0.1:%d/page' % server.server_address[1]
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(requests_seen), 3)
+
+    def test_get_session_shared(self):
+        self.assertTrue(common.get_session() is common.get_session())
+
+    def test_configure_session(self):
+        old_session = common.get_session()
+        new_session = common.configure_session(pool_size=2)
+
+        self.assertFalse(old_session is new_session)
+        self.assertTrue(common.get_session() is new_session)
+
+    def test_get_page(self):
+        session = self.mox.CreateMock(requests.Session)
+        self.mox.StubOutWithMock(common, 'get_session')
+
+        common.get_session().AndReturn(session)
+        session.get('/test', timeout=common.HTTP_TIMEOUT).AndReturn(
+            FakeResponse(200, 't1')
+        )
+
+        self.mox.ReplayAll()
+
+        self.assertEqual(common.get_page('/test').text, 't1')
+
+    def test_get_page_cached(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(common.disable_cache)
+
+        session = self.mox.CreateMock(requests.Session)
+        self.mox.StubOutWithMock(common, 'get_session')
+
+        common.get_session().AndReturn(session)
+        session.get('/test', headers={}, timeout=common.HTTP_TIMEOUT).AndReturn(
+            CachedFakeResponse(200, 't1', {})
+        )
+
+        self.mox.ReplayAll()
+
+        common.configure_cache(directory)
+        self.assertEqual(common.get_page('/test').text, 't1')
+        self.assertEqual(common.get_page('/test').text, 't1')
+
+
+class FetchEngineTests(mox.MoxTestBase):
+
+    def setUp(self):
+        super(FetchEngineTests, self).setUp()
+        self.lock = threading.Lock()
+        self.in_flight = collections.defaultdict(lambda: 0)
+        self.max_in_flight = collections.defaultdict(lambda: 0)
+
+    def fake_get(self, loc):
+        host = loc.split('/')[2]
+        with self.lock:
+            self.in_flight[host] += 1
+            self.max_in_flight[host] = max(
+                self.max_in_flight[host],
+                self.in_flight[host]
+            )
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight[host] -= 1
+        return FakeResponse(200, loc)
+
+    def test_fetch_all_preserves_order(self):
+        self.stubs.Set(common, 'get_page', self.fake_get)
+        locs = map(lambda x: 'http://a.test/%d' % x, range(0, 20))
+
+        engine = common.FetchEngine(workers=5, per_host=5, delay=0)
+        results = engine.fetch_all(locs)
+
+        self.assertEqual(map(lambda x: x.text, results), locs)
+
+    def test_fetch_all_per_host_cap(self):
+        self.stubs.Set(common, 'get_page', self.fake_get)
+        locs = map(lambda x: 'http://a.test/%d' % x, range(0, 10))
+        locs.extend(map(lambda x: 'http://b.test/%d' % x, range(0, 10)))
+
+        engine = common.FetchEngine(workers=8, per_host=2, delay=0)
+        engine.fetch_all(locs)
+
+        self.assertEqual(self.max_in_flight['a.test'], 2)
+        self.assertEqual(self.max_in_flight['b.test'], 2)
+
+    def test_fetch_all_politeness_delay(self):
+        self.stubs.Set(common, 'get_page', self.fake_get)
+        locs = map(lambda x: 'http://a.test/%d' % x, range(0, 4))
+
+        engine = common.FetchEngine(workers=4, per_host=4, delay=0.05)
+        start = time.time()
+        engine.fetch_all(locs)
+
+        self.assertTrue(time.time() - start >= 0.15)
+
+    def test_fetch_all_empty(self):
+        self.assertEqual(common.fetch_all([]), [])
+
+
+class EpisodeWriterTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loc = os.path.join(self.directory, 'episodes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write_episodes_stream(self):
+        episodes = (
+            {'name': str(x), 'date': datetime.date(2015, 1, x + 1)}
+            for x in range(3)
+        )
+        count = common.write_episodes_stream(self.loc, episodes)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(common.load_episodes(self.loc), {'episodes': [
+            {'name': '0', 'date': '2015-01-01'},
+            {'name': '1', 'date': '2015-01-02'},
+            {'name': '2', 'date': '2015-01-03'}
+        ]})
+
+    def test_write_episodes_empty(self):
+        common.write_episodes(self.loc, {'episodes': []})
+        self.assertEqual(common.load_episodes(self.loc), {'episodes': []})
+
+    def test_failed_write_keeps_original(self):
+        common.write_episodes(self.loc, {'episodes': [{'name': 'old'}]})
+
+        def create_episodes():
+            yield {'name': 'new'}
+            raise ValueError('bad page')
+
+        self.assertRaises(
+            ValueError,
+            common.write_episodes_stream,
+            self.loc,
+            create_episodes()
+        )
+
+        with open(self.loc) as f:
+            self.assertEqual(json.load(f), {'episodes': [{'name': 'old'}]})
+        self.assertEqual(os.listdir(self.directory), ['episodes.json'])
+
+    def test_write_episodes_new_file_mode(self):
+        common.write_episodes(self.loc, {'episodes': []})
+        mode = stat.S_IMODE(os.stat(self.loc).st_mode)
+        self.assertEqual(mode, common.NEW_FILE_MODE)
+
+    def test_write_episodes_keeps_mode(self):
+        common.write_episodes(self.loc, {'episodes': []})
+        os.chmod(self.loc, 0640)
+        common.write_episodes(self.loc, {'episodes': [{'name': 'new'}]})
+        self.assertEqual(stat.S_IMODE(os.stat(self.loc).st_mode), 0640)
+
+
+if __name__ == '__main__':
+    unittest.main()
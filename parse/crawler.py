@@ -0,0 +1,222 @@
+"""Shared non-blocking crawler core for the HTML scrapers.
+
+Logic and structures to issue many page downloads without blocking the caller.
+Requests are run by one long-lived pool of worker threads shared by all
+scrapers (rather than a new pool or thread per request) and pass through a
+common.FetchEngine so that the number of requests in flight against a host and
+the rate at which they start remain bounded. Callers get a PendingResult for
+each submission which they can wait on, chain further parsing onto, or abandon
+by cancelling the crawler.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import multiprocessing.pool
+import threading
+
+import common
+
+CRAWLER_CONCURRENCY = 32
+
+
+class CrawlCancelledError(Exception):
+    """Exception raised for requests that had not started before cancel."""
+
+    def __init__(self, loc):
+        """Create a new cancellation error.
+
+        @param loc: The URL of the page that was not downloaded.
+        @type loc: basestring
+        """
+        super(CrawlCancelledError, self).__init__('Crawl cancelled: %s' % loc)
+        self.loc = loc
+
+
+class PendingResult(object):
+    """Result of a submitted request which may not have finished yet."""
+
+    def __init__(self, async_result, transform=None):
+        """Create a new pending result.
+
+        @param async_result: The pool result to wrap.
+        @type async_result: multiprocessing.pool.AsyncResult
+        @keyword transform: Function applied to the underlying value when it
+            is retrieved. If None, the value is returned unchanged. Defaults to
+            None.
+        @type transform: function
+        """
+        self._async_result = async_result
+        self._transform = transform
+
+    def ready(self):
+        """Determine if the underlying request has finished.
+
+        @return: True if get will not block and False otherwise.
+        @rtype: bool
+        """
+        return self._async_result.ready()
+
+    def get(self, timeout=None):
+        """Wait for and return the value of this result.
+
+        @keyword timeout: Maximum number of seconds to wait. If None, waits
+            indefinitely. Defaults to None.
+        @type timeout: float
+        @return: The (transformed) value of the request.
+        @raise CrawlCancelledError: Raised if the crawler was cancelled before
+            the request started.
+        @raise multiprocessing.TimeoutError: Raised if the result is not
+            ready before timeout.
+        """
+        value = self._async_result.get(timeout)
+        if self._transform == None:
+            return value
+        else:
+            return self._transform(value)
+
+    def then(self, transform):
+        """Create a result which applies further processing to this one.
+
+        @param transform: Function taking this result's value and returning
+            the value for the new result.
+        @type transform: function
+        @return: New pending result for the same request.
+        @rtype: PendingResult
+        """
+        if self._transform == None:
+            return PendingResult(self._async_result, transform)
+
+        first_transform = self._transform
+        return PendingResult(
+            self._async_result,
+            lambda x: transform(first_transform(x))
+        )
+
+
+class Crawler(object):
+    """Pool of workers downloading pages on behalf of many callers."""
+
+    def __init__(self, concurrency=CRAWLER_CONCURRENCY,
+        per_host=common.FETCH_PER_HOST, delay=common.FETCH_DELAY):
+        """Create a new crawler.
+
+        @keyword concurrency: The maximum number of requests in flight across
+            all hosts. Defaults to CRAWLER_CONCURRENCY.
+        @type concurrency: int
+        @keyword per_host: The maximum number of requests in flight against a
+            single host. Defaults to common.FETCH_PER_HOST.
+        @type per_host: int
+        @keyword delay: Minimum number of seconds between the start of two
+            requests to the same host. Defaults to common.FETCH_DELAY.
+        @type delay: float
+        """
+        self._engine = common.FetchEngine(concurrency, per_host, delay)
+        self._pool = multiprocessing.pool.ThreadPool(concurrency)
+        self._cancelled = threading.Event()
+
+    def _fetch(self, loc):
+        """Download a page unless the crawler has been cancelled.
+
+        @param loc: The URL of the page to download.
+        @type loc: basestring
+        @return: The response from the server.
+        @rtype: requests.Response
+        @raise CrawlCancelledError: Raised if the crawler has been cancelled.
+        """
+        if self._cancelled.is_set():
+            raise CrawlCancelledError(loc)
+        return self._engine.fetch(loc)
+
+    def submit(self, loc):
+        """Start downloading a page without waiting for it.
+
+        @param loc: The URL of the page to download.
+        @type loc: basestring
+        @return: Pending result whose value is the server's response.
+        @rtype: PendingResult
+        """
+        return PendingResult(self._pool.apply_async(self._fetch, (loc,)))
+
+    def submit_many(self, locs):
+        """Start downloading many pages without waiting for them.
+
+        @param locs: The URLs of the pages to download.
+        @type locs: iterable over basestring
+        @return: Pending result whose value is the list of server responses in
+            the same order as locs.
+        @rtype: PendingResult
+        """
+        return PendingResult(self._pool.map_async(self._fetch, list(locs)))
+
+    def fetch_many(self, locs):
+        """Download many pages concurrently, waiting for all of them.
+
+        @param locs: The URLs of the pages to download.
+        @type locs: iterable over basestring
+        @return: Responses from the server in the same order as locs.
+        @rtype: list of requests.Response
+        """
+        return self.submit_many(locs).get()
+
+    def cancel(self):
+        """Cancel requests which have not yet started.
+
+        Requests already in flight finish normally. Any request which has not
+        started (including those submitted after this call) raises a
+        CrawlCancelledError from its PendingResult.
+        """
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        """Determine if this crawler has been cancelled.
+
+        @return: True if cancel has been called and False otherwise.
+        @rtype: bool
+        """
+        return self._cancelled.is_set()
+
+    def close(self):
+        """Wait for submitted requests to finish and stop the workers."""
+        self._pool.close()
+        self._pool.join()
+
+
+_crawler = None
+_crawler_lock = threading.Lock()
+
+
+def get_crawler():
+    """Get the crawler shared by all scrapers, creating it if needed.
+
+    A cancelled shared crawler is replaced by a new one and closed so that its
+    workers stop once the requests already in flight finish.
+
+    @return: The shared crawler.
+    @rtype: Crawler
+    """
+    global _crawler
+    cancelled_crawler = None
+    with _crawler_lock:
+        if _crawler != None and _crawler.is_cancelled():
+            cancelled_crawler = _crawler
+            _crawler = None
+        if _crawler == None:
+            _crawler = Crawler()
+        shared_crawler = _crawler
+
+    if cancelled_crawler != None:
+        cancelled_crawler.close()
+
+    return shared_crawler
+
+
+def fetch_many(locs):
+    """Download many pages concurrently through the shared crawler.
+
+    @param locs: The URLs of the pages to download.
+    @type locs: iterable over basestring
+    @return: Responses from the server in the same order as locs.
+    @rtype: list of requests.Response
+    """
+    return get_crawler().fetch_many(locs)
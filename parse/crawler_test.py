@@ -0,0 +1,95 @@
+"""Unit tests for the shared crawler core.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+import threading
+import unittest
+
+import common
+import crawler
+
+
+FakeResponse = collections.namedtuple('FakeResponse', ['status_code', 'text'])
+
+
+class CrawlerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.original_get_page = common.get_page
+        self.requested = []
+        common.get_page = self.fake_get_page
+        self.crawler = crawler.Crawler(concurrency=4, delay=0)
+
+    def tearDown(self):
+        self.crawler.close()
+        common.get_page = self.original_get_page
+
+    def fake_get_page(self, loc):
+        self.requested.append(loc)
+        return FakeResponse(200, 'text ' + loc)
+
+    def test_fetch_many(self):
+        responses = self.crawler.fetch_many(['/1', '/2', '/3'])
+        self.assertEqual(
+            map(lambda x: x.text, responses),
+            ['text /1', 'text /2', 'text /3']
+        )
+
+    def test_submit_then(self):
+        result = self.crawler.submit('/1').then(lambda x: x.text)
+        result = result.then(lambda x: x.upper())
+        self.assertEqual(result.get(), 'TEXT /1')
+        self.assertTrue(result.ready())
+
+    def test_cancel(self):
+        self.crawler.cancel()
+        result = self.crawler.submit('/1')
+
+        self.assertRaises(crawler.CrawlCancelledError, result.get)
+        self.assertEqual(self.requested, [])
+
+    def test_cancel_pending(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocking_get_page(loc):
+            started.set()
+            release.wait()
+            return self.fake_get_page(loc)
+
+        common.get_page = blocking_get_page
+        single_crawler = crawler.Crawler(concurrency=1, delay=0)
+        try:
+            first = single_crawler.submit('/1')
+            second = single_crawler.submit('/2')
+            started.wait()
+            single_crawler.cancel()
+            release.set()
+
+            self.assertEqual(first.get().text, 'text /1')
+            self.assertRaises(crawler.CrawlCancelledError, second.get)
+        finally:
+            single_crawler.close()
+
+    def test_get_crawler_replaces_cancelled(self):
+        shared_crawler = crawler.get_crawler()
+        self.assertTrue(crawler.get_crawler() is shared_crawler)
+
+        shared_crawler.cancel()
+        replacement = crawler.get_crawler()
+        try:
+            self.assertFalse(replacement is shared_crawler)
+            self.assertFalse(replacement.is_cancelled())
+            self.assertFalse(any(map(
+                lambda x: x.is_alive(),
+                shared_crawler._pool._pool
+            )))
+        finally:
+            replacement.cancel()
+
+
+if __name__ == '__main__':
+    unittest.main()
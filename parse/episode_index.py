@@ -0,0 +1,150 @@
+"""Persistent index of episodes already parsed for a show.
+
+Logic and structures to remember which episodes of a show have already been
+downloaded and parsed so that "new" mode crawls can skip them (and stop
+paginating once they only see known episodes). Each show's index is saved as a
+small JSON file next to that show's episode JSON file and records the keys
+(like episode URL or title) of every episode seen so far.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import tempfile
+
+import common
+
+INDEX_EXTENSION = '.index'
+
+
+def get_index_location(episodes_loc):
+    """Get the location of the index for a show's episode JSON file.
+
+    @param episodes_loc: Location of the JSON file with the show's episodes.
+    @type episodes_loc: basestring
+    @return: Location of the index for that show.
+    @rtype: basestring
+    """
+    return episodes_loc + INDEX_EXTENSION
+
+
+class EpisodeIndex(object):
+    """Set of keys identifying the episodes of a show already parsed."""
+
+    def __init__(self, loc, keys=None):
+        """Create a new episode index.
+
+        @param loc: The location to which this index is saved.
+        @type loc: basestring
+        @keyword keys: The keys of episodes already parsed. Defaults to None
+            (no episodes).
+        @type keys: iterable over str
+        """
+        self.loc = loc
+        self.keys = set(keys or [])
+
+    def __contains__(self, key):
+        """Determine if an episode has already been parsed.
+
+        @param key: The key of the episode in question.
+        @type key: basestring
+        @return: True if the episode is in the index and False otherwise.
+        @rtype: bool
+        """
+        return key in self.keys
+
+    def filter_new(self, keys):
+        """Get the keys of episodes not yet in the index.
+
+        @param keys: Keys of the episodes in question.
+        @type keys: iterable over str
+        @return: Keys not in this index in their original order.
+        @rtype: list of str
+        """
+        return filter(lambda x: not x in self.keys, keys)
+
+    def add_all(self, keys):
+        """Add episodes to the index.
+
+        @param keys: Keys of the episodes to add.
+        @type keys: iterable over str
+        """
+        self.keys.update(keys)
+
+    def save(self):
+        """Write this index to disk, replacing any prior version atomically."""
+        directory = os.path.dirname(os.path.abspath(self.loc))
+        (handle, temp_path) = tempfile.mkstemp(dir=directory)
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'keys': sorted(self.keys)}, f)
+        common.replace_file(temp_path, self.loc)
+
+
+def load_index(loc, existing_info=None, key_field='loc'):
+    """Load an episode index, seeding it from existing episodes if needed.
+
+    @param loc: The location of the index.
+    @type loc: basestring
+    @keyword existing_info: Dictionary with an episodes key listing episodes
+        already parsed. Used to build the index if it has not been saved yet.
+        Defaults to None.
+    @type existing_info: dict
+    @keyword key_field: The episode field used as the key when seeding from
+        existing_info. Defaults to loc.
+    @type key_field: basestring
+    @return: The loaded index.
+    @rtype: EpisodeIndex
+    """
+    if os.path.isfile(loc):
+        with open(loc) as f:
+            contents = json.load(f)
+        return EpisodeIndex(loc, contents['keys'])
+
+    if existing_info == None:
+        return EpisodeIndex(loc)
+
+    return build_index(loc, existing_info['episodes'], key_field)
+
+
+def build_index(loc, episodes, key_field='loc'):
+    """Create an index describing a collection of episodes.
+
+    @param loc: The location to which the index should be saved.
+    @type loc: basestring
+    @param episodes: Dictionaries describing the episodes to include.
+    @type episodes: list of dict
+    @keyword key_field: The episode field used as the key. Defaults to loc.
+    @type key_field: basestring
+    @return: Index containing the provided episodes.
+    @rtype: EpisodeIndex
+    """
+    return EpisodeIndex(loc, map(lambda x: x[key_field], episodes))
+
+
+def iterate_until_known(pages, index):
+    """Walk paginated episode keys until a page has only known episodes.
+
+    Pages are consumed lazily so that, when pages are downloaded on demand,
+    pages after the first page of only known episodes are never requested.
+
+    @param pages: Iterable over pages where each page is a list of episode
+        keys (newest pages first).
+    @type pages: iterable over list of str
+    @param index: The index of episodes already parsed.
+    @type index: EpisodeIndex
+    @return: Generator over the unknown keys on each page up to (but not
+        including) the first non-empty page with no unknown keys. Empty pages
+        are skipped.
+    @rtype: generator over list of str
+    """
+    for keys in pages:
+        if len(keys) == 0:
+            continue
+
+        new_keys = index.filter_new(keys)
+        if len(new_keys) == 0:
+            return
+
+        yield new_keys
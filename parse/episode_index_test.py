@@ -0,0 +1,72 @@
+"""Unit tests for the persistent episode index.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+import common
+import episode_index
+
+
+class EpisodeIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.loc = os.path.join(self.directory, 'episodes.json.index')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_filter_new(self):
+        index = episode_index.EpisodeIndex(self.loc, ['a', 'b'])
+        self.assertEqual(index.filter_new(['c', 'a', 'd']), ['c', 'd'])
+
+    def test_save_and_load(self):
+        index = episode_index.EpisodeIndex(self.loc, ['a'])
+        index.add_all(['b'])
+        index.save()
+
+        loaded = episode_index.load_index(self.loc)
+        self.assertTrue('a' in loaded)
+        self.assertTrue('b' in loaded)
+        self.assertFalse('c' in loaded)
+
+    def test_save_new_file_mode(self):
+        episode_index.EpisodeIndex(self.loc, ['a']).save()
+        mode = stat.S_IMODE(os.stat(self.loc).st_mode)
+        self.assertEqual(mode, common.NEW_FILE_MODE)
+
+    def test_load_seeds_from_existing(self):
+        existing_info = {'episodes': [{'name': 'a'}, {'name': 'b'}]}
+        index = episode_index.load_index(self.loc, existing_info, 'name')
+
+        self.assertEqual(index.keys, set(['a', 'b']))
+        self.assertFalse(os.path.isfile(self.loc))
+
+    def test_load_missing(self):
+        index = episode_index.load_index(self.loc)
+        self.assertEqual(len(index.keys), 0)
+
+    def test_iterate_until_known(self):
+        index = episode_index.EpisodeIndex(self.loc, ['c', 'd'])
+        pages_read = []
+
+        def create_pages():
+            for page in [['a', 'b'], [], ['b', 'c'], ['d'], ['e']]:
+                pages_read.append(page)
+                yield page
+
+        pages = list(episode_index.iterate_until_known(create_pages(), index))
+
+        self.assertEqual(pages, [['a', 'b'], ['b']])
+        self.assertEqual(len(pages_read), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
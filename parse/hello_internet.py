@@ -3,10 +3,14 @@
 Logic and structures to download podcast Hello Internet episode information
 which can be operated from the command line with the following usage:
 
-    python hello_internet.py [JSON FILE LOCATION]
+    python hello_internet.py [JSON FILE LOCATION] [all|new (optional)]
+        [WORKERS (optional)]
 
 This program will write the parsed episode information to a JSON file at the
-provided file location, overwriting any prior file content.
+provided file location, overwriting any prior file content unless "new" is
+passed in which case only episodes not already in that file are parsed and
+added to it. Natural language processing runs across WORKERS processes
+(defaults to the number of cores on this machine).
 
 Note that HI is an external service (c) 2015 CGP Grey and Brady Haran. We love
 our podcasters and you should too. This is a tool meant for anthropological
@@ -20,9 +24,9 @@ import collections
 import sys
 
 import bs4
-import requests
 
 import common
+import episode_index
 
 
 RSS_URL = 'http://feeds.podtrac.com/m2lTaLRx8AWb' 
@@ -52,7 +56,8 @@ FILTERED_PHRASES = [
     'this episode'
 ]
 PHRASE_REPLACEMENTS = {'the star wars': 'star wars'}
-USAGE_STR = 'python hello_internet.py [out json file]'
+USAGE_STR = ('python hello_internet.py [out json file] [all|new (optional)] '
+    '[workers (optional)]')
 
 
 def get_rss_content():
@@ -61,16 +66,18 @@ def get_rss_content():
     @return: Raw string contents of the HI RSS feed.
     @rtype: basestring
     """
-    return requests.get(RSS_URL, headers=common.DEFAULT_HEADERS).text
+    return common.get_page(RSS_URL).text
 
 
-def get_description_content(item_soup):
-    """Get the description of an episode
+def get_description_text(description_soup):
+    """Get the description of an episode from the soup of its description.
 
-    @param item_soup: Soup containing a single podcast episode.
-    @type item_soup: bs4.BeautifulSoup
+    @param description_soup: Soup containing the HTML description of a single
+        podcast episode.
+    @type description_soup: bs4.BeautifulSoup
+    @return: Text of the description before any show notes.
+    @rtype: basestring
     """
-    description_soup = item_soup.find('description')
     header_soup = description_soup.find('h2')
 
     if header_soup:
@@ -90,6 +97,28 @@ def get_description_content(item_soup):
         return description_soup.getText().strip()
 
 
+def get_description_content(item_soup):
+    """Get the description of an episode
+
+    @param item_soup: Soup containing a single podcast episode.
+    @type item_soup: bs4.BeautifulSoup
+    """
+    return get_description_text(item_soup.find('description'))
+
+
+def get_item_description(title, item_soup):
+    """Get the text to be used to find the tags for an episode.
+
+    @param title: The title of the episode.
+    @type title: basestring
+    @param item_soup: Soup containing episode information.
+    @type item_soup: bs4.BeautifulSoup
+    @return: The episode title followed by its description.
+    @rtype: basestring
+    """
+    return title + '. ' + get_description_content(item_soup)
+
+
 def get_item_tags(title, item_soup, stem_mapping):
     """Get the tags for an episode.
 
@@ -100,49 +129,124 @@ def get_item_tags(title, item_soup, stem_mapping):
     @param stem_mapping: Mapping renaming stems for nlptk.
     @type stem_mapping: dict (str to str)
     """
-    description_content = title + '. ' + get_description_content(item_soup)
     return common.get_tags_by_nlp(
-        description_content,
+        get_item_description(title, item_soup),
         PHRASE_REPLACEMENTS,
         stem_mapping,
         FILTERED_PHRASES
     )
 
 
-def parse_item(item_soup, stem_mapping):
-    """Get information about a single HI episode.
+def create_record(title, pub_date_raw, duration_str, tags):
+    """Describe a single HI episode from the raw strings in its feed item.
 
-    @param item_soup: Soup containing information about a single HI episode.
-    @type item_soup: bs4.BeautifulSoup
+    @param title: The title of the episode.
+    @type title: basestring
+    @param pub_date_raw: RFC 2822 publication date of the episode.
+    @type pub_date_raw: basestring
+    @param duration_str: The itunes:duration of the episode or None if not
+        provided.
+    @type duration_str: basestring
+    @param tags: The tags found for the episode by natural language processing.
+    @type tags: list of str
     @return: Dictionary describing the episode. Contains keys name (str value),
         date (datetime.date), loc (url - str value), duration (seconds - int),
         and orig_tags (tags applied to episode - list of str)
     @rtype: dict
     """
-    item_date = common.interpret_2822_date(
-        item_soup.find('pubdate').contents[0]
-    )
-    
-    duration_soup = item_soup.find('itunes:duration')
-    if duration_soup:
-        duration = common.interpret_duration(
-            item_soup.find('itunes:duration').contents[0]
-        )
+    item_date = common.interpret_2822_date(pub_date_raw)
+
+    if duration_str:
+        duration = common.interpret_duration(duration_str)
     else:
         duration = 7200
 
-    title = item_soup.find('title').contents[0]
-    
     return {
         'name': title,
         'date': item_date,
         'loc': '',
         'duration': duration,
-        'orig_tags': get_item_tags(title, item_soup, stem_mapping)
+        'orig_tags': tags
     }
 
 
-def parse_new_items(soup, existing_content_by_name):
+def create_item_record(item_soup, tags):
+    """Describe a single HI episode given the tags already found for it.
+
+    @param item_soup: Soup containing information about a single HI episode.
+    @type item_soup: bs4.BeautifulSoup
+    @param tags: The tags found for the episode by natural language processing.
+    @type tags: list of str
+    @return: Dictionary describing the episode. Contains keys name (str value),
+        date (datetime.date), loc (url - str value), duration (seconds - int),
+        and orig_tags (tags applied to episode - list of str)
+    @rtype: dict
+    """
+    duration_soup = item_soup.find('itunes:duration')
+    if duration_soup:
+        duration_str = duration_soup.contents[0]
+    else:
+        duration_str = None
+
+    return create_record(
+        item_soup.find('title').contents[0],
+        item_soup.find('pubdate').contents[0],
+        duration_str,
+        tags
+    )
+
+
+def parse_items(item_soups, stem_mapping, workers=None):
+    """Get information about many HI episodes, finding their tags in a batch.
+
+    @param item_soups: Soups each containing information about a single HI
+        episode.
+    @type item_soups: list of bs4.BeautifulSoup
+    @param stem_mapping: Mapping renaming stems for nlptk.
+    @type stem_mapping: dict (str to str)
+    @keyword workers: The number of processes to use for natural language
+        processing. If None, uses the number of cores on this machine. Defaults
+        to None.
+    @type workers: int
+    @return: List of dictionaries describing the episodes in the same format as
+        parse_item.
+    @rtype: list of dict
+    """
+    descriptions = map(
+        lambda x: get_item_description(x.find('title').contents[0], x),
+        item_soups
+    )
+
+    tag_lists = common.get_tags_by_nlp_parallel(
+        descriptions,
+        PHRASE_REPLACEMENTS,
+        stem_mapping,
+        FILTERED_PHRASES,
+        workers=workers
+    )
+
+    return map(
+        lambda (item_soup, tags): create_item_record(item_soup, tags),
+        zip(item_soups, tag_lists)
+    )
+
+
+def parse_item(item_soup, stem_mapping):
+    """Get information about a single HI episode.
+
+    @param item_soup: Soup containing information about a single HI episode.
+    @type item_soup: bs4.BeautifulSoup
+    @param stem_mapping: Mapping renaming stems for nlptk.
+    @type stem_mapping: dict (str to str)
+    @return: Dictionary describing the episode. Contains keys name (str value),
+        date (datetime.date), loc (url - str value), duration (seconds - int),
+        and orig_tags (tags applied to episode - list of str)
+    @rtype: dict
+    """
+    return parse_items([item_soup], stem_mapping, workers=1)[0]
+
+
+def parse_new_items(soup, existing_content_by_name, workers=None):
     """Prase all podcast episodes from the RSS feed.
 
     @param soup: Soup with all podcast episodes.
@@ -150,6 +254,10 @@ def parse_new_items(soup, existing_content_by_name):
     @param existing_content_by_name: Collection with the names of HI epsiodes
         already parsed.
     @type existing_content_by_name: Collection of str
+    @keyword workers: The number of processes to use for natural language
+        processing. If None, uses the number of cores on this machine. Defaults
+        to None.
+    @type workers: int
     """
     items_soup = soup.findAll('item')
 
@@ -167,31 +275,141 @@ def parse_new_items(soup, existing_content_by_name):
 
     stem_mapping = {}
 
-    new_items = map(
-        lambda x: parse_item(x, stem_mapping),
-        new_item_soups
-    )
+    new_items = parse_items(new_item_soups, stem_mapping, workers)
 
     common.consolidate_tags(new_items, stem_mapping, 1)
 
     return new_items
 
 
+def read_item_element(item_element):
+    """Read a single streamed HI episode without finding its tags.
+
+    @param item_element: Element for a single item as read by
+        common.iterate_feed_items.
+    @type item_element: xml.etree.ElementTree.Element
+    @return: Tuple of the text to use to find the episode's tags and a
+        dictionary describing the episode in the same format as parse_item
+        (with orig_tags set to None).
+    @rtype: tuple
+    """
+    title = item_element.findtext('title')
+    description_soup = common.create_soup(
+        item_element.findtext('description', '')
+    )
+    description = title + '. ' + get_description_text(description_soup)
+
+    record = create_record(
+        title,
+        item_element.findtext('pubDate'),
+        item_element.findtext(common.ITUNES_DURATION_TAG),
+        None
+    )
+
+    return (description, record)
+
+
+def tag_records(descriptions, records, stem_mapping, workers=None):
+    """Find the tags for a batch of HI episodes read by read_item_element.
+
+    @param descriptions: The text to use to find each episode's tags.
+    @type descriptions: list of basestring
+    @param records: Dictionaries describing each episode whose orig_tags will
+        be set.
+    @type records: list of dict
+    @param stem_mapping: Mapping renaming stems for nlptk.
+    @type stem_mapping: dict (str to str)
+    @keyword workers: The number of processes to use for natural language
+        processing. If None, uses the number of cores on this machine. Defaults
+        to None.
+    @type workers: int
+    @return: The provided records.
+    @rtype: list of dict
+    """
+    tag_lists = common.get_tags_by_nlp_parallel(
+        descriptions,
+        PHRASE_REPLACEMENTS,
+        stem_mapping,
+        FILTERED_PHRASES,
+        workers=workers
+    )
+
+    for (record, tags) in zip(records, tag_lists):
+        record['orig_tags'] = tags
+
+    return records
+
+
+def read_new_items(stream, existing_content_by_name, stem_mapping,
+    workers=None):
+    """Parse the new podcast episodes from the RSS feed as it is read.
+
+    The feed is read one item at a time but all new episodes are tagged in a
+    single call so that part of speech tagging is batched across every
+    episode and a single pool of processes is used.
+
+    @param stream: File-like object with the raw HI RSS feed.
+    @type stream: file-like object
+    @param existing_content_by_name: Collection with the names of HI epsiodes
+        already parsed.
+    @type existing_content_by_name: Collection of str
+    @param stem_mapping: Mapping renaming stems for nlptk.
+    @type stem_mapping: dict (str to str)
+    @keyword workers: The number of processes to use for natural language
+        processing. If None, uses the number of cores on this machine. Defaults
+        to None.
+    @type workers: int
+    @return: Dictionaries describing the new episodes in the same format as
+        parse_item.
+    @rtype: list of dict
+    """
+    descriptions = []
+    records = []
+
+    for item_element in common.iterate_feed_items(stream):
+        if item_element.findtext('title') in existing_content_by_name:
+            continue
+
+        (description, record) = read_item_element(item_element)
+        descriptions.append(description)
+        records.append(record)
+
+    return tag_records(descriptions, records, stem_mapping, workers)
+
+
 def main():
     """Driver for the Hello Internet parser."""
-    if len(sys.argv) != 2:
+    if len(sys.argv) not in [2, 3, 4]:
         print USAGE_STR
-        return
+        sys.exit(1)
 
-    content = get_rss_content()
-    soup = bs4.BeautifulSoup(content)
-    items = parse_new_items(soup, {})
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'all'
+    if not mode in ['all', 'new']:
+        print USAGE_STR
+        sys.exit(1)
+
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
 
     out_location = sys.argv[1]
+    index_location = episode_index.get_index_location(out_location)
+
+    if mode == 'new':
+        serialized = common.load_episodes(out_location)
+        index = episode_index.load_index(index_location, serialized, 'name')
+    else:
+        serialized = {'episodes': []}
+        index = episode_index.EpisodeIndex(index_location)
+
+    stem_mapping = {}
+    stream = common.open_stream(RSS_URL)
+    items = read_new_items(stream, index, stem_mapping, workers)
+    common.consolidate_new_tags(serialized['episodes'], items, stem_mapping, 1)
+
+    serialized['episodes'].extend(items)
+    index.add_all(map(lambda x: x['name'], items))
 
-    with open(out_location, 'w') as f:
-        out_str = common.DateJSONEncoder().encode({'episodes': items})
-        f.write(out_str)
+    common.write_episodes(out_location, serialized)
+    index.save()
 
 
 if __name__ == '__main__':
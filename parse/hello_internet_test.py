@@ -9,6 +9,7 @@ import unittest
 
 import bs4
 
+import common
 import hello_internet
 
 
@@ -70,6 +71,26 @@ class HelloInternetTest(unittest.TestCase):
         self.assertEqual(new_item['date'], datetime.date(2015, 3, 16))
         self.assertEqual(new_item['duration'], 7200)
 
+    def test_read_item_element(self):
+        with open('hello_internet_sample.xml', 'r') as f:
+            item_element = next(common.iterate_feed_items(f))
+            (description, record) = hello_internet.read_item_element(
+                item_element
+            )
+
+        expected_description = 'H.I. #34: Line in the Sand. Warning: Grey ' +\
+        'and Brady are over-worked, underprepared, and just a little bit ' +\
+        'grumpy.  Nonetheless, they bravely soldier on to discuss: emailing ' +\
+        'Brady, "You\'re CGP Grey", the lasting value of (some) teachers, ' +\
+        'NOT plane crash corner but iPhone corner!, self-employed ' +\
+        'vacations, the solar eclipse, and Vessel.'
+
+        self.assertEqual(description, expected_description)
+        self.assertEqual(record['name'], 'H.I. #34: Line in the Sand')
+        self.assertEqual(record['date'], datetime.date(2015, 3, 30))
+        self.assertEqual(record['duration'], 6168)
+        self.assertEqual(record['loc'], '')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,11 +3,13 @@
 Logic and structures to parse the episodes from The Memory Palace which can be
 operated from the command line with the following usage:
 
-    python memory_palace [JSON FILE]
+    python memory_palace [JSON FILE] [all|new (optional)]
 
-The json file location passed as the only argument to the script indicates where
-this program should write the episode information downloaded from the podcast's
-website.
+The json file location passed as the first argument to the script indicates
+where this program should write the episode information downloaded from the
+podcast's website. Pass "new" as the second argument to only download episodes
+not already in that file, stopping at the first index page with only known
+episodes. Defaults to "all".
 
 Note that The Memory Palance is an external service (c) 2015 Nate DiMeo. We love
 our podcasters and you should too. This is a tool meant for anthropological
@@ -18,15 +20,18 @@ research. Please use with the utmost love and care. <3
 """
 
 import common
+import crawler
 import datetime
+import episode_index
 import sys
 
-import requests
-
-import bs4
-
 INDEX_ROOT_LOC = 'http://thememorypalace.us/category/episodes/'
-USAGE_STR = 'python memory_palace.py [json file]'
+INDEX_STRAINER = common.create_strainer(classes=['centerPosts', 'nav-paged'])
+EPISODE_STRAINER = common.create_strainer(
+    classes=['centerPosts', 'pdateS', 'podpress_mediafile_dursize'],
+    rels=['tag']
+)
+USAGE_STR = 'python memory_palace.py [json file] [all|new (optional)]'
 
 
 def download_index_page(loc):
@@ -37,7 +42,74 @@ def download_index_page(loc):
     @return: Raw text of the HTML page with podcast episodes.
     @rtype: basestring
     """
-    return requests.get(loc, headers=common.DEFAULT_HEADERS).text
+    return common.get_page(loc).text
+
+
+def download_index_page_async(loc, page_crawler=None):
+    """Start downloading the HTML listing of podcast episodes.
+
+    @param loc: The location of the HTML page with podcast episodes.
+    @type loc: basestring
+    @keyword page_crawler: The crawler through which the page is downloaded. If
+        None, uses the crawler shared by all scrapers. Defaults to None.
+    @type page_crawler: crawler.Crawler
+    @return: Pending result whose value is the raw text of the HTML page with
+        podcast episodes.
+    @rtype: crawler.PendingResult
+    """
+    if page_crawler == None:
+        page_crawler = crawler.get_crawler()
+    return page_crawler.submit(loc).then(lambda x: x.text)
+
+
+def get_episode_links(soup):
+    """Get links to the episodes listed in a parsed index page.
+
+    @param soup: Soup for a podcast episodes listing page.
+    @type soup: bs4.BeautifulSoup
+    @return: Listing of links to the episodes on the page.
+    @rtype: list of str
+    """
+    links = soup.findAll(class_='centerPosts')
+    return map(lambda x: x['href'], links)
+
+
+def get_next_page_link(soup):
+    """Find the link to the next index page in a parsed index page.
+
+    @param soup: Soup for a podcast episodes listing page.
+    @type soup: bs4.BeautifulSoup
+    @return: The URL for the next page of podcast episodes or None if no
+        additional index pages exist.
+    @rtype: basestring
+    """
+    page_section = soup.find(class_='nav-paged')
+    if page_section == None:
+        return None
+
+    links = page_section.findAll('a')
+    next_page_links = filter(
+        lambda x: 'Older' in x.contents[0],
+        links
+    )
+
+    if len(next_page_links) == 0:
+        return None
+    else: 
+        return next_page_links[0]['href']
+
+
+def parse_index_page_and_next(contents):
+    """Get episode links and the next index page from a single parse.
+
+    @param contents: The podcast episodes listing page to parse.
+    @type contents: basestring
+    @return: Tuple of the links to the episodes on the page (list of str) and
+        the URL of the next index page (str or None if no next page exists).
+    @rtype: tuple
+    """
+    soup = common.create_soup(contents, INDEX_STRAINER)
+    return (get_episode_links(soup), get_next_page_link(soup))
 
 
 def parse_index_page(contents):
@@ -48,9 +120,7 @@ def parse_index_page(contents):
     @return: Listing of links to all of the episodes from The Memory Palace
     @rtype: list of str
     """
-    soup = bs4.BeautifulSoup(contents)
-    links = soup.findAll(class_='centerPosts')
-    return map(lambda x: x['href'], links)
+    return parse_index_page_and_next(contents)[0]
 
 
 def get_next_page(contents):
@@ -66,18 +136,32 @@ def get_next_page(contents):
         additional index pages exist.
     @rtype: basestring
     """
-    soup = bs4.BeautifulSoup(contents)
-    page_section = soup.find(class_='nav-paged')
-    links = page_section.findAll('a')
-    next_page_links = filter(
-        lambda x: 'Older' in x.contents[0],
-        links
-    )
+    return parse_index_page_and_next(contents)[1]
 
-    if len(next_page_links) == 0:
-        return None
-    else: 
-        return next_page_links[0]['href']
+
+def iterate_index_pages(start_loc=INDEX_ROOT_LOC):
+    """Walk the episode index pages, prefetching the next page.
+
+    Each index page is parsed once. While the caller works with the episode
+    links from one page (like downloading those episodes), the next index page
+    is downloaded in the background by the crawler shared by all scrapers.
+
+    @keyword start_loc: The URL of the first index page. Defaults to
+        INDEX_ROOT_LOC.
+    @type start_loc: basestring
+    @return: Generator over the episode links found on each index page.
+    @rtype: generator over list of str
+    """
+    pending = download_index_page_async(start_loc)
+    while pending != None:
+        (links, next_page) = parse_index_page_and_next(pending.get())
+
+        if next_page == None:
+            pending = None
+        else:
+            pending = download_index_page_async(next_page)
+
+        yield links
 
 
 def parse_episode_page(loc, contents):
@@ -93,7 +177,7 @@ def parse_episode_page(loc, contents):
         and orig_tags (tags applied to episode - list of str)
     @rtype: dict
     """
-    soup = bs4.BeautifulSoup(contents)
+    soup = common.create_soup(contents, EPISODE_STRAINER)
     header = soup.find(class_='centerPosts')
     title = header.find('strong').contents[0]
 
@@ -114,7 +198,7 @@ def parse_episode_page(loc, contents):
     duration = common.interpret_duration(duration_str_clean)
 
     return {
-        'title': title,
+        'name': title,
         'date': episode_date,
         'tags': tags,
         'loc': loc,
@@ -124,33 +208,46 @@ def parse_episode_page(loc, contents):
 
 def main():
     """Driver for the memory palace parser."""
-    if len(sys.argv) != 2:
+    if len(sys.argv) not in [2, 3]:
         print USAGE_STR
-        return
-
-    next_page = INDEX_ROOT_LOC
-    locations = []
-    while next_page != None:
-        contents = download_index_page(next_page)
-        locations.extend(parse_index_page(contents))
-        next_page = get_next_page(contents)
-
-    page_contents = map(
-        lambda x: (x, requests.get(x, headers=common.DEFAULT_HEADERS).text),
-        locations
-    )
+        sys.exit(1)
 
-    episode_info = map(
-        lambda (loc, contents): parse_episode_page(loc, contents),
-        page_contents
-    )
+    mode = sys.argv[2] if len(sys.argv) == 3 else 'all'
+    if not mode in ['all', 'new']:
+        print USAGE_STR
+        sys.exit(1)
+
+    common.configure_cache_from_environ()
 
     out_location = sys.argv[1]
-    with open(out_location, 'w') as f:
-        serialized_str = common.DateJSONEncoder().encode({
-            'episodes': episode_info
-        })
-        f.write(serialized_str)
+    index_location = episode_index.get_index_location(out_location)
+
+    if mode == 'new':
+        serialized = common.load_episodes(out_location)
+        index = episode_index.load_index(index_location, serialized)
+        pages = episode_index.iterate_until_known(iterate_index_pages(), index)
+    else:
+        serialized = {'episodes': []}
+        index = episode_index.EpisodeIndex(index_location)
+        pages = iterate_index_pages()
+
+    new_locations = []
+    with common.EpisodeWriter(out_location) as writer:
+        writer.write_all(serialized['episodes'])
+
+        for locations in pages:
+            page_contents = zip(
+                locations,
+                map(lambda x: x.text, crawler.fetch_many(locations))
+            )
+            writer.write_all(map(
+                lambda (loc, contents): parse_episode_page(loc, contents),
+                page_contents
+            ))
+            new_locations.extend(locations)
+
+    index.add_all(new_locations)
+    index.save()
 
 
 if __name__ == '__main__':
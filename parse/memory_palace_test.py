@@ -11,6 +11,15 @@ import unittest
 import memory_palace
 
 
+class FakePendingResult(object):
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
 class MemoryPalaceTests(unittest.TestCase):
 
     def test_parse_index_page(self):
@@ -29,12 +38,41 @@ class MemoryPalaceTests(unittest.TestCase):
             'http://thememorypalace.us/2009/01/episode-5/'
         )
 
+    def test_get_next_page_none(self):
+        with open('memory_palace_index_sample.html', 'r') as f:
+            sample_contents = f.read()
+
+        self.assertEqual(memory_palace.get_next_page(sample_contents), None)
+
+    def test_iterate_index_pages(self):
+        pages = {
+            '/1': '<a class="centerPosts" href="/e1"></a>' +
+                '<div class="nav-paged"><a href="/2">Older Entries</a></div>',
+            '/2': '<a class="centerPosts" href="/e2"></a>' +
+                '<div class="nav-paged"><a href="/1">Newer Entries</a></div>'
+        }
+        downloaded = []
+
+        def fake_download_index_page_async(loc):
+            downloaded.append(loc)
+            return FakePendingResult(pages[loc])
+
+        original_download = memory_palace.download_index_page_async
+        memory_palace.download_index_page_async = fake_download_index_page_async
+        try:
+            links = list(memory_palace.iterate_index_pages('/1'))
+        finally:
+            memory_palace.download_index_page_async = original_download
+
+        self.assertEqual(links, [['/e1'], ['/e2']])
+        self.assertEqual(downloaded, ['/1', '/2'])
+
     def test_parse_episode_page(self):
         with open('memory_palace_episode_sample.html', 'r') as f:
             sample_contents = f.read()
 
         episode_info = memory_palace.parse_episode_page('test', sample_contents)
-        self.assertEqual(episode_info['title'], 'Oh My!')
+        self.assertEqual(episode_info['name'], 'Oh My!')
         self.assertEqual(episode_info['date'], datetime.date(2009, 1, 30))
         self.assertEqual(episode_info['loc'], 'test')
         self.assertEqual(episode_info['duration'], 87)
@@ -3,10 +3,14 @@
 Logic and structures to download and parse podcast information for 99 Percent
 Invisible. This can be run from the command line with the following usage:
 
-    python nintyninepi.py [OUTPUT JSON FILE]
+    python nintyninepi.py [OUTPUT JSON FILE] [all|new (optional)]
+        [WORKERS (optional)]
 
 The script will write the parsed episode information to the provided disk
-location, overwriting any existing contents in that target file.
+location, overwriting any existing contents in that target file unless "new"
+is passed in which case only episodes not already in that file are downloaded
+and added to it. Natural language processing runs across WORKERS processes
+(defaults to the number of cores on this machine).
 
 Note that 99 Percent Invisible is an external service (c) 99 Percent Invisible.
 We love our podcasters and you should too. This is a tool meant for
@@ -18,13 +22,21 @@ anthropological research. Please use with the utmost love and care. <3
 
 
 import datetime
+import multiprocessing.pool
 import sys
 
 import common
+import episode_index
 
 import soundcloud
 
-USAGE_STR = 'python nintyninepi.py [out json file]'
+USER_LOC = '/users/5539303'
+TRACKS_LOC = USER_LOC + '/tracks'
+TRACKS_PAGE_SIZE = 200
+TRACKS_FAN_OUT = 8
+
+USAGE_STR = ('python nintyninepi.py [out json file] [all|new (optional)] '
+    '[workers (optional)]')
 FILTERED_PHRASES = [
     'help',
     'producer',
@@ -162,9 +174,48 @@ MAPPED_PHRASES = {
 }
 
 
-def load_tracks():
+def get_tracks_page(client, offset, page_size):
+    """Load a single page of the 99pi episode listing from Sound Cloud.
+
+    @param client: The Sound Cloud client through which to make the request.
+    @type client: soundcloud.Client
+    @param offset: The index of the first track to include in the page.
+    @type offset: int
+    @param page_size: The maximum number of tracks to include in the page.
+    @type page_size: int
+    @return: Dictionary with a collection key listing the tracks on the page
+        and a next_href key if more tracks are available.
+    @rtype: dict
+    """
+    return client.get(
+        TRACKS_LOC,
+        limit=page_size,
+        order='created_at',
+        linked_partitioning=1,
+        offset=offset
+    ).fields()
+
+
+def load_tracks(index=None, page_size=TRACKS_PAGE_SIZE, fan_out=TRACKS_FAN_OUT):
     """Load information about the 99pi episodes from Sound Cloud.
 
+    The total number of tracks is read from the user's profile so that pages
+    can be requested in concurrent batches of up to fan_out pages instead of
+    one at a time. Pages are stitched back together in their original order.
+    When an index is provided, pages are requested one at a time until a page
+    holds only unknown tracks so that a refresh with few new episodes does not
+    download the whole back catalog before stopping.
+
+    @keyword index: If provided, skip tracks whose permalink is in this index
+        and stop paging at the first page with only known tracks. Defaults to
+        None (load all tracks).
+    @type index: episode_index.EpisodeIndex
+    @keyword page_size: The number of tracks to request per page. Sound Cloud
+        allows up to 200. Defaults to TRACKS_PAGE_SIZE.
+    @type page_size: int
+    @keyword fan_out: The maximum number of pages requested concurrently.
+        Defaults to TRACKS_FAN_OUT.
+    @type fan_out: int
     @return: List of episodes from Sound Cloud with their episode metadata.
     @rtype: List of dict
     """
@@ -172,24 +223,54 @@ def load_tracks():
         client_id = f.read().replace('\n', '')
         client = soundcloud.Client(client_id=client_id)
 
-    offset = 0
-    has_next = True
-    
-    tracks = []
-    while has_next:
-        new_tracks_info = client.get(
-            '/users/5539303/tracks',
-            limit=50,
-            order='created_at',
-            linked_partitioning=1,
-            offset=offset
-        )
-        has_next = 'next_href' in new_tracks_info.fields()
+    track_count = client.get(USER_LOC).fields()['track_count']
+
+    pool = multiprocessing.pool.ThreadPool(fan_out)
+    try:
+        offset = 0
+        has_next = True
+        fan_out_ready = index == None
+
+        tracks = []
+        while has_next:
+            pages_remaining = (track_count - offset + page_size - 1) / page_size
+            if fan_out_ready:
+                batch_size = min(fan_out, max(pages_remaining, 1))
+            else:
+                batch_size = 1
+            offsets = range(offset, offset + batch_size * page_size, page_size)
+
+            pages = pool.map(
+                lambda x: get_tracks_page(client, x, page_size),
+                offsets
+            )
+
+            for page in pages:
+                has_next = 'next_href' in page and len(page['collection']) > 0
+                page_tracks = page['collection']
+
+                if index != None:
+                    new_tracks = filter(
+                        lambda x: not x['permalink'] in index,
+                        page_tracks
+                    )
+                    if len(new_tracks) == 0:
+                        return tracks
 
-        offset += 50
-        tracks.extend(new_tracks_info.fields()['collection'])
+                    fan_out_ready = len(new_tracks) == len(page_tracks)
+                    page_tracks = new_tracks
 
-    return tracks
+                tracks.extend(page_tracks)
+
+                if not has_next:
+                    break
+
+            offset += batch_size * page_size
+
+        return tracks
+    finally:
+        pool.close()
+        pool.join()
 
 
 def interpret_99pi_date(target):
@@ -211,11 +292,13 @@ def interpret_99pi_date(target):
     )
 
 
-def process_track(target, stem_mapping):
-    """Process a single episode from the 99pi Sound Cloud listing.
+def create_track_record(target, tags):
+    """Describe a single episode given the tags already found for it.
 
     @param target: The track listing returned from the Sound Cloud API.
     @type target: dict
+    @param tags: The tags found for the episode by natural language processing.
+    @type tags: list of str
     @return: Dictionary describing the episode. Contains keys name (str value),
         date (datetime.date), loc (url - str value), duration (seconds - int),
         and orig_tags (tags applied to episode - list of str)
@@ -225,12 +308,6 @@ def process_track(target, stem_mapping):
     date = interpret_99pi_date(target['created_at'])
     loc = target['permalink']
     duration = target['duration'] / 1000
-    tags = common.get_tags_by_nlp(
-        target['description'],
-        MAPPED_PHRASES,
-        stem_mapping,
-        FILTERED_PHRASES
-    )
 
     return {
         'name': name,
@@ -241,26 +318,90 @@ def process_track(target, stem_mapping):
     }
 
 
+def process_tracks(targets, stem_mapping, workers=None):
+    """Process many episodes from the 99pi Sound Cloud listing in a batch.
+
+    @param targets: The track listings returned from the Sound Cloud API.
+    @type targets: list of dict
+    @param stem_mapping: Mapping renaming stems for nlptk.
+    @type stem_mapping: dict (str to str)
+    @keyword workers: The number of processes to use for natural language
+        processing. If None, uses the number of cores on this machine. Defaults
+        to None.
+    @type workers: int
+    @return: List of dictionaries describing the episodes in the same format
+        as process_track.
+    @rtype: list of dict
+    """
+    tag_lists = common.get_tags_by_nlp_parallel(
+        map(lambda x: x['description'], targets),
+        MAPPED_PHRASES,
+        stem_mapping,
+        FILTERED_PHRASES,
+        workers=workers
+    )
+
+    return map(
+        lambda (target, tags): create_track_record(target, tags),
+        zip(targets, tag_lists)
+    )
+
+
+def process_track(target, stem_mapping):
+    """Process a single episode from the 99pi Sound Cloud listing.
+
+    @param target: The track listing returned from the Sound Cloud API.
+    @type target: dict
+    @param stem_mapping: Mapping renaming stems for nlptk.
+    @type stem_mapping: dict (str to str)
+    @return: Dictionary describing the episode. Contains keys name (str value),
+        date (datetime.date), loc (url - str value), duration (seconds - int),
+        and orig_tags (tags applied to episode - list of str)
+    @rtype: dict
+    """
+    return process_tracks([target], stem_mapping, workers=1)[0]
+
+
 def main():
     """Driver for the 99 Percent Invisible parser."""
-    if len(sys.argv) != 2:
+    if len(sys.argv) not in [2, 3, 4]:
         print USAGE_STR
-        return
+        sys.exit(1)
 
-    raw_tracks_info = load_tracks()
+    mode = sys.argv[2] if len(sys.argv) > 2 else 'all'
+    if not mode in ['all', 'new']:
+        print USAGE_STR
+        sys.exit(1)
+
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+
+    out_location = sys.argv[1]
+    index_location = episode_index.get_index_location(out_location)
+
+    if mode == 'new':
+        serialized = common.load_episodes(out_location)
+        index = episode_index.load_index(index_location, serialized)
+        raw_tracks_info = load_tracks(index)
+    else:
+        serialized = {'episodes': []}
+        index = episode_index.EpisodeIndex(index_location)
+        raw_tracks_info = load_tracks()
 
     stem_mapping = {}
-    processed_tracks = map(
-        lambda x: process_track(x, stem_mapping),
-        raw_tracks_info
+    processed_tracks = process_tracks(raw_tracks_info, stem_mapping, workers)
+
+    common.consolidate_new_tags(
+        serialized['episodes'],
+        processed_tracks,
+        stem_mapping,
+        2
     )
 
-    common.consolidate_tags(processed_tracks, stem_mapping, 2)
+    serialized['episodes'].extend(processed_tracks)
+    index.add_all(map(lambda x: x['loc'], processed_tracks))
 
-    with open(sys.argv[1], 'w') as f:
-        f.write(common.DateJSONEncoder().encode({
-            'episodes': processed_tracks
-        }))
+    common.write_episodes(out_location, serialized)
+    index.save()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,150 @@
+"""Unit tests for the 99pi Sound Cloud track loader.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import mox
+
+import episode_index
+import nintyninepi
+
+
+FakeResource = collections.namedtuple('FakeResource', ['fields'])
+
+
+class FakeClient(object):
+
+    track_count = 0
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+
+    def get(self, loc):
+        return FakeResource(lambda: {'track_count': self.track_count})
+
+
+class LoadTracksTests(mox.MoxTestBase):
+
+    def setUp(self):
+        super(LoadTracksTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.original_directory = os.getcwd()
+        os.chdir(self.directory)
+        with open('soundcloudkey.txt', 'w') as f:
+            f.write('test key\n')
+
+        self.lock = threading.Lock()
+        self.offsets = []
+        self.stubs.Set(nintyninepi.soundcloud, 'Client', FakeClient)
+        self.stubs.Set(nintyninepi, 'get_tracks_page', self.fake_get_page)
+
+    def tearDown(self):
+        os.chdir(self.original_directory)
+        shutil.rmtree(self.directory)
+        super(LoadTracksTests, self).tearDown()
+
+    def set_catalog(self, num_tracks, track_count=None, always_next=False):
+        self.num_tracks = num_tracks
+        self.always_next = always_next
+        if track_count == None:
+            track_count = num_tracks
+        self.stubs.Set(FakeClient, 'track_count', track_count)
+
+    def fake_get_page(self, client, offset, page_size):
+        self.assertEqual(client.client_id, 'test key')
+        with self.lock:
+            self.offsets.append(offset)
+
+        end = min(offset + page_size, self.num_tracks)
+        page = {'collection': map(
+            lambda x: {'permalink': 't%d' % x},
+            range(offset, end)
+        )}
+        if self.always_next or end < self.num_tracks:
+            page['next_href'] = 'next'
+        return page
+
+    def get_permalinks(self, tracks):
+        return map(lambda x: x['permalink'], tracks)
+
+    def create_index(self, known):
+        loc = os.path.join(self.directory, 'episodes.json.index')
+        return episode_index.EpisodeIndex(loc, known)
+
+    def test_load_tracks_partial_last_page(self):
+        self.set_catalog(250)
+
+        tracks = nintyninepi.load_tracks(page_size=100, fan_out=2)
+
+        expected = map(lambda x: 't%d' % x, range(250))
+        self.assertEqual(self.get_permalinks(tracks), expected)
+        self.assertEqual(sorted(self.offsets), [0, 100, 200])
+
+    def test_load_tracks_batches(self):
+        self.set_catalog(1000)
+
+        tracks = nintyninepi.load_tracks(page_size=100, fan_out=4)
+
+        expected = map(lambda x: 't%d' % x, range(1000))
+        self.assertEqual(self.get_permalinks(tracks), expected)
+        self.assertEqual(sorted(self.offsets), range(0, 1000, 100))
+
+    def test_load_tracks_stops_on_empty_page(self):
+        self.set_catalog(150, track_count=500, always_next=True)
+
+        tracks = nintyninepi.load_tracks(page_size=100, fan_out=8)
+
+        expected = map(lambda x: 't%d' % x, range(150))
+        self.assertEqual(self.get_permalinks(tracks), expected)
+        self.assertEqual(sorted(self.offsets), range(0, 500, 100))
+
+    def test_load_tracks_count_too_low(self):
+        self.set_catalog(250, track_count=100)
+
+        tracks = nintyninepi.load_tracks(page_size=100, fan_out=4)
+
+        expected = map(lambda x: 't%d' % x, range(250))
+        self.assertEqual(self.get_permalinks(tracks), expected)
+        self.assertEqual(self.offsets, [0, 100, 200])
+
+    def test_load_tracks_new_all_known(self):
+        self.set_catalog(1000)
+        index = self.create_index(map(lambda x: 't%d' % x, range(1000)))
+
+        tracks = nintyninepi.load_tracks(index, page_size=100, fan_out=4)
+
+        self.assertEqual(tracks, [])
+        self.assertEqual(self.offsets, [0])
+
+    def test_load_tracks_new_partial_page(self):
+        self.set_catalog(1000)
+        index = self.create_index(map(lambda x: 't%d' % x, range(50, 1000)))
+
+        tracks = nintyninepi.load_tracks(index, page_size=100, fan_out=4)
+
+        expected = map(lambda x: 't%d' % x, range(50))
+        self.assertEqual(self.get_permalinks(tracks), expected)
+        self.assertEqual(self.offsets, [0, 100])
+
+    def test_load_tracks_new_fans_out(self):
+        self.set_catalog(1000)
+        index = self.create_index(map(lambda x: 't%d' % x, range(250, 1000)))
+
+        tracks = nintyninepi.load_tracks(index, page_size=100, fan_out=4)
+
+        expected = map(lambda x: 't%d' % x, range(250))
+        self.assertEqual(self.get_permalinks(tracks), expected)
+        self.assertEqual(self.offsets[0], 0)
+        self.assertEqual(sorted(self.offsets), [0, 100, 200, 300, 400])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,329 @@
+"""Driver running every show parser and then the combine stage.
+
+Logic to refresh the full podcast dataset in one step. Each show's parser is
+run in its own process at the same time as the others so that a full refresh
+takes about as long as the slowest show rather than the sum of all shows.
+Once every parser has finished, the shows that were parsed successfully are
+combined into a single JSON file. This can be run from the command line with:
+
+    python pipeline.py [OUT DIRECTORY] [all|new (optional)]
+
+Where each show's episodes are written to a JSON file in OUT DIRECTORY along
+with a source files listing and the combined dataset (combined.json). Passing
+"new" runs each parser in its "new episodes only" mode against the JSON files
+left in OUT DIRECTORY by a prior run. Defaults to "all". The time taken by
+each show and by each stage is printed when the pipeline finishes.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+import itertools
+import json
+import multiprocessing.pool
+import os
+import subprocess
+import sys
+import time
+
+import common
+
+PARSE_DIR = os.path.dirname(os.path.abspath(__file__))
+COMBINE_DIR = os.path.join(os.path.dirname(PARSE_DIR), 'combine')
+COMBINE_SCRIPT = os.path.join(COMBINE_DIR, 'combine.py')
+TAG_MAPPING_LOC = os.path.join(COMBINE_DIR, 'tag_mapping.json')
+
+RADIOLAB_OLD_START_PAGE = 1
+
+SOURCE_FILES_NAME = 'source_files.json'
+MERGED_PREFIX = 'merged_'
+COMBINED_NAME = 'combined.json'
+
+USAGE_STR = 'python pipeline.py [out directory] [all|new (optional)]'
+
+ShowParser = collections.namedtuple(
+    'ShowParser',
+    ['name', 'show', 'script', 'json_name', 'extra_args']
+)
+
+StageResult = collections.namedtuple(
+    'StageResult',
+    ['name', 'returncode', 'seconds']
+)
+
+SHOW_PARSERS = [
+    ShowParser(
+        'This American Life',
+        'This American Life',
+        'tal.py',
+        'tal.json',
+        []
+    ),
+    ShowParser('Radiolab', 'Radiolab', 'radiolab.py', 'radiolab.json', []),
+    ShowParser(
+        'Radiolab (Archive)',
+        'Radiolab',
+        'radiolab_old.py',
+        'radiolab_old.json',
+        [str(RADIOLAB_OLD_START_PAGE)]
+    ),
+    ShowParser(
+        'The Memory Palace',
+        'The Memory Palace',
+        'memory_palace.py',
+        'memory_palace.json',
+        []
+    ),
+    ShowParser(
+        'Hello Internet',
+        'Hello Internet',
+        'hello_internet.py',
+        'hello_internet.json',
+        []
+    ),
+    ShowParser(
+        '99 Percent Invisible',
+        '99 Percent Invisible',
+        'nintyninepi.py',
+        '99pi.json',
+        []
+    )
+]
+
+
+def get_json_loc(out_dir, show_parser):
+    """Get the location of the JSON file to which a show's parser writes.
+
+    @param out_dir: The directory in which pipeline output is written.
+    @type out_dir: basestring
+    @param show_parser: Description of the show's parser.
+    @type show_parser: ShowParser
+    @return: Location of the show's episode JSON file.
+    @rtype: str
+    """
+    return os.path.join(out_dir, show_parser.json_name)
+
+
+def create_show_command(out_dir, show_parser, mode):
+    """Create the command line that runs a single show's parser.
+
+    @param out_dir: The directory in which pipeline output is written.
+    @type out_dir: basestring
+    @param show_parser: Description of the show's parser.
+    @type show_parser: ShowParser
+    @param mode: Either "all" to parse every episode or "new" to only parse
+        episodes not already in the show's JSON file.
+    @type mode: basestring
+    @return: Arguments with which to start the parser process.
+    @rtype: list of str
+    """
+    return [
+        sys.executable,
+        os.path.join(PARSE_DIR, show_parser.script),
+        get_json_loc(out_dir, show_parser)
+    ] + show_parser.extra_args + [mode]
+
+
+def run_stage(name, command):
+    """Run a pipeline stage in its own process and time it.
+
+    @param name: Human-readable name of the stage.
+    @type name: basestring
+    @param command: Arguments with which to start the stage's process.
+    @type command: list of str
+    @return: Exit code and wall time of the stage.
+    @rtype: StageResult
+    """
+    start = time.time()
+    returncode = subprocess.call(command, cwd=PARSE_DIR)
+    return StageResult(name, returncode, time.time() - start)
+
+
+def run_stages(commands):
+    """Run many pipeline stages at the same time, each in its own process.
+
+    @param commands: Tuples of stage name and the arguments with which to start
+        that stage's process.
+    @type commands: list of tuple
+    @return: Results of each stage in the same order as commands.
+    @rtype: list of StageResult
+    """
+    if len(commands) == 0:
+        return []
+
+    pool = multiprocessing.pool.ThreadPool(len(commands))
+    try:
+        return pool.map(
+            lambda (name, command): run_stage(name, command),
+            commands
+        )
+    finally:
+        pool.close()
+        pool.join()
+
+
+def merge_show_files(locs, out_loc):
+    """Merge the episodes written by several parsers for the same show.
+
+    Episodes are kept in the order of locs. An episode whose URL was already
+    seen in an earlier file is skipped so that episodes listed both in a
+    show's feed and in its archive are only counted once.
+
+    @param locs: The locations of the parsers' episode JSON files.
+    @type locs: list of str
+    @param out_loc: The location to which the merged JSON file is written.
+    @type out_loc: basestring
+    """
+    seen_locs = set()
+
+    def is_new(episode):
+        if not episode['loc']:
+            return True
+        if episode['loc'] in seen_locs:
+            return False
+        seen_locs.add(episode['loc'])
+        return True
+
+    episodes = itertools.chain.from_iterable(itertools.imap(
+        lambda x: common.load_episodes(x)['episodes'],
+        locs
+    ))
+    common.write_episodes_stream(out_loc, itertools.ifilter(is_new, episodes))
+
+
+def get_show_sources(out_dir, show_parsers):
+    """Get the JSON file with each show's episodes, merging them if needed.
+
+    Shows with more than one parser (like Radiolab and its archive) have their
+    parsers' files merged into a single file through merge_show_files.
+
+    @param out_dir: The directory in which pipeline output is written.
+    @type out_dir: basestring
+    @param show_parsers: The parsers whose output should be combined.
+    @type show_parsers: list of ShowParser
+    @return: Dictionary mapping show name (like Radiolab) to the location of
+        the JSON file with that show's episodes.
+    @rtype: dict
+    """
+    parsers_by_show = collections.OrderedDict()
+    for show_parser in show_parsers:
+        parsers_by_show.setdefault(show_parser.show, []).append(show_parser)
+
+    sources = {}
+    for (show, parsers) in parsers_by_show.items():
+        locs = map(lambda x: get_json_loc(out_dir, x), parsers)
+        if len(locs) == 1:
+            sources[show] = locs[0]
+        else:
+            merged_name = MERGED_PREFIX + parsers[0].json_name
+            sources[show] = os.path.join(out_dir, merged_name)
+            merge_show_files(locs, sources[show])
+
+    return sources
+
+
+def write_source_files(loc, out_dir, show_parsers):
+    """Write the source files listing for the combine stage.
+
+    @param loc: The location to which the listing should be written.
+    @type loc: basestring
+    @param out_dir: The directory in which pipeline output is written.
+    @type out_dir: basestring
+    @param show_parsers: The parsers whose output should be combined.
+    @type show_parsers: list of ShowParser
+    """
+    source_files = get_show_sources(out_dir, show_parsers)
+
+    with open(loc, 'w') as f:
+        json.dump(source_files, f, indent=4, sort_keys=True)
+
+
+def report_timings(stage_name, results):
+    """Print the time taken by each step in a pipeline stage.
+
+    @param stage_name: Human-readable name of the stage.
+    @type stage_name: basestring
+    @param results: Results of each step in the stage.
+    @type results: list of StageResult
+    """
+    print '%s:' % stage_name
+    for result in results:
+        status = 'ok' if result.returncode == 0 else 'failed'
+        print '    %-24s %8.1fs  %s' % (result.name, result.seconds, status)
+
+
+def run_pipeline(out_dir, mode, show_parsers=SHOW_PARSERS):
+    """Run every show parser concurrently and then combine their results.
+
+    @param out_dir: The directory in which pipeline output is written.
+    @type out_dir: basestring
+    @param mode: Either "all" to parse every episode or "new" to only parse
+        episodes not already in each show's JSON file.
+    @type mode: basestring
+    @keyword show_parsers: The show parsers to run. Defaults to SHOW_PARSERS.
+    @type show_parsers: list of ShowParser
+    @return: True if every stage succeeded and False otherwise.
+    @rtype: bool
+    """
+    out_dir = os.path.abspath(out_dir)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+
+    pipeline_start = time.time()
+
+    parse_start = time.time()
+    parse_results = run_stages(map(
+        lambda x: (x.name, create_show_command(out_dir, x, mode)),
+        show_parsers
+    ))
+    parse_seconds = time.time() - parse_start
+
+    parsed_shows = map(
+        lambda (show_parser, result): show_parser,
+        filter(
+            lambda (show_parser, result): result.returncode == 0,
+            zip(show_parsers, parse_results)
+        )
+    )
+
+    source_files_loc = os.path.join(out_dir, SOURCE_FILES_NAME)
+    write_source_files(source_files_loc, out_dir, parsed_shows)
+
+    combine_result = run_stage('combine', [
+        sys.executable,
+        COMBINE_SCRIPT,
+        source_files_loc,
+        TAG_MAPPING_LOC,
+        os.path.join(out_dir, COMBINED_NAME)
+    ])
+
+    report_timings('Parse', parse_results)
+    report_timings('Combine', [combine_result])
+    report_timings('Pipeline', [
+        StageResult('parse (wall)', 0, parse_seconds),
+        combine_result,
+        StageResult('total', 0, time.time() - pipeline_start)
+    ])
+
+    all_results = parse_results + [combine_result]
+    return all(map(lambda x: x.returncode == 0, all_results))
+
+
+def main():
+    """Driver for the full parse and combine pipeline."""
+    if len(sys.argv) not in [2, 3]:
+        print USAGE_STR
+        sys.exit(1)
+
+    mode = sys.argv[2] if len(sys.argv) == 3 else 'all'
+    if not mode in ['all', 'new']:
+        print USAGE_STR
+        sys.exit(1)
+
+    if not run_pipeline(sys.argv[1], mode):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""Unit tests for the parse and combine pipeline driver.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+import common
+import memory_palace
+import pipeline
+import radiolab_old
+import tal
+
+
+class PipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_create_show_command(self):
+        show_parser = pipeline.ShowParser(
+            'Test',
+            'Test',
+            'test.py',
+            'test.json',
+            ['2']
+        )
+        command = pipeline.create_show_command('/out', show_parser, 'new')
+
+        self.assertEqual(command[0], sys.executable)
+        self.assertEqual(
+            command[1],
+            os.path.join(pipeline.PARSE_DIR, 'test.py')
+        )
+        self.assertEqual(command[2:], ['/out/test.json', '2', 'new'])
+
+    def test_run_stages_concurrent(self):
+        sleep_command = [sys.executable, '-c', 'import time; time.sleep(0.5)']
+        fail_command = [sys.executable, '-c', 'import sys; sys.exit(2)']
+
+        start = time.time()
+        results = pipeline.run_stages([
+            ('a', sleep_command),
+            ('b', sleep_command),
+            ('c', fail_command)
+        ])
+        elapsed = time.time() - start
+
+        self.assertEqual(map(lambda x: x.name, results), ['a', 'b', 'c'])
+        self.assertEqual(map(lambda x: x.returncode, results), [0, 0, 2])
+        self.assertTrue(results[0].seconds >= 0.5)
+        self.assertTrue(elapsed < 1)
+
+    def test_write_source_files(self):
+        loc = os.path.join(self.directory, 'sources.json')
+        pipeline.write_source_files(loc, '/out', [
+            pipeline.ShowParser('Test', 'Test', 'test.py', 'test.json', [])
+        ])
+
+        with open(loc) as f:
+            self.assertEqual(json.load(f), {'Test': '/out/test.json'})
+
+    def test_write_source_files_merges_show(self):
+        common.write_episodes(os.path.join(self.directory, 'new.json'), {
+            'episodes': [
+                {'name': 'a', 'loc': 'http://a', 'tags': ['x']},
+                {'name': 'b', 'loc': 'http://b', 'tags': ['y']}
+            ]
+        })
+        common.write_episodes(os.path.join(self.directory, 'old.json'), {
+            'episodes': [
+                {'name': 'b (old)', 'loc': 'http://b', 'tags': ['z']},
+                {'name': 'c', 'loc': 'http://c', 'tags': []}
+            ]
+        })
+
+        loc = os.path.join(self.directory, 'sources.json')
+        pipeline.write_source_files(loc, self.directory, [
+            pipeline.ShowParser('Test', 'Test', 'new.py', 'new.json', []),
+            pipeline.ShowParser('Test (Old)', 'Test', 'old.py', 'old.json', [])
+        ])
+
+        with open(loc) as f:
+            source_files = json.load(f)
+        merged_loc = os.path.join(self.directory, 'merged_new.json')
+        self.assertEqual(source_files, {'Test': merged_loc})
+
+        episodes = common.load_episodes(merged_loc)['episodes']
+        self.assertEqual(
+            map(lambda x: x['name'], episodes),
+            ['a', 'b', 'c']
+        )
+
+    def test_combine_parser_outputs(self):
+        samples = [
+            (tal.get_episode_info, 'tal_talk_sample.html', 'tal.json'),
+            (
+                memory_palace.parse_episode_page,
+                'memory_palace_episode_sample.html',
+                'memory_palace.json'
+            ),
+            (
+                radiolab_old.read_episode_page,
+                'radiolab_old_episode_sample.html',
+                'radiolab_old.json'
+            )
+        ]
+        for (parse_page, sample_name, json_name) in samples:
+            with open(os.path.join(pipeline.PARSE_DIR, sample_name)) as f:
+                episode = parse_page('http://test/' + json_name, f.read())
+            common.write_episodes(
+                os.path.join(self.directory, json_name),
+                {'episodes': [episode]}
+            )
+
+        show_parsers = filter(
+            lambda x: x.json_name not in ['hello_internet.json', '99pi.json'],
+            pipeline.SHOW_PARSERS
+        )
+        source_files_loc = os.path.join(self.directory, 'sources.json')
+        pipeline.write_source_files(
+            source_files_loc,
+            self.directory,
+            show_parsers
+        )
+
+        combined_loc = os.path.join(self.directory, 'combined.json')
+        result = pipeline.run_stage('combine', [
+            sys.executable,
+            pipeline.COMBINE_SCRIPT,
+            source_files_loc,
+            pipeline.TAG_MAPPING_LOC,
+            combined_loc
+        ])
+        self.assertEqual(result.returncode, 0)
+
+        with open(combined_loc) as f:
+            combined = json.load(f)
+        self.assertEqual(
+            sorted(set(map(lambda x: x['show'], combined['episodes']))),
+            ['Radiolab', 'The Memory Palace', 'This American Life']
+        )
+        self.assertTrue(all(map(
+            lambda x: x['name'] and x['duration'] > 0,
+            combined['episodes']
+        )))
+
+
+if __name__ == '__main__':
+    unittest.main()
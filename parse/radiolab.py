@@ -6,10 +6,11 @@ feed so a second module (radiolab_old) is also provided.
 
 This logic can be run from the command line with:
     
-    python radiolab.py [JSON LOCATION]
+    python radiolab.py [JSON LOCATION] [all|new (optional)]
 
 Where the script will write parsed episode metadata to the provided JSON file
-location.
+location. Pass "new" to only add episodes not already in the JSON file (as
+recorded in an index saved next to it). Defaults to "all".
 
 Note that RadioLab is an external service (c) 2015 WNYC. We love our podcasters
 and you should too. This is a tool meant for anthropological research. Please
@@ -22,14 +23,11 @@ use with the utmost love and care. <3
 import sys
 
 import common
-import bs4
-import requests
+import episode_index
 
 RSS_LOC = 'http://feeds.wnyc.org/radiolab'
 
-DEFAULT_HEADERS = {'User-Agent': 'Digital Anthropology Podcast Crawler'}
-
-USAGE_STR = 'python radiolab.py [json location]'
+USAGE_STR = 'python radiolab.py [json location] [all|new (optional)]'
 
 
 def get_rss_raw():
@@ -38,7 +36,42 @@ def get_rss_raw():
     @return: Raw text content of the WNYC RSS feed.
     @rtype: basestring
     """
-    return requests.get(RSS_LOC, headers=DEFAULT_HEADERS).text
+    return common.get_page(RSS_LOC).text
+
+
+def create_episode(title, loc, pub_date_raw, tags, duration_str):
+    """Describe a single podcast episode from the raw strings in its feed item.
+
+    @param title: The raw title of the episode.
+    @type title: basestring
+    @param loc: The guid of the episode.
+    @type loc: basestring
+    @param pub_date_raw: RFC 2822 publication date of the episode.
+    @type pub_date_raw: basestring
+    @param tags: The categories applied to the episode.
+    @type tags: list of str
+    @param duration_str: The itunes:duration of the episode or None if not
+        provided.
+    @type duration_str: basestring
+    @return: Dictionary describing the episode. Contains keys name (str value),
+        date (datetime.date), loc (url - str value), duration (seconds - int),
+        and orig_tags (tags applied to episode - list of str)
+    @rtype: dict
+    """
+    pub_date = common.interpret_2822_date(pub_date_raw)
+
+    if duration_str == None:
+        duration = 1800 if 'shorts' in tags else 3600
+    else:
+        duration = common.interpret_duration(duration_str)
+
+    return {
+        'name': title.strip(),
+        'date': pub_date,
+        'tags': sorted(set(tags)),
+        'loc': loc,
+        'duration': duration
+    }
 
 
 def process_item(item_soup):
@@ -52,12 +85,6 @@ def process_item(item_soup):
         and orig_tags (tags applied to episode - list of str)
     @rtype: dict
     """
-    title = item_soup.find('title').contents[0].strip()
-    loc = item_soup.find('guid').contents[0]
-
-    pub_date_raw = item_soup.find('pubdate').contents[0]
-    pub_date = common.interpret_2822_date(pub_date_raw)
-
     tags = map(
         lambda x: x.contents[0],
         item_soup.findAll('category')
@@ -65,18 +92,54 @@ def process_item(item_soup):
 
     duration_soup = item_soup.find('itunes:duration')
     if duration_soup == None:
-        duration = 1800 if 'shorts' in tags else 3600
+        duration_str = None
     else:
         duration_str = duration_soup.contents[0]
-        duration = common.interpret_duration(duration_str)
 
-    return {
-        'name': title,
-        'date': pub_date,
-        'tags': sorted(set(tags)),
-        'loc': loc,
-        'duration': duration
-    }
+    return create_episode(
+        item_soup.find('title').contents[0],
+        item_soup.find('guid').contents[0],
+        item_soup.find('pubdate').contents[0],
+        tags,
+        duration_str
+    )
+
+
+def process_item_element(item_element):
+    """Parse information about a single podcast episode from a streamed item.
+
+    @param item_element: Element for a single item as read by
+        common.iterate_feed_items.
+    @type item_element: xml.etree.ElementTree.Element
+    @return: Dictionary describing the episode in the same format as
+        process_item.
+    @rtype: dict
+    """
+    tags = map(
+        lambda x: x.text,
+        item_element.findall('category')
+    )
+
+    return create_episode(
+        item_element.findtext('title'),
+        item_element.findtext('guid'),
+        item_element.findtext('pubDate'),
+        tags,
+        item_element.findtext(common.ITUNES_DURATION_TAG)
+    )
+
+
+def iterate_rss_episodes(stream):
+    """Parse episodes from the RSS feed as they are read.
+
+    @param stream: File-like object with the raw WNYC RSS feed.
+    @type stream: file-like object
+    @return: Generator over dictionaries describing RadioLab episodes in the
+        same format as process_item.
+    @rtype: generator over dict
+    """
+    for item_element in common.iterate_feed_items(stream):
+        yield process_item_element(item_element)
 
 
 def serialize_rss_content(content):
@@ -88,34 +151,62 @@ def serialize_rss_content(content):
         dictionaries describing RadioLab episodes.
     @rtype: dict
     """
-    soup = bs4.BeautifulSoup(content)
+    soup = common.create_soup(content)
     channel_info = soup.find('rss').find('channel')
     return {
         'episodes': map(process_item, channel_info.findAll('item'))
     }
 
 
-def parse_and_serialize_rss(location):
+def parse_and_serialize_rss(location, only_new=False):
     """Download and parse WNYC feed data, saving results to a JSON file.
 
+    The feed is parsed incrementally as it is downloaded rather than building a
+    full document tree and each episode is written out as soon as it is parsed.
+
     @param location: File location where the parsed feed data should be saved.
     @type location: basestring
+    @keyword only_new: If True, add episodes not yet in the episode index for
+        location to the episodes already saved there. If False, replace the
+        file with all episodes in the feed. Defaults to False.
+    @type only_new: bool
     """
-    content = get_rss_raw()
-    serialized = serialize_rss_content(content)
-    serialized_str = common.DateJSONEncoder().encode(serialized)
-    with open(location, 'w') as f:
-        f.write(serialized_str)
+    index_location = episode_index.get_index_location(location)
+
+    if only_new:
+        serialized = common.load_episodes(location)
+        index = episode_index.load_index(index_location, serialized)
+    else:
+        serialized = {'episodes': []}
+        index = episode_index.EpisodeIndex(index_location)
+
+    stream = common.open_stream(RSS_LOC)
+
+    with common.EpisodeWriter(location) as writer:
+        writer.write_all(serialized['episodes'])
+
+        for episode in iterate_rss_episodes(stream):
+            if only_new and episode['loc'] in index:
+                continue
+            writer.write(episode)
+            index.add_all([episode['loc']])
+
+    index.save()
 
 
 def main():
     """Driver for the RadioLab episode parser."""
-    if len(sys.argv) != 2:
+    if len(sys.argv) not in [2, 3]:
+        print USAGE_STR
+        sys.exit(1)
+
+    mode = sys.argv[2] if len(sys.argv) == 3 else 'all'
+    if not mode in ['all', 'new']:
         print USAGE_STR
-        return
+        sys.exit(1)
 
     location = sys.argv[1]
-    parse_and_serialize_rss(location)
+    parse_and_serialize_rss(location, mode == 'new')
 
 
 if __name__ == '__main__':
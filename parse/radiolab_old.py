@@ -7,10 +7,16 @@ information.
 
 This logic can be run from the command line with:
     
-    python radiolab_old.py [JSON LOCATION] [START PAGE]
+    python radiolab_old.py [JSON LOCATION] [START PAGE] [all|new (optional)]
+        [resume (optional)]
 
 Where the script will write parsed episode metadata to the provided JSON file
-location and will start its crawl at the provided START PAGE url.
+location and will start its crawl at the provided START PAGE url. Pass "new"
+to only download episodes not already in the JSON file, stopping the crawl at
+the first index page with only known episodes. Defaults to "all". Each
+episode is recorded in a journal next to the JSON file as soon as it is parsed
+and passing "resume" reuses the episodes recorded by a prior crawl that did not
+finish instead of downloading them again.
 
 Note that RadioLab is an external service (c) 2015 WNYC. We love our podcasters
 and you should too. This is a tool meant for anthropological research. Please
@@ -20,14 +26,16 @@ use with the utmost love and care. <3
 @license: MIT License
 """
 
-import bs4
+import collections
 import datetime
+import itertools
 import re
 import sys
 
-import requests
-
+import checkpoint
 import common
+import crawler
+import episode_index
 
 ROOT_PAGE = 'http://www.radiolab.org/series/podcasts/'
 PAGE_URL_TEMPLATE = 'http://www.radiolab.org/series/podcasts/%d/'
@@ -35,10 +43,20 @@ DATE_TAG_REGEX = re.compile(
     '''\<Attribute name\=\"sort\" value\=\"(\d+)\"\/\>'''
 )
 
+PAGE_LINK_STRAINER = common.create_strainer(classes=['pagefooter-link'])
+INDEX_STRAINER = common.create_strainer(classes=['series-item'])
+EPISODE_STRAINER = common.create_strainer(
+    classes=['story-headergroup', 'article-bottom-tags']
+)
+
 SHORTS_LENGTH = 1853
 FULL_LENGTH = 3480
 
-USAGE_STR = 'python radiolab_old.py [json file] [start radiolab page]'
+EPISODE_QUEUE_SIZE = 32
+INDEX_QUEUE_SIZE = 2
+
+USAGE_STR = ('python radiolab_old.py [json file] [start radiolab page] '
+    '[all|new (optional)] [resume (optional)]')
 
 
 def read_root_index_page():
@@ -47,7 +65,22 @@ def read_root_index_page():
     @return: Raw text of the RadioLab episodes listing.
     @rtype: basestring
     """
-    return requests.get(ROOT_PAGE, headers=common.DEFAULT_HEADERS).text
+    return read_root_index_page_async().get()
+
+
+def read_root_index_page_async(page_crawler=None):
+    """Start reading the page listing RadioLab episodes.
+
+    @keyword page_crawler: The crawler through which the page is downloaded. If
+        None, uses the crawler shared by all scrapers. Defaults to None.
+    @type page_crawler: crawler.Crawler
+    @return: Pending result whose value is the raw text of the RadioLab
+        episodes listing.
+    @rtype: crawler.PendingResult
+    """
+    if page_crawler == None:
+        page_crawler = crawler.get_crawler()
+    return page_crawler.submit(ROOT_PAGE).then(lambda x: x.text)
 
 
 def enumerate_page_locations(start_page, content):
@@ -65,7 +98,7 @@ def enumerate_page_locations(start_page, content):
         visit.
     @rtype: list of str
     """
-    soup = bs4.BeautifulSoup(content)
+    soup = common.create_soup(content, PAGE_LINK_STRAINER)
     link_containers = soup.findAll(class_='pagefooter-link')
     links = map(lambda x: x.find('a'), link_containers)
     link_contents = map(lambda x: int(x.contents[0]), links)
@@ -85,7 +118,7 @@ def read_index_page(content):
         episode.
     @rtype: list of str
     """
-    soup = bs4.BeautifulSoup(content)
+    soup = common.create_soup(content, INDEX_STRAINER)
     items = soup.findAll(class_='series-item')
     headers = map(lambda x: x.find(class_='title'), items)
     links = map(lambda x: x.find('a')['href'], headers)
@@ -121,7 +154,7 @@ def read_episode_page(loc, content):
     date_str = DATE_TAG_REGEX.search(content).group(1)
     episode_date = interpret_date(date_str)
 
-    soup = bs4.BeautifulSoup(content)
+    soup = common.create_soup(content, EPISODE_STRAINER)
     header = soup.find(class_='story-headergroup')
     title = header.find(class_='title').contents[0].strip()
 
@@ -144,35 +177,157 @@ def read_episode_page(loc, content):
     }
 
 
+def fetch_ahead(submit, locations, queue_size):
+    """Download pages in order, keeping a bounded number requested ahead.
+
+    A page is only requested once fewer than queue_size pages have been
+    requested but not yet consumed so that a consumer which stops early (like
+    a "new" mode crawl reaching known episodes) only causes a few extra
+    requests.
+
+    @param submit: Function taking a URL and starting its download without
+        waiting for it, returning a pending result (like Crawler.submit).
+    @type submit: function
+    @param locations: The URLs of the pages to download.
+    @type locations: iterable over str
+    @param queue_size: The maximum number of pages requested at a time.
+    @type queue_size: int
+    @return: Generator over the responses in the same order as locations.
+    @rtype: generator over requests.Response
+    """
+    pending = collections.deque()
+    for loc in locations:
+        if len(pending) >= queue_size:
+            yield pending.popleft().get()
+        pending.append(submit(loc))
+
+    while len(pending) > 0:
+        yield pending.popleft().get()
+
+
+def crawl_episodes(index_locations, index=None, page_crawler=None,
+    queue_size=EPISODE_QUEUE_SIZE, journal=None,
+    index_queue_size=INDEX_QUEUE_SIZE):
+    """Download and parse index pages and the episode pages they link to.
+
+    Index pages are downloaded up to index_queue_size at a time and, as each
+    one is parsed, its episode pages are queued for download without waiting
+    for the remaining index pages. At most queue_size episode pages are in the
+    queue at a time and each is parsed as soon as it is the oldest page in the
+    queue and has been downloaded.
+
+    @param index_locations: The URLs of the index pages to crawl.
+    @type index_locations: list of str
+    @keyword index: If provided, skip episodes in this index and stop at the
+        first index page with only known episodes. Defaults to None (crawl all
+        episodes).
+    @type index: episode_index.EpisodeIndex
+    @keyword page_crawler: The crawler through which pages are downloaded. If
+        None, uses the crawler shared by all scrapers. Defaults to None.
+    @type page_crawler: crawler.Crawler
+    @keyword queue_size: The maximum number of episode pages queued for
+        download at a time. Defaults to EPISODE_QUEUE_SIZE.
+    @type queue_size: int
+    @keyword journal: Journal in which to record each episode as it is parsed.
+        Episodes already in the journal are not downloaded again. If None, no
+        journal is kept. Defaults to None.
+    @type journal: checkpoint.CrawlJournal
+    @keyword index_queue_size: The maximum number of index pages requested
+        ahead of the one being parsed. Defaults to INDEX_QUEUE_SIZE.
+    @type index_queue_size: int
+    @return: Generator over dictionaries describing episodes in the order they
+        appear in the index pages. Same format as read_episode_page.
+    @rtype: generator over dict
+    """
+    if page_crawler == None:
+        page_crawler = crawler.get_crawler()
+
+    def finish(pending_episode):
+        (loc, result) = pending_episode
+        if result == None:
+            return journal.get(loc)
+
+        record = read_episode_page(loc, result.get().text)
+        if journal != None:
+            journal.record(loc, record)
+        return record
+
+    pages = itertools.imap(
+        lambda x: read_index_page(x.text),
+        fetch_ahead(page_crawler.submit, index_locations, index_queue_size)
+    )
+    if index != None:
+        pages = episode_index.iterate_until_known(pages, index)
+
+    pending = collections.deque()
+    for locations in pages:
+        for loc in locations:
+            if len(pending) >= queue_size:
+                yield finish(pending.popleft())
+
+            if journal != None and loc in journal:
+                pending.append((loc, None))
+            else:
+                pending.append((loc, page_crawler.submit(loc)))
+
+    while len(pending) > 0:
+        yield finish(pending.popleft())
+
+
 def main():
     """Driver for the RadioLab parser."""
-    if len(sys.argv) != 3:
+    if len(sys.argv) not in [3, 4, 5]:
+        print USAGE_STR
+        sys.exit(1)
+
+    mode = sys.argv[3] if len(sys.argv) > 3 else 'all'
+    if not mode in ['all', 'new']:
+        print USAGE_STR
+        sys.exit(1)
+
+    if len(sys.argv) == 5 and sys.argv[4] != 'resume':
         print USAGE_STR
-        return
+        sys.exit(1)
+
+    common.configure_cache_from_environ()
 
     out_file_loc = sys.argv[1]
+    index_file_loc = episode_index.get_index_location(out_file_loc)
+
+    if mode == 'new':
+        serialized = common.load_episodes(out_file_loc)
+        index = episode_index.load_index(index_file_loc, serialized)
+    else:
+        serialized = {'episodes': []}
+        index = episode_index.EpisodeIndex(index_file_loc)
 
     start_page = int(sys.argv[2])
     content = read_root_index_page()
     index_locations = enumerate_page_locations(start_page, content)
 
-    episode_locations = []
-    for index_location in index_locations:
-        resp = requests.get(index_location, headers=common.DEFAULT_HEADERS)
-        content = resp.text
-        episode_locations.extend(read_index_page(content))
-
-    episode_info = []
-    for episode_location in episode_locations:
-        resp = requests.get(episode_location, headers=common.DEFAULT_HEADERS)
-        content = resp.text
-        episode_info.append(read_episode_page(episode_location, content))
-
-    with open(out_file_loc, 'w') as f:
-        serialized_str = common.DateJSONEncoder().encode(
-            {'episodes': episode_info}
+    crawl_index = index if mode == 'new' else None
+    journal = checkpoint.CrawlJournal(
+        checkpoint.get_journal_location(out_file_loc),
+        len(sys.argv) == 5
+    )
+
+    new_locations = []
+    with common.EpisodeWriter(out_file_loc) as writer:
+        writer.write_all(serialized['episodes'])
+
+        episodes = crawl_episodes(
+            index_locations,
+            crawl_index,
+            journal=journal
         )
-        f.write(serialized_str)
+        for episode in episodes:
+            writer.write(episode)
+            new_locations.append(episode['loc'])
+
+    index.add_all(new_locations)
+    index.save()
+
+    journal.remove()
 
 
 if __name__ == '__main__':
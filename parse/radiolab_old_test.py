@@ -4,14 +4,33 @@
 @license: MIT License
 """
 
+import collections
 import datetime
+import os
+import shutil
+import tempfile
 import unittest
 
+import checkpoint
+import common
+import crawler
+import episode_index
 import radiolab_old
 
 
+FakeResponse = collections.namedtuple('FakeResponse', ['status_code', 'text'])
+
+
 class RadiolabOldTests(unittest.TestCase):
 
+    def setUp(self):
+        self.original_get_page = common.get_page
+        self.page_crawler = crawler.Crawler(delay=0)
+
+    def tearDown(self):
+        self.page_crawler.close()
+        common.get_page = self.original_get_page
+
     def test_enumerate_page_locations(self):
         with open('radiolab_old_index_sample.html', 'r') as f:
             sample_src = f.read()
@@ -66,6 +85,134 @@ class RadiolabOldTests(unittest.TestCase):
             ]
         )
 
+    def test_crawl_episodes(self):
+        with open('radiolab_old_index_sample.html', 'r') as f:
+            index_src = f.read()
+
+        with open('radiolab_old_episode_sample.html', 'r') as f:
+            episode_src = f.read()
+
+        pages = {
+            '/index/1': index_src,
+            '/index/2': index_src.replace('los-frikis', 'other'),
+            'http://www.radiolab.org/story/los-frikis/': episode_src,
+            'http://www.radiolab.org/story/other/': episode_src,
+            'http://www.radiolab.org/story/fu-go/': episode_src
+        }
+        common.get_page = lambda loc: FakeResponse(200, pages[loc])
+
+        episodes = list(radiolab_old.crawl_episodes(
+            ['/index/1', '/index/2'],
+            page_crawler=self.page_crawler,
+            queue_size=2
+        ))
+
+        self.assertEqual(
+            map(lambda x: x['loc'], episodes),
+            [
+                'http://www.radiolab.org/story/los-frikis/',
+                'http://www.radiolab.org/story/fu-go/',
+                'http://www.radiolab.org/story/other/',
+                'http://www.radiolab.org/story/fu-go/'
+            ]
+        )
+        self.assertEqual(episodes[0]['name'], 'Los Frikis')
+
+    def test_crawl_episodes_new(self):
+        with open('radiolab_old_index_sample.html', 'r') as f:
+            index_src = f.read()
+
+        with open('radiolab_old_episode_sample.html', 'r') as f:
+            episode_src = f.read()
+
+        pages = {
+            '/index/1': index_src,
+            'http://www.radiolab.org/story/los-frikis/': episode_src
+        }
+        common.get_page = lambda loc: FakeResponse(200, pages[loc])
+
+        index = episode_index.EpisodeIndex(
+            None,
+            ['http://www.radiolab.org/story/fu-go/']
+        )
+        episodes = list(radiolab_old.crawl_episodes(
+            ['/index/1'],
+            index,
+            self.page_crawler
+        ))
+
+        self.assertEqual(len(episodes), 1)
+        self.assertEqual(
+            episodes[0]['loc'],
+            'http://www.radiolab.org/story/los-frikis/'
+        )
+
+    def test_crawl_episodes_new_stops_index_requests(self):
+        with open('radiolab_old_index_sample.html', 'r') as f:
+            index_src = f.read()
+
+        requested = []
+
+        def get_page(loc):
+            requested.append(loc)
+            return FakeResponse(200, index_src)
+
+        common.get_page = get_page
+
+        index = episode_index.EpisodeIndex(None, [
+            'http://www.radiolab.org/story/los-frikis/',
+            'http://www.radiolab.org/story/fu-go/'
+        ])
+        index_locations = map(lambda x: '/index/%d' % x, range(8))
+        episodes = list(radiolab_old.crawl_episodes(
+            index_locations,
+            index,
+            self.page_crawler,
+            index_queue_size=2
+        ))
+
+        self.assertEqual(episodes, [])
+        self.assertTrue('/index/0' in requested)
+        self.assertTrue(set(requested) <= set(['/index/0', '/index/1']))
+
+    def test_crawl_episodes_journal(self):
+        with open('radiolab_old_index_sample.html', 'r') as f:
+            index_src = f.read()
+
+        with open('radiolab_old_episode_sample.html', 'r') as f:
+            episode_src = f.read()
+
+        pages = {
+            '/index/1': index_src,
+            'http://www.radiolab.org/story/fu-go/': episode_src
+        }
+        common.get_page = lambda loc: FakeResponse(200, pages[loc])
+
+        directory = tempfile.mkdtemp()
+        try:
+            journal = checkpoint.CrawlJournal(
+                os.path.join(directory, 'test.journal')
+            )
+            journal.record(
+                'http://www.radiolab.org/story/los-frikis/',
+                {'loc': 'http://www.radiolab.org/story/los-frikis/'}
+            )
+
+            episodes = list(radiolab_old.crawl_episodes(
+                ['/index/1'],
+                page_crawler=self.page_crawler,
+                journal=journal
+            ))
+            journal.close()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(episodes[0], journal.get(
+            'http://www.radiolab.org/story/los-frikis/'
+        ))
+        self.assertEqual(episodes[1]['name'], 'Los Frikis')
+        self.assertTrue('http://www.radiolab.org/story/fu-go/' in journal)
+
 
 if __name__ == '__main__':
     unittest.main()
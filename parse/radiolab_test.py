@@ -7,8 +7,13 @@
 import radiolab
 
 import datetime
+import os
+import shutil
+import tempfile
 import unittest
 
+import common
+
 
 class RadiolabTests(unittest.TestCase):
 
@@ -53,6 +58,51 @@ class RadiolabTests(unittest.TestCase):
             ]
         )
 
+    def test_iterate_rss_episodes(self):
+        with open('radiolab_sample.xml') as f:
+            test_source = f.read()
+
+        with open('radiolab_sample.xml') as f:
+            streamed_items = list(radiolab.iterate_rss_episodes(f))
+
+        parsed_items = radiolab.serialize_rss_content(test_source)['episodes']
+        self.assertEqual(streamed_items, parsed_items)
+
+    def test_parse_and_serialize_rss(self):
+        directory = tempfile.mkdtemp()
+        location = os.path.join(directory, 'radiolab.json')
+        feeds = [
+            [{'loc': '/a'}, {'loc': '/b'}, {'loc': '/b'}, {'loc': ''}],
+            [{'loc': '/c'}, {'loc': '/a'}, {'loc': '/d'}]
+        ]
+
+        original_open_stream = common.open_stream
+        original_iterate = radiolab.iterate_rss_episodes
+        common.open_stream = lambda x: feeds.pop(0)
+        radiolab.iterate_rss_episodes = lambda x: iter(x)
+        try:
+            radiolab.parse_and_serialize_rss(location)
+            self.assertEqual(common.load_episodes(location), {'episodes': [
+                {'loc': '/a'},
+                {'loc': '/b'},
+                {'loc': '/b'},
+                {'loc': ''}
+            ]})
+
+            radiolab.parse_and_serialize_rss(location, only_new=True)
+            self.assertEqual(common.load_episodes(location), {'episodes': [
+                {'loc': '/a'},
+                {'loc': '/b'},
+                {'loc': '/b'},
+                {'loc': ''},
+                {'loc': '/c'},
+                {'loc': '/d'}
+            ]})
+        finally:
+            common.open_stream = original_open_stream
+            radiolab.iterate_rss_episodes = original_iterate
+            shutil.rmtree(directory)
+
 
 if __name__ == '__main__':
     unittest.main()
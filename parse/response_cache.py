@@ -0,0 +1,220 @@
+"""On-disk cache for crawler HTTP responses.
+
+Logic and structures to keep downloaded pages on disk so that repeated crawls
+(like when tuning tag mappings) do not need to download unchanged pages again.
+Entries are stored in files named by the hash of their URL along with the
+ETag and Last-Modified headers the server sent so that stale entries can be
+revalidated with conditional GETs. The cache can also be operated fully
+offline, answering only from pages already on disk.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+ENTRY_EXTENSION = '.json'
+
+CachedResponse = collections.namedtuple(
+    'CachedResponse',
+    ['status_code', 'text', 'headers']
+)
+
+
+class CacheMissError(Exception):
+    """Exception raised when an offline cache does not have a requested page."""
+
+    def __init__(self, loc):
+        """Create a new cache miss error.
+
+        @param loc: The URL of the page not found in the cache.
+        @type loc: basestring
+        """
+        super(CacheMissError, self).__init__('Not in offline cache: %s' % loc)
+        self.loc = loc
+
+
+class ResponseCache(object):
+    """Size-bounded LRU cache of HTTP responses kept in a directory on disk."""
+
+    def __init__(self, directory, ttl, max_size, offline=False):
+        """Create a new response cache.
+
+        @param directory: The directory in which cache entries are kept. Will be
+            created if it does not exist.
+        @type directory: basestring
+        @param ttl: Number of seconds an entry is used without revalidating it
+            with the server.
+        @type ttl: float
+        @param max_size: The maximum number of bytes the cache may occupy on
+            disk before least recently used entries are evicted.
+        @type max_size: int
+        @keyword offline: If True, never contact the server and raise a
+            CacheMissError for pages not in the cache. Defaults to False.
+        @type offline: bool
+        """
+        self._directory = directory
+        self._ttl = ttl
+        self._max_size = max_size
+        self._offline = offline
+        self._lock = threading.Lock()
+        self._size = None
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get_entry_path(self, loc):
+        """Get the file in which the entry for a URL is kept.
+
+        @param loc: The URL of the page.
+        @type loc: basestring
+        @return: Path to the file for the page's cache entry.
+        @rtype: str
+        """
+        key = hashlib.sha1(loc.encode('utf-8')).hexdigest()
+        return os.path.join(self._directory, key + ENTRY_EXTENSION)
+
+    def read_entry(self, loc):
+        """Read the cache entry for a URL, marking it as recently used.
+
+        @param loc: The URL of the page.
+        @type loc: basestring
+        @return: Dictionary with loc, text, etag, last_modified, and fetched
+            (timestamp) keys or None if the page is not cached.
+        @rtype: dict
+        """
+        path = self.get_entry_path(loc)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path, None)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if entry['loc'] != loc:
+            return None
+
+        return entry
+
+    def write_entry(self, entry):
+        """Save a cache entry, evicting old entries if the cache is too large.
+
+        @param entry: Dictionary with loc, text, etag, last_modified, and
+            fetched (timestamp) keys.
+        @type entry: dict
+        """
+        path = self.get_entry_path(entry['loc'])
+        (handle, temp_path) = tempfile.mkstemp(dir=self._directory)
+        with os.fdopen(handle, 'w') as f:
+            json.dump(entry, f)
+
+        with self._lock:
+            total_size = self._get_size()
+            if os.path.isfile(path):
+                total_size -= os.path.getsize(path)
+            os.rename(temp_path, path)
+            self._size = total_size + os.path.getsize(path)
+            self._evict()
+
+    def _get_size(self):
+        """Get the number of bytes used by cache entries.
+
+        @return: Total size of all entry files in bytes.
+        @rtype: int
+        """
+        if self._size == None:
+            self._size = sum(map(
+                lambda x: os.path.getsize(x),
+                self._list_entry_paths()
+            ))
+        return self._size
+
+    def _list_entry_paths(self):
+        """List the files holding cache entries.
+
+        @return: Paths of all entry files in the cache directory.
+        @rtype: list of str
+        """
+        names = filter(
+            lambda x: x.endswith(ENTRY_EXTENSION),
+            os.listdir(self._directory)
+        )
+        return map(lambda x: os.path.join(self._directory, x), names)
+
+    def _evict(self):
+        """Remove least recently used entries until the size bound is met."""
+        if self._size <= self._max_size:
+            return
+
+        paths = sorted(self._list_entry_paths(), key=os.path.getmtime)
+        for path in paths:
+            if self._size <= self._max_size:
+                return
+            self._size -= os.path.getsize(path)
+            os.remove(path)
+
+    def get(self, loc, fetch):
+        """Get a page from the cache, going to the server only if needed.
+
+        @param loc: The URL of the page.
+        @type loc: basestring
+        @param fetch: Function taking a dictionary of extra request headers and
+            returning the server's response for loc.
+        @type fetch: function
+        @return: Cached or fresh response with at least status_code and text
+            attributes.
+        @rtype: CachedResponse or requests.Response
+        """
+        entry = self.read_entry(loc)
+
+        if entry != None:
+            fresh = time.time() - entry['fetched'] < self._ttl
+            if fresh or self._offline:
+                return self._to_response(entry)
+        elif self._offline:
+            raise CacheMissError(loc)
+
+        conditional_headers = {}
+        if entry != None and entry['etag']:
+            conditional_headers['If-None-Match'] = entry['etag']
+        if entry != None and entry['last_modified']:
+            conditional_headers['If-Modified-Since'] = entry['last_modified']
+
+        response = fetch(conditional_headers)
+
+        if response.status_code == 304 and entry != None:
+            entry['fetched'] = time.time()
+            self.write_entry(entry)
+            return self._to_response(entry)
+
+        if response.status_code == 200:
+            self.write_entry({
+                'loc': loc,
+                'text': response.text,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched': time.time()
+            })
+
+        return response
+
+    def _to_response(self, entry):
+        """Create a response object from a cache entry.
+
+        @param entry: The cache entry to convert.
+        @type entry: dict
+        @return: Response with a 200 status code and the cached page content.
+        @rtype: CachedResponse
+        """
+        headers = {}
+        if entry['etag']:
+            headers['ETag'] = entry['etag']
+        if entry['last_modified']:
+            headers['Last-Modified'] = entry['last_modified']
+        return CachedResponse(200, entry['text'], headers)
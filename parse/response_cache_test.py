@@ -0,0 +1,126 @@
+"""Unit tests for the on-disk HTTP response cache.
+
+@author: Sam Pottinger
+@license: MIT License
+"""
+
+import collections
+import os
+import shutil
+import tempfile
+import unittest
+
+import response_cache
+
+
+FakeResponse = collections.namedtuple(
+    'FakeResponse',
+    ['status_code', 'text', 'headers']
+)
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.requests_made = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def create_fetch(self, response):
+        def fetch(headers):
+            self.requests_made.append(headers)
+            return response
+        return fetch
+
+    def test_get_miss_saves_entry(self):
+        cache = response_cache.ResponseCache(self.directory, 60, 10000)
+        fetch = self.create_fetch(FakeResponse(200, 't1', {'ETag': 'e1'}))
+
+        self.assertEqual(cache.get('/test', fetch).text, 't1')
+        self.assertEqual(self.requests_made, [{}])
+
+        entry = cache.read_entry('/test')
+        self.assertEqual(entry['text'], 't1')
+        self.assertEqual(entry['etag'], 'e1')
+
+    def test_get_fresh_skips_server(self):
+        cache = response_cache.ResponseCache(self.directory, 60, 10000)
+        cache.get('/test', self.create_fetch(FakeResponse(200, 't1', {})))
+
+        response = cache.get('/test', self.create_fetch(None))
+        self.assertEqual(response.text, 't1')
+        self.assertEqual(len(self.requests_made), 1)
+
+    def test_get_stale_revalidates(self):
+        cache = response_cache.ResponseCache(self.directory, 0, 10000)
+        cache.get('/test', self.create_fetch(FakeResponse(
+            200,
+            't1',
+            {'ETag': 'e1', 'Last-Modified': 'Mon, 30 Mar 2015 00:00:00 GMT'}
+        )))
+
+        response = cache.get(
+            '/test',
+            self.create_fetch(FakeResponse(304, '', {}))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.text, 't1')
+        self.assertEqual(self.requests_made[1], {
+            'If-None-Match': 'e1',
+            'If-Modified-Since': 'Mon, 30 Mar 2015 00:00:00 GMT'
+        })
+
+    def test_get_stale_changed(self):
+        cache = response_cache.ResponseCache(self.directory, 0, 10000)
+        cache.get('/test', self.create_fetch(FakeResponse(200, 't1', {})))
+
+        response = cache.get(
+            '/test',
+            self.create_fetch(FakeResponse(200, 't2', {}))
+        )
+        self.assertEqual(response.text, 't2')
+        self.assertEqual(cache.read_entry('/test')['text'], 't2')
+
+    def test_get_error_not_saved(self):
+        cache = response_cache.ResponseCache(self.directory, 60, 10000)
+        cache.get('/test', self.create_fetch(FakeResponse(404, 't1', {})))
+
+        self.assertEqual(cache.read_entry('/test'), None)
+
+    def test_get_offline(self):
+        cache = response_cache.ResponseCache(self.directory, 0, 10000)
+        cache.get('/test', self.create_fetch(FakeResponse(200, 't1', {})))
+
+        offline_cache = response_cache.ResponseCache(
+            self.directory,
+            0,
+            10000,
+            offline=True
+        )
+        self.assertEqual(offline_cache.get('/test', None).text, 't1')
+        self.assertRaises(
+            response_cache.CacheMissError,
+            offline_cache.get,
+            '/other',
+            None
+        )
+
+    def test_evict_least_recently_used(self):
+        cache = response_cache.ResponseCache(self.directory, 60, 300)
+        for (loc, access_time) in [('/1', 1), ('/2', 2), ('/3', 3)]:
+            cache.get(loc, self.create_fetch(FakeResponse(200, 'x', {})))
+            os.utime(cache.get_entry_path(loc), (access_time, access_time))
+
+        os.utime(cache.get_entry_path('/1'), None)
+        cache.get('/4', self.create_fetch(FakeResponse(200, 'x', {})))
+
+        self.assertEqual(cache.read_entry('/2'), None)
+        self.assertNotEqual(cache.read_entry('/1'), None)
+        self.assertNotEqual(cache.read_entry('/3'), None)
+        self.assertNotEqual(cache.read_entry('/4'), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,13 +7,18 @@ from its first episode in 1995, serializing to a JSON file.
 
 This program can be run stand-alone with the following:
 
-    python tal.py [json location] [all|new]
+    python tal.py [json location] [all|new] [resume (optional)]
 
 Parameters include:
     - json location: The file location where the serialization should be saved.
     - all|new: Pass "all" to download the entire history. Pass "new" to update
         the JSON file at json location. This will not download episodes already
-        parsed to be a good net citizen.
+        parsed (as recorded in an index saved next to the JSON file) and stops
+        visiting index pages once it finds a year with no new episodes to be a
+        good net citizen.
+    - resume: Each episode is recorded in a journal next to the JSON file as
+        soon as it is parsed. Pass "resume" to reuse the episodes recorded by
+        a prior crawl that did not finish instead of downloading them again.
 
 Note that TAL is an external service (c) 1995 - 2015 Chicago Public Media & Ira
 Glass. We love our podcasters and you should to. This is a tool meant for
@@ -24,23 +29,32 @@ anthropological research. Please use with the utmost love and care. <3
 """
 
 import datetime
-import json
+import itertools
 import sys
 
-import bs4
-import requests
-
+import checkpoint
 import common
+import crawler
+import episode_index
 
 START_YEAR = 1995
 
 INDEX_PAGE_TEMPLATE = 'http://www.thisamericanlife.org/radio-archives/%d'
 EPISODE_PAGE_TEMPLATE = 'http://www.thisamericanlife.org%s'
 
-USAGE_STR = 'USAGE: python tal.py [json location] [all|new]'
+INDEX_STRAINER = common.create_strainer(classes=['episode-archive'])
+EPISODE_STRAINER = common.create_strainer(
+    classes=['node-title', 'top-inner', 'tags']
+)
+
+USAGE_STR = 'USAGE: python tal.py [json location] [all|new] [resume (optional)]'
 
 DEBUG = True
 
+CHECKPOINT_BATCH_SIZE = 32
+
+EPISODE_DURATION = 60 * 60
+
 
 def enumerate_index_page_locs(start_year=START_YEAR, this_year=None):
     """Enumerate all episode index pages.
@@ -69,7 +83,8 @@ def get_index_pages_raw(start_year=START_YEAR, this_year=None):
     """Get the raw contents of episode index pages.
 
     This American Life paginates their listing of epsiodes and this will
-    download the raw content for each of those pages.
+    download the raw content for each of those pages through the crawler
+    shared by all scrapers.
 
     @keyword start_year: The year in which the crawler should start its search.
         Defaults to START_YEAR.
@@ -81,16 +96,44 @@ def get_index_pages_raw(start_year=START_YEAR, this_year=None):
         parsed.
     @rtype: list of str
     """
+    return get_index_pages_raw_async(start_year, this_year).get()
+
+
+def get_index_pages_raw_async(start_year=START_YEAR, this_year=None,
+    page_crawler=None):
+    """Start downloading the raw contents of episode index pages.
+
+    @keyword start_year: The year in which the crawler should start its search.
+        Defaults to START_YEAR.
+    @type start_year: int
+    @keyword this_year: The year in which the crawler should end its search. If
+        None, uses the current year. Defaults to None.
+    @type this_year: int
+    @keyword page_crawler: The crawler through which pages are downloaded. If
+        None, uses the crawler shared by all scrapers. Defaults to None.
+    @type page_crawler: crawler.Crawler
+    @return: Pending result whose value is the same as get_index_pages_raw.
+    @rtype: crawler.PendingResult
+    """
+    if page_crawler == None:
+        page_crawler = crawler.get_crawler()
+
     locs = enumerate_index_page_locs(start_year, this_year)
+    return page_crawler.submit_many(locs).then(get_successful_contents)
 
-    returned_requests = map(
-        lambda x: requests.get(x, headers=common.DEFAULT_HEADERS),
-        locs
-    )
 
+def get_successful_contents(responses):
+    """Get the text of responses for pages that were found.
+
+    @param responses: The responses from the server.
+    @type responses: list of requests.Response
+    @return: Text of the responses with a 200 status code in their original
+        order.
+    @rtype: list of str
+    """
     successful_requests = filter(
         lambda x: x.status_code == 200,
-        returned_requests
+        responses
     )
 
     return map(lambda x: x.text, successful_requests)
@@ -104,7 +147,7 @@ def get_episode_locs_from_index(content):
     @return: List of URLs for pages describing individual episodes.
     @rytpe: list of str
     """
-    soup = bs4.BeautifulSoup(content)
+    soup = common.create_soup(content, INDEX_STRAINER)
     episode_list = soup.find_all(class_='episode-archive')
     headers = map(lambda x: x.find('h3'), episode_list)
     links = map(lambda x: x.find('a'), headers)
@@ -139,11 +182,12 @@ def get_episode_info(loc, content):
     @param content: The content of the page at the provided location.
     @type content: basestring
     @return: Dictionary describing the episode. Contains keys name (str value),
-        date (datetime.date), loc (url - str value), duration (seconds - int),
-        and orig_tags (tags applied to episode - list of str)
+        date (datetime.date), loc (url - str value), duration (seconds - int,
+        always EPISODE_DURATION as episode pages do not list a running time),
+        and tags (tags applied to episode - list of str)
     @rtype: dict
     """
-    soup = bs4.BeautifulSoup(content)
+    soup = common.create_soup(content, EPISODE_STRAINER)
 
     episode_title = soup.find(class_='node-title').contents[0]
 
@@ -159,13 +203,56 @@ def get_episode_info(loc, content):
         'name': episode_title,
         'date': episode_date,
         'tags': sorted(set(tag_names)),
-        'loc': loc
+        'loc': loc,
+        'duration': EPISODE_DURATION
     }
 
 
-def process_all_episodes():
+def crawl_episode_pages(episode_locations, journal=None):
+    """Download and parse episode pages, journaling each as it is parsed.
+
+    Pages are downloaded concurrently in batches of CHECKPOINT_BATCH_SIZE so
+    that parsed episodes reach the journal as the crawl progresses.
+
+    @param episode_locations: The URLs of the episode pages to crawl.
+    @type episode_locations: list of str
+    @keyword journal: Journal in which to record parsed episodes. Pages already
+        in the journal are not downloaded again. If None, no journal is kept.
+        Defaults to None.
+    @type journal: checkpoint.CrawlJournal
+    @return: Dictionaries describing the episodes in the same order as
+        episode_locations. Same format as get_episode_info.
+    @rtype: list of dict
+    """
+    if journal == None:
+        remaining = episode_locations
+    else:
+        remaining = filter(lambda x: not x in journal, episode_locations)
+
+    records = {}
+    for start in range(0, len(remaining), CHECKPOINT_BATCH_SIZE):
+        batch = remaining[start:start + CHECKPOINT_BATCH_SIZE]
+        responses = crawler.fetch_many(batch)
+
+        for (loc, response) in zip(batch, responses):
+            record = get_episode_info(loc, response.text)
+            records[loc] = record
+            if journal != None:
+                journal.record(loc, record)
+
+    return map(
+        lambda x: records[x] if x in records else journal.get(x),
+        episode_locations
+    )
+
+
+def process_all_episodes(journal=None):
     """Gather information about all podcast epsiodes.
 
+    @keyword journal: Journal in which to record parsed episodes and from which
+        episodes parsed by an interrupted crawl are reused. If None, no journal
+        is kept. Defaults to None.
+    @type journal: checkpoint.CrawlJournal
     @return: List of dictionaries where each dictionary describes a single
         podcast episode.
     @rtype: list of dict
@@ -178,106 +265,128 @@ def process_all_episodes():
         lambda x: get_episode_locs_from_index(x),
         index_pages
     )
-    episode_locations = set(
+    episode_locations = list(set(
         [loc for locs in episode_location_sets for loc in locs]
-    )
+    ))
 
     if DEBUG:
-        print 'downloading episodes...'
+        print 'downloading and parsing episodes...'
 
-    episodes_raw = map(
-        lambda x: (x, requests.get(x, headers=common.DEFAULT_HEADERS).text),
-        episode_locations
-    )
+    return crawl_episode_pages(episode_locations, journal)
 
-    if DEBUG:
-        print 'parsing episodes...'
-
-    episode_info = map(
-        lambda (loc, text): get_episode_info(loc, text),
-        episodes_raw
-    )
 
-    return episode_info
-
-
-def serialize_all_episodes():
+def serialize_all_episodes(journal=None):
     """Gather information about all podcast epsiodes in a serializable form.
 
+    @keyword journal: Journal in which to record parsed episodes and from which
+        episodes parsed by an interrupted crawl are reused. If None, no journal
+        is kept. Defaults to None.
+    @type journal: checkpoint.CrawlJournal
     @return: Dictionary with a single episodes key whose value is a list of
         dictionaries where each of those dictionaries describes a single podcast
         episode.
     @rtype: list of dict
     """
-    all_episode_info = process_all_episodes()
+    all_episode_info = process_all_episodes(journal)
     return {'episodes': all_episode_info}
 
 
-def persist_all_episodes(file_location):
+def persist_all_episodes(file_location, resume=False):
     """Gether and save information about all podcast episodes.
 
     @param file_location: Location to which episode information should be
         persisted in JSON format.
     @type file_location: basestring
+    @keyword resume: If True, reuse episodes recorded in the journal of a prior
+        crawl that did not finish. Defaults to False.
+    @type resume: bool
     """
-    all_episodes = serialize_all_episodes()
-    with open(file_location, 'w') as f:
-        f.write(
-            common.DateJSONEncoder().encode(serialize_all_episodes())
-        )
+    journal = checkpoint.CrawlJournal(
+        checkpoint.get_journal_location(file_location),
+        resume
+    )
 
+    all_episodes = serialize_all_episodes(journal)
+    common.write_episodes(file_location, all_episodes)
 
-def get_existing_locations_serailized(existing_info):
-    """Get the location of each podcast episode described in a collection.
+    episode_index.build_index(
+        episode_index.get_index_location(file_location),
+        all_episodes['episodes']
+    ).save()
 
-    @param existing_info: The information from which podcast episode location
-        should be returned. This should be a dictionary matching the return
-        format from serialize_all_episodes.
-    @type existing_info: dict
-    @return: URLs of podcast episodes described in existing_info.
-    @rtype: list of str
+    journal.remove()
+
+
+def iterate_index_pages_newest_first(start_year=START_YEAR, this_year=None):
+    """Download episode index pages one at a time starting with the newest.
+
+    Pages are downloaded lazily as the generator is consumed so that callers
+    can stop once they reach episodes already parsed.
+
+    @keyword start_year: The year in which the crawler should end its search.
+        Defaults to START_YEAR.
+    @type start_year: int
+    @keyword this_year: The year in which the crawler should start its search.
+        If None, uses the current year. Defaults to None.
+    @type this_year: int
+    @return: Generator over the contents of each index page found.
+    @rtype: generator over str
     """
-    return map(lambda x: x['loc'],  existing_info['episodes'])
+    page_crawler = crawler.get_crawler()
+    locs = reversed(enumerate_index_page_locs(start_year, this_year))
+    for loc in locs:
+        response = page_crawler.submit(loc).get()
+        if response.status_code == 200:
+            yield response.text
 
 
-def update_episode_serialization(existing_info):
+def update_episode_serialization(existing_info, index=None, journal=None):
     """Download information about TAL episodes not described in existing_info.
 
+    Index pages are visited from the newest year backwards, stopping at the
+    first year whose episodes have all already been parsed.
+
     @param existing_info: Information about podcasts whose metadata already
         exists in the podcast database. This should be a dictionary matching the
         return format from serialize_all_episodes.
     @type existing_info: dict
+    @keyword index: Index of episodes already parsed which will be updated with
+        the new episodes. If None, an index is built from existing_info.
+        Defaults to None.
+    @type index: episode_index.EpisodeIndex
+    @keyword journal: Journal in which to record parsed episodes and from which
+        episodes parsed by an interrupted crawl are reused. If None, no journal
+        is kept. Defaults to None.
+    @type journal: checkpoint.CrawlJournal
     @return: Updated existing_info with new episodes added. Dictionary with a
         single episodes key whose value is a list of dictionaries where each of
         those dictionaries describes a single podcast episode.
     @rtype: dict
     """
-    index_pages = get_index_pages_raw()
-    episode_location_sets = map(
-        lambda x: get_episode_locs_from_index(x),
-        index_pages
+    if index == None:
+        index = episode_index.build_index(None, existing_info['episodes'])
+
+    episode_location_sets = episode_index.iterate_until_known(
+        itertools.imap(
+            get_episode_locs_from_index,
+            iterate_index_pages_newest_first()
+        ),
+        index
     )
 
-    episode_locations = [loc for locs in episode_location_sets for loc in locs]
-    old_locations = get_existing_locations_serailized(existing_info)
-    new_locations = set(episode_locations).difference(old_locations)
-
-    new_episodes_raw = map(
-        lambda x: (x, requests.get(x, headers=common.DEFAULT_HEADERS).text),
-        new_locations
-    )
+    new_locations = list(set(
+        [loc for locs in episode_location_sets for loc in locs]
+    ))
 
-    new_episode_info = map(
-        lambda (loc, text): get_episode_info(loc, text),
-        new_episodes_raw
-    )
+    new_episode_info = crawl_episode_pages(new_locations, journal)
 
     existing_info['episodes'].extend(new_episode_info)
+    index.add_all(new_locations)
 
     return existing_info
 
 
-def update_and_persist_episodes(file_location):
+def update_and_persist_episodes(file_location, resume=False):
     """Load information about existing episodes and download new information.
 
     Load information about TAL episodes that hvae already been parsed, find
@@ -287,31 +396,52 @@ def update_and_persist_episodes(file_location):
     @param file_location: Location of the JSON file with information about all
         TAL epsiodes previously parsed.
     @type file_location: basestring
+    @keyword resume: If True, reuse episodes recorded in the journal of a prior
+        crawl that did not finish. Defaults to False.
+    @type resume: bool
     """
-    with open(file_location, 'r') as f:
-        existing_info = json.load(f)
+    existing_info = common.load_episodes(file_location)
+    for episode in existing_info['episodes']:
+        episode.setdefault('duration', EPISODE_DURATION)
+
+    index = episode_index.load_index(
+        episode_index.get_index_location(file_location),
+        existing_info
+    )
+    journal = checkpoint.CrawlJournal(
+        checkpoint.get_journal_location(file_location),
+        resume
+    )
 
-    updated_info = update_episode_serialization(existing_info)
-    with open(file_location, 'w') as f:
-        f.write(
-            common.DateJSONEncoder().encode(updated_info)
-        )
+    updated_info = update_episode_serialization(existing_info, index, journal)
+    common.write_episodes(file_location, updated_info)
+    index.save()
+
+    journal.remove()
 
 
 def main():
     """Driver for the TAL parser."""
-    if len(sys.argv) != 3:
+    if len(sys.argv) not in [3, 4]:
+        print USAGE_STR
+        sys.exit(1)
+
+    if len(sys.argv) == 4 and sys.argv[3] != 'resume':
         print USAGE_STR
-        return
+        sys.exit(1)
+
+    common.configure_cache_from_environ()
 
     location = sys.argv[1]
+    resume = len(sys.argv) == 4
 
     if sys.argv[2] == 'all':
-        persist_all_episodes(location)
+        persist_all_episodes(location, resume)
     elif sys.argv[2] == 'new':
-        update_and_persist_episodes(location)
+        update_and_persist_episodes(location, resume)
     else:
         print USAGE_STR
+        sys.exit(1)
 
 
 if __name__ == '__main__':
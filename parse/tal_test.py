@@ -7,12 +7,13 @@
 
 import collections
 import datetime
+import sys
 import unittest
 
 import mox
-import requests
 
 import common
+import crawler
 import tal
 
 
@@ -33,30 +34,46 @@ class TALTests(mox.MoxTestBase):
         self.assertEqual(pages[0], tal.INDEX_PAGE_TEMPLATE % 2013)
 
     def test_get_index_pages_raw(self):
+        page_crawler = crawler.Crawler(concurrency=1, delay=0)
         self.mox.StubOutWithMock(tal, 'enumerate_index_page_locs')
-        self.mox.StubOutWithMock(requests, 'get')
+        self.mox.StubOutWithMock(crawler, 'get_crawler')
+        self.mox.StubOutWithMock(common, 'get_page')
 
         tal.enumerate_index_page_locs(2013, 2015).AndReturn(
             ['/2013', '/2014', '/2015']
         )
-
-        requests.get('/2013', headers=common.DEFAULT_HEADERS).AndReturn(
-            FakeResponse(200, 't1')
-        )
-        requests.get('/2014', headers=common.DEFAULT_HEADERS).AndReturn(
-            FakeResponse(200, 't2')
-        )
-        requests.get('/2015', headers=common.DEFAULT_HEADERS).AndReturn(
-            FakeResponse(404, 't3')
-        )
+        crawler.get_crawler().AndReturn(page_crawler)
+        common.get_page('/2013').AndReturn(FakeResponse(200, 't1'))
+        common.get_page('/2014').AndReturn(FakeResponse(200, 't2'))
+        common.get_page('/2015').AndReturn(FakeResponse(404, 't3'))
 
         self.mox.ReplayAll()
 
-        results = tal.get_index_pages_raw(2013, 2015)
+        try:
+            results = tal.get_index_pages_raw(2013, 2015)
+        finally:
+            page_crawler.close()
         self.assertEqual(len(results), 2)
         self.assertEqual(results[0], 't1')
         self.assertEqual(results[1], 't2')
 
+    def test_get_index_pages_raw_async(self):
+        self.mox.StubOutWithMock(tal, 'enumerate_index_page_locs')
+        self.mox.StubOutWithMock(common, 'get_page')
+
+        tal.enumerate_index_page_locs(2013, 2014).AndReturn(['/2013', '/2014'])
+        common.get_page('/2013').AndReturn(FakeResponse(200, 't1'))
+        common.get_page('/2014').AndReturn(FakeResponse(404, 't2'))
+
+        self.mox.ReplayAll()
+
+        page_crawler = crawler.Crawler(concurrency=1, delay=0)
+        try:
+            result = tal.get_index_pages_raw_async(2013, 2014, page_crawler)
+            self.assertEqual(result.get(), ['t1'])
+        finally:
+            page_crawler.close()
+
     def test_get_episode_locs_from_index(self):
         with open('tal_index_sample.html') as f:
             sample_src = f.read()
@@ -87,6 +104,7 @@ class TALTests(mox.MoxTestBase):
         )
 
         self.assertEqual(parsed_info['name'], '551: Good Guys 2015')
+        self.assertEqual(parsed_info['duration'], tal.EPISODE_DURATION)
 
         self.assertEqual(
             parsed_info['tags'],
@@ -103,6 +121,21 @@ class TALTests(mox.MoxTestBase):
 
         self.assertEqual(parsed_info['loc'], 'test')
 
+    def test_main_usage_error(self):
+        self.stubs.Set(sys, 'argv', ['tal.py', 'out.json', 'some'])
+        self.mox.StubOutWithMock(common, 'configure_cache_from_environ')
+        common.configure_cache_from_environ()
+        self.mox.ReplayAll()
+
+        with self.assertRaises(SystemExit) as context:
+            tal.main()
+        self.assertEqual(context.exception.code, 1)
+
+        self.stubs.Set(sys, 'argv', ['tal.py'])
+        with self.assertRaises(SystemExit) as context:
+            tal.main()
+        self.assertEqual(context.exception.code, 1)
+
 
 if __name__ == '__main__':
     unittest.main()